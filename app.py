@@ -1,21 +1,78 @@
-from fastapi import FastAPI, Body, File, UploadFile, HTTPException, Form, Request
+from fastapi import FastAPI, Body, File, UploadFile, HTTPException, Form, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse, JSONResponse, FileResponse
-from src.functions.rfil_utils import process_pdf_end_to_end
+from fastapi.responses import PlainTextResponse, JSONResponse, FileResponse, Response, StreamingResponse
+from src.functions.admission import rfil_admission, AdmissionRejected, RFIL_MAX_UPLOAD_BYTES, RFIL_MAX_PAGES
+from src.functions.rfil_loader import load_rfil_utils, load_rfil_pipeline, load_rfil_batch, loaded_rfil_pipeline, rfil_loader_stats, warm_up_rfil, warm_up_llm, RFIL_PRELOAD, RFIL_PIPELINE_ENABLED
+from src.functions.warmup import worker_warmup, WARMUP_DB_CONNECTIONS
 import uvicorn
 import os
 import json
-import PyPDF2
 from io import BytesIO
-from typing import Optional
-from src.integration.database import get_all_workflows, get_workflow_by_id, get_db, update_workflow, create_workflow, delete_workflow, create_workflow_submission
+from typing import Optional, List
+from contextlib import asynccontextmanager
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.integration.database import SQLALCHEMY_DATABASE_URL, init_engine, dispose_engine, get_pool_stats, prime_pool, get_all_workflows, stream_workflows, get_workflow_by_id, search_workflows, get_db, update_workflow, create_workflow, delete_workflow, bulk_apply_workflows, create_workflow_submission, insert_workflow_submissions, submission_values, get_feedback_stats, save_rfil_result, store_rfil_result, get_rfil_result, get_rfil_result_by_hash, find_rfil_entities_by_id, search_rfil_entities
+from src.integration.cache import workflow_cache, workflow_key, etag_matches, WORKFLOW_LIST_KEY, CACHE_MAX_BODY_BYTES
+from src.functions.utils import stream_json_array
+from src.integration.feedback import feedback_writer, enqueue_feedback, validate_feedback, FEEDBACK_WRITE_BEHIND, FEEDBACK_BATCH_MAX_ITEMS
+from src.integration.invalidation import InvalidationListener, INVALIDATION_ENABLED, to_asyncpg_dsn
+from src.integration.metrics import gauge_callbacks, observe_stage
+from starlette_prometheus import PrometheusMiddleware, metrics
+from src.workflows.engine import execute_workflow
+from src.workflows.dispatch import workflow_dispatcher
+from src.integration.execution_log import execution_log_writer, execution_log_stats, WORKFLOW_LOG_ENABLED
+from src.functions.logging_config import configure_logging, stop_logging, log_preview, new_request_id, get_request_id, set_request_id, reset_request_id
+from src.functions.profiling import SamplingProfiler, should_profile, token_matches, profile_store, speedscope_to_pstats
+import asyncio
+import orjson
 import logging
 import time
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import hashlib
+# Setup logging (LOG_LEVEL, LOG_FORMAT=text|json, LOG_ASYNC)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the connection pool when the worker starts and close it on shutdown
+    init_engine()
+    
+    # Keep this worker's caches in sync with writes made by other workers
+    invalidation_listener = None
+    if INVALIDATION_ENABLED:
+        invalidation_listener = InvalidationListener(to_asyncpg_dsn(SQLALCHEMY_DATABASE_URL))
+        invalidation_listener.start()
+    app.state.invalidation_listener = invalidation_listener
+    
+    if FEEDBACK_WRITE_BEHIND:
+        feedback_writer.start()
+    if WORKFLOW_LOG_ENABLED:
+        execution_log_writer.start()
+    # Warm-up runs in the background; /api/health/ready reports when it is done.
+    # The OCR stack is otherwise imported by the first RFIL request
+    warmup_steps = []
+    if WARMUP_DB_CONNECTIONS:
+        warmup_steps.append(("db_pool", lambda: prime_pool(WARMUP_DB_CONNECTIONS)))
+    if RFIL_PRELOAD:
+        warmup_steps += [("ocr", warm_up_rfil), ("llm", warm_up_llm)]
+    worker_warmup.start(warmup_steps)
+    
+    yield
+    
+    # Write buffered feedback before the pool goes away
+    await worker_warmup.stop()
+    rfil_pipeline = loaded_rfil_pipeline()
+    if rfil_pipeline is not None:
+        await rfil_pipeline.stop()
+    await feedback_writer.stop()
+    await execution_log_writer.stop()
+    await workflow_dispatcher.close()
+    if invalidation_listener is not None:
+        await invalidation_listener.stop()
+    await dispose_engine()
+    stop_logging()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,41 +83,351 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request metrics per route template, exported with the app metrics at /metrics
+app.add_middleware(PrometheusMiddleware, filter_unhandled_paths=True)
+app.add_route("/metrics", metrics)
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    # Every log record written while handling the request carries its id
+    request_id = new_request_id(request.headers.get("x-request-id"))
+    token = set_request_id(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        reset_request_id(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+gauge_callbacks.add("rfil_documents_in_flight", "RFIL documents admitted and being processed", None, lambda: rfil_admission.documents)
+gauge_callbacks.add("rfil_pages_in_flight", "Pages of the RFIL documents being processed", None, lambda: rfil_admission.pages)
+gauge_callbacks.add("rfil_documents_waiting", "RFIL documents waiting for admission", None, lambda: rfil_admission.waiting)
+def rfil_pipeline_queued():
+    # The pipeline only exists once the first RFIL request loaded it
+    rfil_pipeline = loaded_rfil_pipeline()
+    return rfil_pipeline.stats()["queued"] if rfil_pipeline is not None else {}
+
+gauge_callbacks.add("rfil_pipeline_queued", "RFIL jobs queued in front of each pipeline stage", "stage", rfil_pipeline_queued)
+gauge_callbacks.add("write_behind_queued", "Items waiting in the background writers", "writer", lambda: {
+    "feedback": feedback_writer.stats()["queued"],
+    "workflow_logs": execution_log_writer.stats()["queued"],
+})
+gauge_callbacks.add("db_pool_checked_out", "Database connections in use", None, lambda: get_pool_stats().get("checked_out", 0))
+
+def cached_json_response(request: Request, entry):
+    """
+    Serve a cached entry, or 304 Not Modified when the client already has it
+    """
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+async def streamed_json_list(cache_key: str, rows):
+    """
+    Stream rows as a JSON array and cache the body for the next request.
+    The first chunk is read up front so database errors still produce a
+    normal error response.
+    """
+    generation = workflow_cache.generation
+    chunks = stream_json_array(rows)
+    try:
+        first_chunk = await chunks.__anext__()
+    except Exception as e:
+        await chunks.aclose()
+        return {"status": "error", "message": str(e)}
+
+    async def body():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        workflow_cache.stream_into(cache_key, body(), generation, CACHE_MAX_BODY_BYTES),
+        media_type="application/json",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+def list_cache_key(prefix: str, params: dict):
+    query_string = "&".join(f"{key}={value}" for key, value in sorted(params.items()) if value is not None)
+    return f"{prefix}?{query_string}" if query_string else prefix
+
+
 @app.get("/api/workflows")
-async def root():
-    async for db in get_db():
-        return await get_all_workflows(db)
+async def root(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    isPublished: Optional[bool] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List workflows. limit/cursor switch to keyset pagination, category,
+    status and isPublished filter the list and fields=summary (or a
+    comma-separated list of keys) leaves out the large JSON columns.
+    """
+    cache_key = list_cache_key(WORKFLOW_LIST_KEY, {
+        "limit": limit, "cursor": cursor, "category": category,
+        "status": status, "isPublished": isPublished, "fields": fields
+    })
+
+    # The full list is streamed from a server-side cursor on a cache miss
+    if limit is None and cursor is None:
+        entry = workflow_cache.lookup(cache_key)
+        if entry is not None:
+            return cached_json_response(request, entry)
+        return await streamed_json_list(cache_key, stream_workflows(
+            category=category, status=status, is_published=isPublished, fields=fields
+        ))
+
+    entry, data = await workflow_cache.get_or_load(cache_key, lambda: get_all_workflows(
+        db, limit=limit, cursor=cursor, category=category,
+        status=status, is_published=isPublished, fields=fields
+    ))
+    if entry is None:
+        return data
+    return cached_json_response(request, entry)
+
+
+@app.get("/api/workflows/search")
+async def search_workflows_endpoint(
+    request: Request,
+    q: Optional[str] = None,
+    fieldType: Optional[str] = None,
+    accepts: Optional[str] = None,
+    apiMethod: Optional[str] = None,
+    fieldsContains: Optional[str] = None,
+    apiConfigContains: Optional[str] = None,
+    category: Optional[str] = None,
+    fields: Optional[str] = "summary",
+    limit: int = 20,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Ranked search over workflow names/descriptions and definitions, e.g.
+    ?fieldType=file&accepts=.pdf for workflows with a file field accepting PDFs.
+    fieldsContains/apiConfigContains take a JSON document matched with @>.
+    """
+    # Search results live under the list prefix so writes invalidate them too
+    cache_key = list_cache_key(f"{WORKFLOW_LIST_KEY}:search", {
+        "q": q, "fieldType": fieldType, "accepts": accepts, "apiMethod": apiMethod,
+        "fieldsContains": fieldsContains, "apiConfigContains": apiConfigContains,
+        "category": category, "fields": fields, "limit": limit, "offset": offset
+    })
+
+    entry, data = await workflow_cache.get_or_load(cache_key, lambda: search_workflows(
+        db, q=q, field_type=fieldType, accepts=accepts, api_method=apiMethod,
+        fields_contains=fieldsContains, api_config_contains=apiConfigContains,
+        category=category, fields=fields, limit=limit, offset=offset
+    ))
+    if entry is None:
+        return data
+    return cached_json_response(request, entry)
 
 
 @app.get("/api/workflows/{workflow_id}")
-async def get_workflow(workflow_id: str):
-    async for db in get_db():
-        return await get_workflow_by_id(db, workflow_id)
+async def get_workflow(request: Request, workflow_id: str, db: AsyncSession = Depends(get_db)):
+    entry, data = await workflow_cache.get_or_load(workflow_key(workflow_id), lambda: get_workflow_by_id(db, workflow_id))
+    if entry is None:
+        return data
+    return cached_json_response(request, entry)
+
+
+@app.get("/api/workflows/{workflow_id}/feedback-stats")
+async def get_workflow_feedback_stats(workflow_id: str, bucket: str = "day", days: int = 30, db: AsyncSession = Depends(get_db)):
+    return await get_feedback_stats(db, workflow_id, bucket, days)
+
+
+@app.post("/api/workflows/{workflow_id}/execute")
+async def execute_workflow_endpoint(request: Request, workflow_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Run a workflow with a JSON body or multipart form data (uploaded files
+    are passed to the workflow by field name)
+    """
+    data = {}
+    files = {}
+    if request.headers.get("content-type", "").startswith(("multipart/form-data", "application/x-www-form-urlencoded")):
+        form = await request.form()
+        for field_name, field_value in form.items():
+            if isinstance(field_value, UploadFile):
+                files[field_name] = field_value
+            else:
+                try:
+                    data[field_name] = json.loads(field_value)
+                except json.JSONDecodeError:
+                    data[field_name] = field_value
+    else:
+        body = await request.body()
+        if body:
+            try:
+                data = json.loads(body)
+            except json.JSONDecodeError:
+                return JSONResponse(status_code=400, content={"status": "error", "message": "Request body must be JSON"})
+    try:
+        return await execute_workflow(db, workflow_id, data, files)
+    except AdmissionRejected as e:
+        logger.warning(f"Workflow {workflow_id} rejected: {str(e)}")
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={"status": "error", "message": str(e), "retry_after": e.retry_after}
+        )
 
 
 @app.put("/api/workflows/{workflow_id}")
-async def update_workflow_endpoint(workflow_id: str, workflow_data: dict = Body(...)):
-    async for db in get_db():
-        result = await update_workflow(db, workflow_id, workflow_data)
-        return result
+async def update_workflow_endpoint(workflow_id: str, workflow_data: dict = Body(...), db: AsyncSession = Depends(get_db)):
+    result = await update_workflow(db, workflow_id, workflow_data)
+    return result
 
 
 @app.post("/api/workflows")
-async def create_workflow_endpoint(workflow_data: dict = Body(...)):
-    async for db in get_db():
-        return await create_workflow(db, workflow_data)
+async def create_workflow_endpoint(workflow_data: dict = Body(...), db: AsyncSession = Depends(get_db)):
+    return await create_workflow(db, workflow_data)
+
+
+@app.post("/api/workflows/bulk")
+async def bulk_workflows_endpoint(operations: List[dict] = Body(...), db: AsyncSession = Depends(get_db)):
+    """
+    Apply create/upsert/delete operations in a single transaction
+    """
+    return await bulk_apply_workflows(db, operations)
 
 
 @app.delete("/api/workflows/{workflow_id}")
-async def delete_workflow_endpoint(workflow_id: str):
-    async for db in get_db():
-        return await delete_workflow(db, workflow_id)
+async def delete_workflow_endpoint(workflow_id: str, db: AsyncSession = Depends(get_db)):
+    return await delete_workflow(db, workflow_id)
 
 
 @app.post("/api/workflow-feedback")
-async def create_workflow_feedback(feedback_data: dict = Body(...)):
-    async for db in get_db():
-        return await create_workflow_submission(db, feedback_data)
+async def create_workflow_feedback(feedback_data: dict = Body(...), db: AsyncSession = Depends(get_db)):
+    error = validate_feedback(feedback_data)
+    if error:
+        return JSONResponse(status_code=400, content={"status": "error", "message": error})
+    
+    # Buffered and written in the next batch; fall back to a direct insert when the buffer is full
+    if enqueue_feedback(feedback_data):
+        return JSONResponse(
+            status_code=202,
+            content={"status": "accepted", "message": "Workflow submission accepted"}
+        )
+    return await create_workflow_submission(db, feedback_data)
+
+
+@app.post("/api/workflow-feedback/batch")
+async def create_workflow_feedback_batch(feedback_items: List[dict] = Body(...)):
+    if len(feedback_items) > FEEDBACK_BATCH_MAX_ITEMS:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "status": "error",
+                "message": f"A batch may contain at most {FEEDBACK_BATCH_MAX_ITEMS} feedback items"
+            }
+        )
+    
+    errors = []
+    overflow = []
+    accepted = 0
+    for index, feedback_data in enumerate(feedback_items):
+        error = validate_feedback(feedback_data)
+        if error:
+            errors.append({"index": index, "message": error})
+        elif enqueue_feedback(feedback_data):
+            accepted += 1
+        else:
+            overflow.append(submission_values(feedback_data))
+    
+    # Whatever did not fit in the buffer is written right away in chunked inserts
+    try:
+        written = await insert_workflow_submissions(overflow) if overflow else 0
+    except Exception as e:
+        logger.error(f"Could not write {len(overflow)} feedback submissions: {str(e)}")
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "error",
+                "message": "Could not store the feedback that did not fit in the buffer",
+                "accepted": accepted,
+                "written": 0,
+                "failed": len(overflow),
+                "rejected": errors
+            }
+        )
+    
+    return JSONResponse(
+        status_code=202 if accepted else 200,
+        content={
+            "status": "accepted" if not errors else "partial",
+            "accepted": accepted,
+            "written": written,
+            "rejected": errors
+        }
+    )
+
+
+@app.get("/api/health/live")
+async def get_liveness():
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready")
+async def get_readiness():
+    """
+    200 once the worker finished warming up (DB pool, and with RFIL_PRELOAD
+    the OCR processes and the model connection), 503 before that and while
+    a required step is being retried
+    """
+    status = worker_warmup.stats()
+    if not status["ready"]:
+        status["status"] = "failed" if status["finished"] else "warming_up"
+        return JSONResponse(status_code=503, content=status)
+    status["status"] = "ready"
+    return status
+
+
+@app.get("/api/health/db-pool")
+async def get_db_pool_status():
+    return get_pool_stats()
+
+
+@app.get("/api/health/feedback")
+async def get_feedback_writer_status():
+    return feedback_writer.stats()
+
+
+@app.get("/api/health/workflow-logs")
+async def get_execution_log_status():
+    return execution_log_stats()
+
+
+@app.get("/api/health/rfil-pipeline")
+async def get_rfil_pipeline_status():
+    rfil_pipeline = loaded_rfil_pipeline()
+    status = rfil_pipeline.stats() if rfil_pipeline is not None else {"running": False}
+    if rfil_pipeline is not None and rfil_pipeline.ocr_service is not None:
+        status["ocr_service_stats"] = await rfil_pipeline.ocr_service_stats()
+    status["loader"] = rfil_loader_stats()
+    status["admission"] = rfil_admission.stats()
+    return status
+
+
+@app.get("/api/health/dispatch")
+async def get_dispatch_status():
+    return workflow_dispatcher.stats()
+
+
+@app.get("/api/health/cache")
+async def get_cache_status(request: Request):
+    listener = request.app.state.invalidation_listener
+    return {
+        "workflows": workflow_cache.stats(),
+        "invalidation": listener.stats() if listener is not None else None
+    }
 
 
 @app.get("/text")
@@ -82,13 +449,41 @@ async def get_system_diagram():
     image_path = "images/image.png"
     return FileResponse(image_path)
 
+async def rfil_profiler(request: Request):
+    """
+    Profile the request when an admin asks for it (X-Profile header) or it
+    is sampled (PROFILE_SAMPLE_RATE); None for every other request
+    """
+    if not should_profile(request.headers.get("x-profile")):
+        yield None
+        return
+    profiler = SamplingProfiler(get_request_id() or new_request_id())
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        path = await asyncio.to_thread(profile_store.save, profiler, {
+            "method": request.method, "path": request.url.path,
+            # Profiled requests bypass the RFIL pipeline, see process_rfil_workflow
+            "inProcess": True
+        })
+        if path:
+            logger.info(f"Stored profile {profiler.name} ({profiler.samples} samples)")
+
+
 @app.post("/api/workflow/rfil")
 async def process_rfil_workflow(
     request: Request,
     rfil: UploadFile = File(...),
+    reuse: bool = False,
+    db: AsyncSession = Depends(get_db),
+    profiler: Optional[SamplingProfiler] = Depends(rfil_profiler),
 ):
     """
     RFIL workflow endpoint that processes a PDF file submission.
+    With reuse=true, a stored result for the same PDF content is returned
+    right away instead of processing the document again.
     """
     start_time = time.time()
     logger.info("RFIL workflow endpoint called")
@@ -114,11 +509,62 @@ async def process_rfil_workflow(
         logger.error("Non-PDF file submitted")
         raise HTTPException(status_code=400, detail="Only PDF files are accepted")
     
+    # Size limit before the upload is read into memory
+    if rfil.size is not None and rfil.size > RFIL_MAX_UPLOAD_BYTES:
+        return JSONResponse(
+            status_code=413,
+            content={"status": "error", "message": f"The PDF file is larger than {RFIL_MAX_UPLOAD_BYTES} bytes"}
+        )
+    
     try:
         # Read the file content
         contents = await rfil.read()
+        content_hash = hashlib.sha256(contents).hexdigest()
+        
+        if reuse:
+            stored = await get_rfil_result_by_hash(db, content_hash)
+            # Give the connection back to the pool while the document is processed
+            await db.close()
+            if stored.get("status") != "error" and stored.get("result"):
+                logger.info(f"Returning stored result {stored['fileId']} for content hash {content_hash}")
+                response_data = stored["result"]
+                response_data["cached"] = True
+                return JSONResponse(content=response_data)
+        
+        # The OCR stack is imported by the first RFIL request of the worker
+        rfil_utils = await load_rfil_utils()
+        import PyPDF2
+        
+        # Page limit and admission before any page is parsed
+        validation_start = time.perf_counter()
+        try:
+            page_count = rfil_utils.count_pdf_pages(contents)
+        except Exception as e:
+            logger.error(f"Invalid PDF format: {str(e)}")
+            return JSONResponse(
+                status_code=400, 
+                content={"status": "error", "message": "The file is not a valid PDF"}
+            )
+        if page_count > RFIL_MAX_PAGES:
+            return JSONResponse(
+                status_code=413,
+                content={"status": "error", "message": f"The PDF has {page_count} pages, the limit is {RFIL_MAX_PAGES}"}
+            )
+        validation_seconds = time.perf_counter() - validation_start
+        # The wait is recorded as the "admission" stage
+        try:
+            admission_ticket = await rfil_admission.acquire(page_count)
+        except AdmissionRejected as e:
+            logger.warning(f"RFIL request rejected: {str(e)}")
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)},
+                content={"status": "error", "message": str(e), "retry_after": e.retry_after}
+            )
         
         # Validate PDF structure
+        validation_start = time.perf_counter()
+        temp_file_path = None
         try:
             pdf_file = BytesIO(contents)
             pdf_reader = PyPDF2.PdfReader(pdf_file)
@@ -134,6 +580,7 @@ async def process_rfil_workflow(
             # Check if file is readable
             _ = pdf_reader.pages[0].extract_text()
             logger.info(f"PDF validated successfully: {rfil.filename}, {len(pdf_reader.pages)} pages")
+            observe_stage("pdf_validation", validation_seconds + time.perf_counter() - validation_start)
             
             # Generate a unique ID for this file
             import uuid
@@ -151,22 +598,43 @@ async def process_rfil_workflow(
                 pdf_file.seek(0)
                 temp_file.write(pdf_file.read())
             
-            logger.info(f"PDF saved to temporary file: {temp_file_path}")
+            logger.debug(f"PDF saved to temporary file: {temp_file_path}")
             
             # Process the file using the improved PyMuPDF-based function
             logger.info("Starting PDF processing with PyMuPDF and Tesseract")
-            process_results = process_pdf_end_to_end(
-                temp_file_path, 
-                ocr_language='bul',  # Ensure Bulgarian language 
-                save_text=True
-            )
+            if profiler is not None:
+                # Profiled requests run in-process so the OCR is sampled too
+                process_results = await asyncio.to_thread(
+                    profiler.call, rfil_utils.process_pdf_end_to_end, temp_file_path,
+                    ocr_language='bul', save_text=True, include_text=True
+                )
+            elif RFIL_PIPELINE_ENABLED:
+                # OCR, entity extraction and validation run as separate stages
+                rfil_pipeline = await load_rfil_pipeline()
+                process_results = await rfil_pipeline.process(
+                    temp_file_path,
+                    ocr_language='bul',
+                    save_text=True,
+                    include_text=True
+                )
+            else:
+                # OCR and the model call block, keep them off the event loop
+                process_results = await asyncio.to_thread(
+                    rfil_utils.process_pdf_end_to_end,
+                    temp_file_path, 
+                    ocr_language='bul',  # Ensure Bulgarian language 
+                    save_text=True,
+                    include_text=True
+                )
             
             # Log process results for debugging
-            logger.info(f"Process results type: {type(process_results)}")
+            logger.debug(f"Process results type: {type(process_results)}")
             if isinstance(process_results, dict):
                 # Try to log part of the results safely
-                safe_log = {k: v for k, v in process_results.items() if k != 'text_extraction'} 
-                logger.info(f"Process results (partial): {json.dumps(safe_log, ensure_ascii=False)[:500]}...")
+                log_preview(logger, "Process results (partial)", lambda: json.dumps(
+                    {k: v for k, v in process_results.items() if k not in ('text_extraction', 'extracted_text')},
+                    ensure_ascii=False, default=str
+                )[:500])
                 
                 # Check if there was an error
                 if "error" in process_results:
@@ -190,6 +658,11 @@ async def process_rfil_workflow(
                 "pages": len(pdf_reader.pages)
             }
             
+            # The extracted text is only stored, not sent back
+            extracted_text = None
+            if isinstance(process_results, dict):
+                extracted_text = process_results.pop("extracted_text", None)
+            
             # Ensure process_results is JSON serializable
             if isinstance(process_results, dict):
                 # Add process_results to response_data
@@ -215,20 +688,28 @@ async def process_rfil_workflow(
             processing_time = end_time - start_time
             logger.info(f"Processing completed in {processing_time:.2f} seconds")
             response_data["processing_time"] = f"{processing_time:.2f} seconds"
+            response_data["content_hash"] = content_hash
+            
+            # Persist the result so it can be fetched again by file_id or content hash
+            store_result = await save_rfil_result(db, {
+                "file_id": file_id,
+                "content_hash": content_hash,
+                "filename": rfil.filename,
+                "status": "success",
+                "page_count": len(pdf_reader.pages),
+                "result": response_data,
+                "extracted_text": extracted_text,
+                "pages": process_results.get("pages") if isinstance(process_results, dict) else None,
+                "timings": process_results.get("timings") if isinstance(process_results, dict) else None
+            })
+            if store_result["status"] == "error":
+                logger.warning(f"Could not store RFIL result {file_id}: {store_result['message']}")
             
             # Log what we're sending back
             logger.info(f"Sending response with {response_data.get('entity_count', 0)} entities")
             
-            # Delete the temporary file
-            os.remove(temp_file_path)
-            logger.info(f"Removed temp file: {temp_file_path}")
-            
             # Try to log the response data in a safe way
-            try:
-                response_sample = json.dumps(response_data, ensure_ascii=False)[:1000]
-                logger.info(f"Response data sample: {response_sample}...")
-            except Exception as json_error:
-                logger.warning(f"Could not JSON encode response for logging: {str(json_error)}")
+            log_preview(logger, "Response data sample", lambda: json.dumps(response_data, ensure_ascii=False, default=str)[:1000])
             
             return JSONResponse(content=response_data)
             
@@ -238,6 +719,15 @@ async def process_rfil_workflow(
                 status_code=400, 
                 content={"status": "error", "message": "The file is not a valid PDF"}
             )
+        finally:
+            # OCR that outlived the request keeps its capacity until it ends
+            rfil_pipeline = loaded_rfil_pipeline()
+            running_ocr = rfil_pipeline.running_ocr(temp_file_path) if rfil_pipeline is not None and temp_file_path else None
+            rfil_admission.release(admission_ticket, after=running_ocr)
+            # Removed on every path once it was written, errors included
+            if temp_file_path is not None and os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+                logger.debug(f"Removed temp file: {temp_file_path}")
             
     except Exception as e:
         logger.error(f"Error during RFIL processing: {str(e)}")
@@ -248,5 +738,124 @@ async def process_rfil_workflow(
             content={"status": "error", "message": f"An error occurred: {str(e)}"}
         )
 
+@app.post("/api/workflow/rfil/batch")
+async def process_rfil_batch(files: List[UploadFile] = File(...)):
+    """
+    Process several PDFs, sent as files and/or ZIP archives, in one request.
+    Results are streamed as NDJSON: one line per document in the order they
+    finish, then a summary line. Every successful result is stored like a
+    single RFIL result.
+    """
+    rfil_batch = await load_rfil_batch()
+    document_count = await asyncio.to_thread(rfil_batch.count_batch_documents, files)
+    if document_count == 0:
+        return JSONResponse(status_code=400, content={"status": "error", "message": "No files in the request"})
+    if document_count > rfil_batch.RFIL_BATCH_MAX_DOCUMENTS:
+        return JSONResponse(
+            status_code=413,
+            content={"status": "error", "message": f"The batch has {document_count} files, the limit is {rfil_batch.RFIL_BATCH_MAX_DOCUMENTS}"}
+        )
+
+    temp_dir = os.path.join(os.getcwd(), "temp_files")
+    os.makedirs(temp_dir, exist_ok=True)
+    rfil_pipeline = await load_rfil_pipeline()
+    # The uploads stay open until the streamed response is finished
+    batch = rfil_batch.RfilBatch(rfil_pipeline, rfil_batch.iter_batch_documents(files, temp_dir), rfil_admission)
+    logger.info(f"RFIL batch of {document_count} files started")
+
+    async def result_lines():
+        succeeded = 0
+        async for doc in batch.run():
+            response_data, extracted_text = rfil_batch.document_response(doc)
+            if response_data["status"] == "success":
+                succeeded += 1
+                stored = {key: value for key, value in response_data.items() if key != "index"}
+                store_result = await store_rfil_result({
+                    "file_id": doc.file_id,
+                    "content_hash": doc.content_hash,
+                    "filename": doc.filename,
+                    "status": "success",
+                    "page_count": doc.page_count,
+                    "result": stored,
+                    "extracted_text": extracted_text,
+                    "pages": response_data["process_results"].get("pages"),
+                    "timings": response_data["process_results"].get("timings")
+                })
+                if store_result["status"] == "error":
+                    logger.warning(f"Could not store RFIL result {doc.file_id}: {store_result['message']}")
+            yield orjson.dumps({"type": "document", **response_data}) + b"\n"
+
+        stats = batch.stats()
+        summary = {"type": "summary", **stats, "succeeded": succeeded, "failed": stats["documents"] - succeeded}
+        logger.info(f"RFIL batch finished: {summary}")
+        yield orjson.dumps(summary) + b"\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+
+@app.get("/api/workflow/rfil/results/{file_id}")
+async def get_rfil_result_endpoint(file_id: str, include_text: bool = False, db: AsyncSession = Depends(get_db)):
+    return await get_rfil_result(db, file_id, include_text)
+
+
+@app.get("/api/workflow/rfil/results/by-hash/{content_hash}")
+async def get_rfil_result_by_hash_endpoint(content_hash: str, include_text: bool = False, db: AsyncSession = Depends(get_db)):
+    return await get_rfil_result_by_hash(db, content_hash, include_text)
+
+
+@app.get("/api/workflow/rfil/entities/by-id/{identification_number}")
+async def get_rfil_entities_by_id(identification_number: str, limit: int = 100, offset: int = 0, db: AsyncSession = Depends(get_db)):
+    """
+    Documents mentioning an EGN/EIK, from the entity index
+    """
+    return await find_rfil_entities_by_id(db, identification_number, limit, offset)
+
+
+@app.get("/api/workflow/rfil/entities/search")
+async def search_rfil_entities_endpoint(q: str, mode: str = "prefix", limit: int = 20, offset: int = 0, db: AsyncSession = Depends(get_db)):
+    """
+    People and companies by name: mode=prefix (start of the name) or
+    mode=trigram (similar names, tolerates OCR errors)
+    """
+    return await search_rfil_entities(db, q, mode, limit, offset)
+
+
+def admin_forbidden(request: Request):
+    if token_matches(request.headers.get("x-admin-token")):
+        return None
+    return JSONResponse(status_code=403, content={"status": "error", "message": "Admin token required"})
+
+
+@app.get("/api/admin/profiles")
+async def list_profiles(request: Request):
+    forbidden = admin_forbidden(request)
+    if forbidden:
+        return forbidden
+    return await asyncio.to_thread(profile_store.list)
+
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, request: Request, format: str = "speedscope"):
+    """
+    Download a stored profile as speedscope JSON (open in speedscope.app)
+    or as a pstats file (format=pstats, open with pstats/snakeviz)
+    """
+    forbidden = admin_forbidden(request)
+    if forbidden:
+        return forbidden
+    if format not in ("speedscope", "pstats"):
+        return JSONResponse(status_code=400, content={"status": "error", "message": "format must be speedscope or pstats"})
+    
+    body = await asyncio.to_thread(profile_store.load, profile_id)
+    if body is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"Profile {profile_id} not found"})
+    
+    if format == "pstats":
+        body = await asyncio.to_thread(speedscope_to_pstats, orjson.loads(body))
+        return Response(content=body, media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'})
+    return Response(content=body, media_type="application/json",
+                    headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'})
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,125 @@
+"""
+Time the workflow CRUD helpers in src/integration/database.py against a
+local Postgres (DATABASE_CONNECTION or --database-url). Every benchmark row
+gets a unique "bench-<hex>-" id prefix and is hard-deleted afterwards.
+
+    python -m benchmarks.bench_crud --rows 200 --output bench_crud.json
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+
+def workflow_data(workflow_id: str, index: int):
+    return {
+        "id": workflow_id,
+        "name": f"Benchmark workflow {index}",
+        "description": "Извличане на лица и фирми от документи",
+        "status": "available",
+        "fields": [
+            {"id": "document", "name": "Document", "label": "Document", "type": "file",
+             "required": True, "validation": {"fileTypes": [".pdf"]}}
+        ],
+        "apiConfig": {"endpoint": "http://localhost:8000/api/workflow/rfil", "method": "POST"},
+        "category": "BENCH",
+        "version": 1,
+        "isPublished": False,
+        "createdBy": "benchmark",
+    }
+
+
+async def timed(timings: dict, name: str, coroutine):
+    start = time.perf_counter()
+    result = await coroutine
+    timings.setdefault(name, []).append(time.perf_counter() - start)
+    if isinstance(result, dict) and result.get("status") == "error":
+        raise RuntimeError(f"{name}: {result.get('message')}")
+    return result
+
+
+async def run(rows: int, page_size: int):
+    from sqlalchemy import text
+
+    from benchmarks.common import summarize
+    from src.integration import database
+
+    database.init_engine()
+    prefix = f"bench-{uuid.uuid4().hex[:8]}-"
+    ids = [f"{prefix}{index:05d}" for index in range(rows)]
+    timings = {}
+    try:
+        async with database.SessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+
+            for index, workflow_id in enumerate(ids):
+                await timed(timings, "create_workflow", database.create_workflow(db, workflow_data(workflow_id, index)))
+            for workflow_id in ids:
+                await timed(timings, "get_workflow_by_id", database.get_workflow_by_id(db, workflow_id))
+            for workflow_id in ids:
+                await timed(timings, "update_workflow", database.update_workflow(db, workflow_id, {"version": 2}))
+
+            cursor = None
+            while True:
+                page = await timed(timings, "get_all_workflows_page",
+                                   database.get_all_workflows(db, limit=page_size, cursor=cursor, category="BENCH"))
+                cursor = page.get("nextCursor")
+                if not cursor:
+                    break
+
+            for _ in range(10):
+                await timed(timings, "search_workflows",
+                            database.search_workflows(db, q="Benchmark", category="BENCH", limit=page_size))
+
+            upserts = [{"op": "upsert", "workflow": {**workflow_data(workflow_id, index), "version": 3}}
+                       for index, workflow_id in enumerate(ids)]
+            await timed(timings, "bulk_apply_workflows_upsert", database.bulk_apply_workflows(db, upserts))
+
+            for workflow_id in ids:
+                await timed(timings, "delete_workflow", database.delete_workflow(db, workflow_id))
+    finally:
+        async with database.SessionLocal() as db:
+            await db.execute(text("DELETE FROM workflow_structures WHERE id LIKE :prefix"), {"prefix": f"{prefix}%"})
+            await db.commit()
+        await database.dispose_engine()
+
+    results = {name: summarize(values) for name, values in timings.items()}
+    results["bulk_apply_workflows_upsert"]["rows"] = rows
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Defaults to DATABASE_CONNECTION")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_CONNECTION"] = args.database_url
+    if not os.getenv("DATABASE_CONNECTION"):
+        sys.exit("Set DATABASE_CONNECTION or pass --database-url")
+    # Benchmark writes must not evict the caches of running workers
+    os.environ.setdefault("CACHE_INVALIDATION_ENABLED", "false")
+
+    from benchmarks.common import run_metadata, write_results
+
+    metadata = run_metadata(rows=args.rows, page_size=args.page_size)
+    try:
+        results = asyncio.run(run(args.rows, args.page_size))
+    except (OSError, ConnectionError) as e:
+        sys.exit(f"Database not reachable: {str(e)}")
+
+    for name, summary in results.items():
+        print(f"{name:<30} {summary['count']:>6} calls  p50 {summary['p50_seconds'] * 1000:.2f}ms  "
+              f"p95 {summary['p95_seconds'] * 1000:.2f}ms")
+
+    if args.output:
+        write_results(args.output, "crud", metadata, results)
+
+
+if __name__ == "__main__":
+    main()
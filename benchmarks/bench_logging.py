@@ -0,0 +1,118 @@
+"""
+Measure the logging cost per OCR page on the request thread.
+
+The records are the ones the OCR loop and the RFIL endpoint write for
+every page and document, written to a real file:
+
+  baseline     - the previous setup: basicConfig-style synchronous text
+                 handler, every per-page line and preview at INFO
+  async_json   - the same records through configure_logging(json, queue):
+                 formatting and I/O moved to the listener thread
+  structured   - configure_logging(json, queue) with the per-page lines at
+                 DEBUG and the previews sampled (LOG_PREVIEW_SAMPLE_RATE)
+
+    python -m benchmarks.bench_logging --pages 2000 --output bench_logging.json
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks.common import run_metadata, write_results
+from src.functions.logging_config import configure_logging, log_preview, set_request_id, stop_logging
+
+PAGE_TEXT = ("ДОГОВОР ЗА ПРОДАЖБА\nЛице: Иван Петров Георгиев, ЕГН 7501010010\n"
+             "Фирма: \"Примерна Търговия\" ООД, ЕИК 175074752\n") * 40
+RESULT = {
+    "entities": [
+        {"type": "person", "name": "Иван Петров Георгиев", "identification_type": "EGN",
+         "identification_number": "7501010010", "ValidIdentificator": "Valid"}
+    ] * 20,
+    "text_length": len(PAGE_TEXT),
+    "timings": {"text_extraction": 1.2, "entity_extraction": 0.8},
+}
+
+
+def old_page(logger, page_num: int, pages: int):
+    logger.info(f"Processing page {page_num+1} of {pages}")
+    logger.info(f"Detected page rotation: {0} degrees")
+    logger.info(f"Running OCR with language: bul")
+    logger.info(f"Page {page_num+1} OCR confidence: {91.5:.2f}%")
+    logger.info(f"OCR completed for page {page_num+1}")
+    logger.info(f"Extracted {len(PAGE_TEXT)} characters from page {page_num+1}")
+    preview = PAGE_TEXT[:100].replace('\n', ' ')
+    logger.info(f"Text preview: {preview}...")
+
+
+def old_document(logger):
+    logger.info(f"Process results (partial): {json.dumps(RESULT, ensure_ascii=False)[:500]}...")
+    logger.info(f"Response data sample: {json.dumps(RESULT, ensure_ascii=False)[:1000]}...")
+
+
+def new_page(logger, page_num: int, pages: int):
+    logger.debug(f"Processing page {page_num+1} of {pages}")
+    logger.debug(f"Detected page rotation: {0} degrees")
+    logger.debug(f"Running OCR with language: bul")
+    logger.debug(f"Page {page_num+1} OCR confidence: {91.5:.2f}%")
+    logger.debug(f"OCR completed for page {page_num+1}")
+    logger.debug(f"Extracted {len(PAGE_TEXT)} characters from page {page_num+1}")
+    log_preview(logger, f"Page {page_num+1} text preview", lambda: PAGE_TEXT[:100].replace('\n', ' '))
+
+
+def new_document(logger):
+    log_preview(logger, "Process results (partial)", lambda: json.dumps(RESULT, ensure_ascii=False)[:500])
+    log_preview(logger, "Response data sample", lambda: json.dumps(RESULT, ensure_ascii=False)[:1000])
+
+
+def run(page_calls, document_calls, pages: int, pages_per_document: int, log_file, use_queue: bool, log_format: str):
+    configure_logging(level="INFO", log_format=log_format, use_queue=use_queue, stream=log_file, force=True)
+    logger = logging.getLogger("src.functions.rfil_utils")
+    set_request_id("bench")
+    start_offset = log_file.tell()
+
+    start = time.perf_counter()
+    for page_num in range(pages):
+        page_calls(logger, page_num % pages_per_document, pages_per_document)
+        if page_num % pages_per_document == pages_per_document - 1:
+            document_calls(logger)
+    caller_seconds = time.perf_counter() - start
+    stop_logging()
+    total_seconds = time.perf_counter() - start
+
+    log_file.flush()
+    return {
+        "caller_us_per_page": round(caller_seconds / pages * 1e6, 2),
+        "total_us_per_page": round(total_seconds / pages * 1e6, 2),
+        "bytes_per_page": round((log_file.tell() - start_offset) / pages, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--pages-per-document", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    scenarios = {
+        "baseline": (old_page, old_document, False, "text"),
+        "async_json": (old_page, old_document, True, "json"),
+        "structured": (new_page, new_document, True, "json"),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, (page_calls, document_calls, use_queue, log_format) in scenarios.items():
+            with open(os.path.join(directory, f"{name}.log"), "w", encoding="utf-8") as log_file:
+                results[name] = run(page_calls, document_calls, args.pages, args.pages_per_document,
+                                    log_file, use_queue, log_format)
+            print(f"{name:<12} caller {results[name]['caller_us_per_page']:>8.2f}us/page  "
+                  f"total {results[name]['total_us_per_page']:>8.2f}us/page  {results[name]['bytes_per_page']:>8.1f} B/page")
+
+    if args.output:
+        write_results(args.output, "logging", run_metadata(pages=args.pages, pages_per_document=args.pages_per_document), results)
+
+
+if __name__ == "__main__":
+    main()
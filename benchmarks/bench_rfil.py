@@ -0,0 +1,159 @@
+"""
+Benchmark the RFIL functions on the synthetic corpus (see rfil_corpus):
+
+  validators         - is_valid_egn, validate_bulgarian_eik and repair_identifier
+  text_extraction    - extract_text_from_pdf_with_fitz per document kind, with
+                       the share of expected identifiers found in the OCR text
+  end_to_end         - process_pdf_end_to_end with the stubbed LLM
+                       (LLM_STUB_MODE), with identifier recall and validity accuracy
+
+OCR needs the tesseract binary with the "bul" language; without it the OCR
+benchmarks are reported as skipped.
+
+    python -m benchmarks.bench_rfil --docs 5 --seed 42 --output bench_rfil.json
+"""
+import argparse
+import os
+import shutil
+import time
+import timeit
+
+# The LLM is stubbed before the provider reads its settings
+os.environ.setdefault("LLM_STUB_MODE", "true")
+
+import pytesseract
+
+from benchmarks.common import run_metadata, summarize, write_results
+from benchmarks.rfil_corpus import load_or_generate
+from src.functions.identifier_repair import repair_identifier
+from src.functions.rfil_utils import extract_text_from_pdf_with_fitz, process_pdf_end_to_end
+from src.functions.validators import is_valid_egn, validate_bulgarian_eik
+
+
+def identifiers(manifest, identification_type: str, valid: bool):
+    return [
+        entity["identification_number"]
+        for document in manifest["documents"]
+        for entity in document["entities"]
+        if entity["identification_type"] == identification_type and entity["valid"] == valid
+    ]
+
+
+def bench_validators(manifest, number: int):
+    results = {}
+    cases = {
+        "is_valid_egn": (is_valid_egn, identifiers(manifest, "EGN", True) + identifiers(manifest, "EGN", False)),
+        "validate_bulgarian_eik": (validate_bulgarian_eik, identifiers(manifest, "EIK", True) + identifiers(manifest, "EIK", False)),
+    }
+    for name, (function, values) in cases.items():
+        seconds = timeit.timeit(lambda: [function(value) for value in values], number=number)
+        results[name] = {"calls": len(values) * number, "seconds_per_call": seconds / (len(values) * number)}
+
+    invalid = [("EGN", value) for value in identifiers(manifest, "EGN", False)]
+    invalid += [("EIK", value) for value in identifiers(manifest, "EIK", False)]
+    timings = []
+    outcomes = {}
+    for identification_type, value in invalid:
+        start = time.perf_counter()
+        repair = repair_identifier(value, identification_type)
+        timings.append(time.perf_counter() - start)
+        outcomes[repair["status"]] = outcomes.get(repair["status"], 0) + 1
+    results["repair_identifier"] = {"timings": summarize(timings), "outcomes": outcomes}
+    return results
+
+
+def found_share(expected, text: str):
+    if not expected:
+        return None
+    compact = (text or "").replace(" ", "").replace("\n", "")
+    return round(sum(1 for value in expected if value in compact) / len(expected), 4)
+
+
+def bench_text_extraction(manifest, corpus_dir: str):
+    by_kind = {}
+    for document in manifest["documents"]:
+        path = os.path.join(corpus_dir, document["file"])
+        start = time.perf_counter()
+        text = extract_text_from_pdf_with_fitz(path, language="bul")
+        elapsed = time.perf_counter() - start
+        kind = by_kind.setdefault(document["kind"], {"timings": [], "pages": 0, "characters": 0, "found": []})
+        kind["timings"].append(elapsed)
+        kind["pages"] += document["pages"]
+        kind["characters"] += len(text or "")
+        kind["found"].append(found_share([e["identification_number"] for e in document["entities"]], text))
+
+    results = {}
+    for name, kind in by_kind.items():
+        found = [value for value in kind["found"] if value is not None]
+        results[name] = {
+            "documents": summarize(kind["timings"]),
+            "seconds_per_page": round(sum(kind["timings"]) / kind["pages"], 6),
+            "characters": kind["characters"],
+            "identifiers_found": round(sum(found) / len(found), 4) if found else None,
+        }
+    return results
+
+
+def bench_end_to_end(manifest, corpus_dir: str):
+    timings = []
+    expected_total = recalled = validity_matches = 0
+    for document in manifest["documents"]:
+        path = os.path.join(corpus_dir, document["file"])
+        start = time.perf_counter()
+        result = process_pdf_end_to_end(path, ocr_language="bul")
+        timings.append(time.perf_counter() - start)
+
+        extracted = {entity.get("original_identification_number", entity["identification_number"]): entity
+                     for entity in result.get("entities", [])}
+        for entity in document["entities"]:
+            expected_total += 1
+            match = extracted.get(entity["identification_number"])
+            if match is None:
+                continue
+            recalled += 1
+            # A repaired identifier counts as valid, as in the API response
+            if (match.get("ValidIdentificator") == "Valid") == entity["valid"]:
+                validity_matches += 1
+
+    return {
+        "documents": summarize(timings),
+        "identifier_recall": round(recalled / expected_total, 4) if expected_total else None,
+        "validity_accuracy": round(validity_matches / recalled, 4) if recalled else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-dir", default="benchmarks/corpus")
+    parser.add_argument("--docs", type=int, default=5, help="Documents per kind")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--font-file", help="Font with Cyrillic glyphs for a newly generated corpus")
+    parser.add_argument("--validator-rounds", type=int, default=1000)
+    parser.add_argument("--skip-ocr", action="store_true", help="Only benchmark the validators")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    manifest = load_or_generate(args.corpus_dir, args.docs, args.seed, args.font_file)
+    metadata = run_metadata(docs_per_kind=args.docs, seed=args.seed, llm_stub=os.environ.get("LLM_STUB_MODE"))
+
+    results = {"validators": bench_validators(manifest, args.validator_rounds)}
+    print(f"validators: {results['validators']}")
+
+    tesseract = shutil.which(pytesseract.pytesseract.tesseract_cmd)
+    if args.skip_ocr:
+        results["text_extraction"] = results["end_to_end"] = {"skipped": "--skip-ocr"}
+    elif not tesseract:
+        results["text_extraction"] = results["end_to_end"] = {"skipped": "tesseract not found"}
+    else:
+        metadata["tesseract"] = str(pytesseract.get_tesseract_version())
+        results["text_extraction"] = bench_text_extraction(manifest, args.corpus_dir)
+        print(f"text_extraction: {results['text_extraction']}")
+        results["end_to_end"] = bench_end_to_end(manifest, args.corpus_dir)
+        print(f"end_to_end: {results['end_to_end']}")
+
+    if args.output:
+        write_results(args.output, "rfil", metadata, results)
+
+
+if __name__ == "__main__":
+    main()
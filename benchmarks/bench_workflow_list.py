@@ -0,0 +1,178 @@
+"""
+Compare serialising the workflow list the old way (build every dict,
+isoformat() the dates, FastAPI's stdlib JSON response) with the streamed
+orjson array used by GET /api/workflows.
+
+Runs on synthetic rows, no database needed:
+
+    python -m benchmarks.bench_workflow_list --rows 10000 100000 --output bench_workflow_list.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.functions.utils import stream_json_array
+
+FIELDS = [
+    {
+        "id": "document",
+        "name": "Document",
+        "label": "Document",
+        "type": "file",
+        "required": True,
+        "validation": {"fileTypes": [".pdf", ".doc", ".docx"]}
+    },
+    {
+        "id": "notes",
+        "name": "Notes",
+        "label": "Бележки",
+        "type": "textarea",
+        "required": False,
+        "validation": {"minLength": "10", "maxLength": "1000"}
+    }
+]
+
+API_CONFIG = {
+    "endpoint": "http://localhost:8000/api/workflow/rfil",
+    "method": "POST",
+    "headers": {"Content-Type": "multipart/form-data"}
+}
+
+
+class SyntheticWorkflow:
+    """
+    Stands in for a WorkflowStructure row
+    """
+
+    def __init__(self, index: int, base: datetime):
+        self.id = f"wf-{index:07d}"
+        self.name = f"Workflow {index}"
+        self.description = "Извличане на лица и фирми от документи " * 2
+        self.status = "available"
+        self.fields = FIELDS
+        self.api_config = API_CONFIG
+        self.category = "RFIL" if index % 3 else "HR"
+        self.version = 1
+        self.is_published = index % 2 == 0
+        self.created_at = base - timedelta(seconds=index)
+        self.updated_at = base - timedelta(seconds=index, microseconds=index % 1000)
+        self.created_by = "benchmark"
+
+
+def make_rows(count: int):
+    base = datetime(2025, 2, 18, 10, 30, 15)
+    return [SyntheticWorkflow(i, base) for i in range(count)]
+
+
+def baseline(rows):
+    # What get_all_workflows + FastAPI did before: a full list of dicts,
+    # isoformat() per date, jsonable_encoder and json.dumps of the whole list
+    workflow_list = [
+        {
+            "id": workflow.id,
+            "name": workflow.name,
+            "description": workflow.description,
+            "status": workflow.status,
+            "fields": workflow.fields,
+            "apiConfig": workflow.api_config,
+            "category": workflow.category,
+            "version": workflow.version,
+            "isPublished": workflow.is_published,
+            "createdAt": workflow.created_at.isoformat(),
+            "updatedAt": workflow.updated_at.isoformat(),
+            "createdBy": workflow.created_by
+        }
+        for workflow in rows
+    ]
+    return len(JSONResponse(content=jsonable_encoder(workflow_list)).body)
+
+
+async def _row_stream(rows):
+    # What stream_workflows yields: one mapping per row, dates left as datetime
+    for workflow in rows:
+        yield {
+            "id": workflow.id,
+            "name": workflow.name,
+            "description": workflow.description,
+            "status": workflow.status,
+            "fields": workflow.fields,
+            "apiConfig": workflow.api_config,
+            "category": workflow.category,
+            "version": workflow.version,
+            "isPublished": workflow.is_published,
+            "createdAt": workflow.created_at,
+            "updatedAt": workflow.updated_at,
+            "createdBy": workflow.created_by
+        }
+
+
+def streamed(rows):
+    async def consume():
+        size = 0
+        # Chunks are written to the socket and dropped, like StreamingResponse
+        async for chunk in stream_json_array(_row_stream(rows)):
+            size += len(chunk)
+        return size
+    return asyncio.run(consume())
+
+
+def measure(function, rows, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        size = function(rows)
+        timings.append(time.perf_counter() - start)
+
+    # Memory is measured in a separate run: tracemalloc slows everything down
+    gc.collect()
+    tracemalloc.start()
+    function(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "best_seconds": round(min(timings), 4),
+        "mean_seconds": round(sum(timings) / len(timings), 4),
+        "peak_memory_mb": round(peak / (1024 * 1024), 2),
+        "response_bytes": size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for count in args.rows:
+        rows = make_rows(count)
+        result = {
+            "rows": count,
+            "baseline": measure(baseline, rows, args.repeat),
+            "streamed": measure(streamed, rows, args.repeat),
+        }
+        result["speedup"] = round(result["baseline"]["best_seconds"] / result["streamed"]["best_seconds"], 2)
+        results.append(result)
+        print(
+            f"{count:>7} rows  baseline {result['baseline']['best_seconds']:.3f}s "
+            f"{result['baseline']['peak_memory_mb']:.1f}MB  |  streamed {result['streamed']['best_seconds']:.3f}s "
+            f"{result['streamed']['peak_memory_mb']:.1f}MB  |  x{result['speedup']}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({"benchmark": "workflow_list", "results": results}, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
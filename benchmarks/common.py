@@ -0,0 +1,61 @@
+"""
+Helpers shared by the benchmark scripts: run metadata, timing summaries
+and JSON result files that can be compared between runs.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_metadata(**parameters):
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": parameters,
+    }
+
+
+def percentile(values, fraction: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(timings):
+    """
+    Summary of a list of durations in seconds
+    """
+    if not timings:
+        return {"count": 0}
+    return {
+        "count": len(timings),
+        "total_seconds": round(sum(timings), 6),
+        "mean_seconds": round(sum(timings) / len(timings), 6),
+        "p50_seconds": round(percentile(timings, 0.5), 6),
+        "p95_seconds": round(percentile(timings, 0.95), 6),
+        "p99_seconds": round(percentile(timings, 0.99), 6),
+        "max_seconds": round(max(timings), 6),
+    }
+
+
+def write_results(path: str, benchmark: str, metadata: dict, results):
+    with open(path, "w", encoding="utf-8") as output_file:
+        json.dump({"benchmark": benchmark, "metadata": metadata, "results": results}, output_file, indent=2, ensure_ascii=False)
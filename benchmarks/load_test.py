@@ -0,0 +1,300 @@
+"""
+Drive a running API with a weighted mix of requests and report latency
+percentiles, error rates and throughput per endpoint.
+
+Endpoints in the mix:
+
+  rfil       - POST /api/workflow/rfil with a PDF from the benchmark corpus
+  workflows  - GET /api/workflows?limit=50
+  feedback   - POST /api/workflow-feedback
+
+Closed loop (a fixed number of clients, each sending the next request when
+the previous one finished):
+
+    python -m benchmarks.load_test --base-url http://localhost:8000 --mix rfil=1,workflows=5,feedback=2 --concurrency 16 --duration 60
+
+Open loop (Poisson arrivals at a fixed rate; latency is measured from the
+scheduled send time, so a slow server cannot hide its queueing delay):
+
+    python -m benchmarks.load_test --rate 50 --max-in-flight 200 --duration 60
+
+With --spawn-workers the app is started with uvicorn for every worker count
+in turn (LLM_STUB_MODE=true, so no Azure calls) and the runs are compared:
+
+    python -m benchmarks.load_test --spawn-workers 1 2 4 --duration 30 --output load_test.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import run_metadata, summarize, write_results
+from benchmarks.rfil_corpus import load_or_generate
+
+ENDPOINTS = ("rfil", "workflows", "feedback")
+
+
+def parse_mix(mix: str):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name} (expected one of {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    if not any(weights.values()):
+        raise ValueError("The mix needs at least one endpoint with a positive weight")
+    return weights
+
+
+class EndpointStats:
+    def __init__(self):
+        self.timings = []
+        self.statuses = {}
+        self.errors = 0
+        self.shed = 0
+        self.transport_errors = 0
+
+    def record(self, seconds: float, status: int = None):
+        self.timings.append(seconds)
+        if status is None:
+            self.transport_errors += 1
+            self.errors += 1
+            return
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if status == 429 or status == 503:
+            # Load shedding answers, reported apart from real failures
+            self.shed += 1
+        elif status >= 400:
+            self.errors += 1
+
+    def report(self, duration: float):
+        count = len(self.timings)
+        return {
+            "requests": count,
+            "throughput_rps": round(count / duration, 3) if duration else None,
+            "errors": self.errors,
+            "error_rate": round(self.errors / count, 4) if count else 0.0,
+            "shed": self.shed,
+            "transport_errors": self.transport_errors,
+            "statuses": self.statuses,
+            "latency": summarize(self.timings),
+        }
+
+
+class LoadTest:
+    def __init__(self, base_url: str, weights: dict, pdf_files: list, workflow_id: str,
+                 timeout: float, rfil_reuse: bool, seed: int):
+        self.base_url = base_url.rstrip("/")
+        self.names = list(weights)
+        self.weights = [weights[name] for name in self.names]
+        self.pdf_files = pdf_files
+        self.workflow_id = workflow_id
+        self.timeout = timeout
+        self.rfil_reuse = rfil_reuse
+        self.random = random.Random(seed)
+        self.stats = {}
+        self.recording = False
+        self.dropped = 0
+
+    async def send(self, client: httpx.AsyncClient, name: str):
+        if name == "rfil":
+            path = self.random.choice(self.pdf_files)
+            with open(path, "rb") as pdf_file:
+                contents = pdf_file.read()
+            return await client.post(
+                "/api/workflow/rfil",
+                params={"reuse": "true" if self.rfil_reuse else "false"},
+                files={"rfil": (os.path.basename(path), contents, "application/pdf")}
+            )
+        if name == "workflows":
+            return await client.get("/api/workflows", params={"limit": 50})
+        return await client.post(
+            "/api/workflow-feedback",
+            json={"workflowId": self.workflow_id, "feedback": self.random.choice(["positive", "negative"])}
+        )
+
+    async def request(self, client: httpx.AsyncClient, scheduled: float = None):
+        name = self.random.choices(self.names, self.weights)[0]
+        start = scheduled if scheduled is not None else time.perf_counter()
+        status = None
+        try:
+            response = await self.send(client, name)
+            status = response.status_code
+        except httpx.HTTPError:
+            pass
+        if self.recording:
+            self.stats.setdefault(name, EndpointStats()).record(time.perf_counter() - start, status)
+
+    async def closed_loop(self, client, concurrency: int, deadline: float):
+        async def user():
+            while time.perf_counter() < deadline:
+                await self.request(client)
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+
+    async def open_loop(self, client, rate: float, max_in_flight: int, deadline: float):
+        in_flight = set()
+        next_send = time.perf_counter()
+        while next_send < deadline:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= max_in_flight:
+                # The client cannot keep up; count it instead of silently slowing down
+                if self.recording:
+                    self.dropped += 1
+            else:
+                task = asyncio.create_task(self.request(client, scheduled=next_send))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            next_send += self.random.expovariate(rate)
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=self.timeout)
+
+    async def run(self, duration: float, warmup: float, concurrency: int, rate: float, max_in_flight: int):
+        connections = max(concurrency, max_in_flight if rate else 0)
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            for phase, seconds in (("warmup", warmup), ("measure", duration)):
+                if seconds <= 0:
+                    continue
+                self.recording = phase == "measure"
+                deadline = time.perf_counter() + seconds
+                started = time.perf_counter()
+                if rate:
+                    await self.open_loop(client, rate, max_in_flight, deadline)
+                else:
+                    await self.closed_loop(client, concurrency, deadline)
+                elapsed = time.perf_counter() - started
+
+        endpoints = {name: stats.report(elapsed) for name, stats in self.stats.items()}
+        total = EndpointStats()
+        for stats in self.stats.values():
+            total.timings += stats.timings
+            total.errors += stats.errors
+            total.shed += stats.shed
+            total.transport_errors += stats.transport_errors
+            for status, count in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + count
+        return {
+            "duration_seconds": round(elapsed, 3),
+            "dropped": self.dropped,
+            "overall": total.report(elapsed),
+            "endpoints": endpoints,
+        }
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The app exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/health/db-pool", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"The app did not answer within {timeout}s")
+
+
+def spawn_app(workers: int, port: int):
+    environment = dict(os.environ)
+    environment.setdefault("LLM_STUB_MODE", "true")
+    environment["WEB_CONCURRENCY"] = str(workers)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=environment
+    )
+
+
+def print_report(label: str, report: dict):
+    print(f"{label}: {report['duration_seconds']}s, dropped {report['dropped']}")
+    for name, result in [("overall", report["overall"])] + sorted(report["endpoints"].items()):
+        latency = result["latency"]
+        if not latency.get("count"):
+            print(f"  {name:<10} no requests")
+            continue
+        print(
+            f"  {name:<10} {result['requests']:>7} req  {result['throughput_rps']:>8.1f} req/s  "
+            f"p50 {latency['p50_seconds'] * 1000:8.1f}ms  p95 {latency['p95_seconds'] * 1000:8.1f}ms  "
+            f"p99 {latency['p99_seconds'] * 1000:8.1f}ms  errors {result['error_rate']:.2%}  shed {result['shed']}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--mix", default="rfil=1,workflows=5,feedback=2", help="Comma separated endpoint=weight")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before each run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clients in closed-loop mode")
+    parser.add_argument("--rate", type=float, help="Requests per second; switches to open-loop mode")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open-loop cap on outstanding requests")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--workflow-id", default="rfil", help="workflowId sent with feedback")
+    parser.add_argument("--rfil-reuse", action="store_true", help="Send reuse=true with RFIL uploads")
+    parser.add_argument("--corpus-dir", default="benchmarks/corpus")
+    parser.add_argument("--docs", type=int, default=5, help="Documents per kind if the corpus is generated")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--spawn-workers", type=int, nargs="+",
+                        help="Start the app with uvicorn for each worker count instead of using --base-url")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --spawn-workers")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    pdf_files = []
+    if weights.get("rfil"):
+        manifest = load_or_generate(args.corpus_dir, args.docs, args.seed)
+        pdf_files = [os.path.join(args.corpus_dir, document["file"]) for document in manifest["documents"]]
+
+    metadata = run_metadata(
+        mix=weights, duration=args.duration, warmup=args.warmup,
+        mode="open" if args.rate else "closed", concurrency=None if args.rate else args.concurrency,
+        rate=args.rate, max_in_flight=args.max_in_flight if args.rate else None,
+        rfil_reuse=args.rfil_reuse, seed=args.seed
+    )
+
+    def run_once(base_url: str):
+        load_test = LoadTest(base_url, weights, pdf_files, args.workflow_id, args.timeout, args.rfil_reuse, args.seed)
+        return asyncio.run(load_test.run(args.duration, args.warmup, args.concurrency, args.rate, args.max_in_flight))
+
+    results = []
+    if args.spawn_workers:
+        base_url = f"http://127.0.0.1:{args.port}"
+        for workers in args.spawn_workers:
+            process = spawn_app(workers, args.port)
+            try:
+                wait_until_ready(base_url, process)
+                report = run_once(base_url)
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            report["workers"] = workers
+            print_report(f"{workers} worker(s)", report)
+            results.append(report)
+    else:
+        report = run_once(args.base_url)
+        print_report(args.base_url, report)
+        results.append(report)
+
+    if args.output:
+        write_results(args.output, "load_test", metadata, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Synthetic Bulgarian RFIL corpus: PDFs naming people and companies with
+valid and invalid EGN/EIK numbers, plus a manifest.json with the expected
+entities of every document.
+
+Document kinds:
+  digital  - born-digital text pages
+  scanned  - pages rasterised with noise, blur and a slight skew
+  rotated  - scanned pages turned by 90, 180 or 270 degrees
+  blank    - a digital page followed by an empty page
+
+The same seed always produces the same corpus:
+
+    python -m benchmarks.rfil_corpus --output-dir benchmarks/corpus --docs 5 --seed 42
+"""
+import argparse
+import json
+import os
+import random
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+from src.functions.validators import is_valid_egn, validate_bulgarian_eik
+
+KINDS = ("digital", "scanned", "rotated", "blank")
+
+FIRST_NAMES = ["Иван", "Георги", "Димитър", "Николай", "Петър", "Мария", "Елена", "Йорданка", "Десислава", "Стефан"]
+MIDDLE_NAMES = ["Петров", "Иванов", "Стоянов", "Георгиев", "Христов", "Николов"]
+LAST_NAMES = ["Петров", "Иванов", "Димитров", "Тодоров", "Ангелов", "Костадинов", "Маринов"]
+COMPANY_WORDS = ["Алфа", "Балкан", "Витоша", "Родопи", "Тракия", "Дунав", "Пирин", "Стара планина"]
+COMPANY_KINDS = ["Консулт", "Строй", "Трейд", "Логистик", "Инвест", "Агро"]
+COMPANY_FORMS = ["ЕООД", "ООД", "АД", "ЕАД"]
+TITLES = ["ДОГОВОР ЗА ПОКУПКО-ПРОДАЖБА", "ПРОТОКОЛ", "ПЪЛНОМОЩНО", "ДОГОВОР ЗА НАЕМ"]
+SENTENCES = [
+    "Днес, в град София, между страните се сключи настоящият договор.",
+    "Страните се споразумяха за следното, като потвърждават верността на данните.",
+    "Настоящият документ се състави в два еднообразни екземпляра.",
+    "Плащането се извършва по банков път в срок от тридесет дни.",
+    "Всички спорове се решават по взаимно съгласие между страните.",
+]
+
+# Built-in PyMuPDF font with Cyrillic glyphs; override with --font-file
+DEFAULT_FONT = "china-s"
+
+
+def make_egn(rng: random.Random, valid: bool = True) -> str:
+    while True:
+        year = rng.randint(1940, 2005)
+        month = rng.randint(1, 12)
+        day = rng.randint(1, 28)
+        month_code = month + 40 if year >= 2000 else month
+        digits = f"{year % 100:02d}{month_code:02d}{day:02d}{rng.randint(0, 999):03d}"
+        for check in range(10):
+            candidate = digits + str(check)
+            if is_valid_egn(candidate) == valid:
+                return candidate
+
+
+def make_eik(rng: random.Random, valid: bool = True, length: int = 9) -> str:
+    while True:
+        digits = "".join(str(rng.randint(0, 9)) for _ in range(length - 1))
+        checks = list(range(10))
+        rng.shuffle(checks)
+        for check in checks:
+            candidate = digits + str(check)
+            if validate_bulgarian_eik(candidate) == valid:
+                return candidate
+
+
+def make_entities(rng: random.Random, invalid_rate: float):
+    entities = []
+    for _ in range(rng.randint(1, 3)):
+        valid = rng.random() >= invalid_rate
+        entities.append({
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(LAST_NAMES)}",
+            "type": "person",
+            "identification_type": "EGN",
+            "identification_number": make_egn(rng, valid),
+            "valid": valid,
+        })
+    for _ in range(rng.randint(1, 2)):
+        valid = rng.random() >= invalid_rate
+        entities.append({
+            "name": f"\"{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_KINDS)}\" {rng.choice(COMPANY_FORMS)}",
+            "type": "company",
+            "identification_type": "EIK",
+            "identification_number": make_eik(rng, valid, rng.choice((9, 9, 13))),
+            "valid": valid,
+        })
+    return entities
+
+
+def document_lines(rng: random.Random, entities):
+    lines = [rng.choice(TITLES), ""]
+    lines += rng.sample(SENTENCES, 2)
+    for entity in entities:
+        label = "ЕГН" if entity["identification_type"] == "EGN" else "ЕИК"
+        role = "Лице" if entity["type"] == "person" else "Фирма"
+        lines.append(f"{role}: {entity['name']}, {label} {entity['identification_number']}")
+    lines += rng.sample(SENTENCES, 2)
+    return lines
+
+
+FONT_SIZE = 10
+MARGIN = 50
+
+
+def wrap_line(line: str, measure, width: float):
+    # The built-in Cyrillic font is monospaced and wide, long lines must wrap
+    wrapped, current = [], ""
+    for word in line.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if current and measure(candidate) > width:
+            wrapped.append(current)
+            current = word
+        else:
+            current = candidate
+    wrapped.append(current)
+    return wrapped
+
+
+def text_page(doc, lines, fontname: str, fontfile: str = None):
+    page = doc.new_page(width=595, height=842)  # A4
+    if fontfile:
+        font = fitz.Font(fontfile=fontfile)
+        measure = lambda text: font.text_length(text, FONT_SIZE)
+    else:
+        measure = lambda text: fitz.get_text_length(text, fontname=fontname, fontsize=FONT_SIZE)
+    y = 80
+    for line in lines:
+        for part in wrap_line(line, measure, page.rect.width - 2 * MARGIN):
+            page.insert_text((MARGIN, y), part, fontname=fontname, fontfile=fontfile, fontsize=FONT_SIZE)
+            y += FONT_SIZE * 1.8
+    return page
+
+
+def scanned_page(doc, lines, rng: random.Random, fontname: str, fontfile: str = None, rotation: int = 0):
+    """
+    Render a text page and put it back as a noisy, slightly skewed image
+    """
+    source = fitz.open()
+    text_page(source, lines, fontname, fontfile)
+    pixmap = source[0].get_pixmap(dpi=150, colorspace=fitz.csGRAY)
+    image = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width).copy()
+    source.close()
+
+    height, width = image.shape
+    skew = cv2.getRotationMatrix2D((width / 2, height / 2), rng.uniform(-1.5, 1.5), 1.0)
+    image = cv2.warpAffine(image, skew, (width, height), borderValue=255)
+    image = cv2.GaussianBlur(image, (3, 3), 0)
+    noise = np.random.default_rng(rng.randint(0, 2 ** 32 - 1)).normal(0, 18, image.shape)
+    image = np.clip(image.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    if rotation:
+        image = cv2.rotate(image, {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}[rotation])
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    if rotation in (90, 270):
+        page = doc.new_page(width=842, height=595)
+    else:
+        page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, stream=encoded.tobytes())
+    return page
+
+
+def generate_document(path: str, kind: str, rng: random.Random, invalid_rate: float, fontname: str, fontfile: str = None):
+    entities = make_entities(rng, invalid_rate)
+    lines = document_lines(rng, entities)
+    doc = fitz.open()
+    rotation = 0
+    if kind == "digital":
+        text_page(doc, lines, fontname, fontfile)
+    elif kind == "scanned":
+        scanned_page(doc, lines, rng, fontname, fontfile)
+    elif kind == "rotated":
+        rotation = rng.choice((90, 180, 270))
+        scanned_page(doc, lines, rng, fontname, fontfile, rotation)
+    elif kind == "blank":
+        text_page(doc, lines, fontname, fontfile)
+        doc.new_page(width=595, height=842)
+    else:
+        raise ValueError(f"Unknown document kind: {kind}")
+    page_count = doc.page_count
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return {
+        "file": os.path.basename(path),
+        "kind": kind,
+        "pages": page_count,
+        "rotation": rotation,
+        "entities": entities,
+    }
+
+
+def generate_corpus(output_dir: str, docs_per_kind: int = 5, seed: int = 42, invalid_rate: float = 0.3,
+                    kinds=KINDS, font_file: str = None):
+    """
+    Write the corpus and its manifest.json; returns the manifest
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    fontname = "bench" if font_file else DEFAULT_FONT
+    documents = []
+    for kind in kinds:
+        for index in range(docs_per_kind):
+            path = os.path.join(output_dir, f"{kind}_{index:03d}.pdf")
+            documents.append(generate_document(path, kind, rng, invalid_rate, fontname, font_file))
+
+    manifest = {"seed": seed, "docs_per_kind": docs_per_kind, "invalid_rate": invalid_rate, "documents": documents}
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def load_or_generate(output_dir: str, docs_per_kind: int = 5, seed: int = 42, font_file: str = None):
+    """
+    Reuse a corpus generated with the same seed and size, otherwise generate it
+    """
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest.get("seed") == seed and manifest.get("docs_per_kind") == docs_per_kind:
+            return manifest
+    return generate_corpus(output_dir, docs_per_kind, seed, font_file=font_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-dir", default="benchmarks/corpus")
+    parser.add_argument("--docs", type=int, default=5, help="Documents per kind")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--invalid-rate", type=float, default=0.3, help="Share of invalid EGN/EIK numbers")
+    parser.add_argument("--font-file", help="TTF/OTF font with Cyrillic glyphs to use instead of the built-in one")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.output_dir, args.docs, args.seed, args.invalid_rate, font_file=args.font_file)
+    print(f"Wrote {len(manifest['documents'])} documents to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ echo Setting Tesseract Path...
 SET TESSERACT_PATH=C:\Program Files\Tesseract-OCR\tesseract.exe
 
 echo Starting uvicorn server with 2 workers...
-uvicorn app:app --workers 2
+SET WEB_CONCURRENCY=2
+uvicorn app:app --workers %WEB_CONCURRENCY%
 echo Server stopped.
 pause
\ No newline at end of file
@@ -0,0 +1,32 @@
+-- Indexes for keyset pagination and filtering of GET /api/workflows
+-- The list is ordered by (updated_at DESC, id DESC) and only reads
+-- non-deleted rows, so every index is partial on is_deleted = false.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block:
+-- run this file with psql in autocommit mode.
+
+-- Keyset pagination needs non-null sort keys
+UPDATE workflow_structures SET is_deleted = false WHERE is_deleted IS NULL;
+UPDATE workflow_structures SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+
+ALTER TABLE workflow_structures ALTER COLUMN is_deleted SET NOT NULL;
+ALTER TABLE workflow_structures ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE workflow_structures ALTER COLUMN updated_at SET NOT NULL;
+
+-- Unfiltered list
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_active_updated
+ON workflow_structures (updated_at DESC, id DESC)
+WHERE is_deleted = false;
+
+-- Filtered lists
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_active_category
+ON workflow_structures (category, updated_at DESC, id DESC)
+WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_active_status
+ON workflow_structures (status, updated_at DESC, id DESC)
+WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_active_published
+ON workflow_structures (is_published, updated_at DESC, id DESC)
+WHERE is_deleted = false;
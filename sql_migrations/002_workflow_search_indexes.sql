@@ -0,0 +1,33 @@
+-- Indexes for GET /api/workflows/search
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block:
+-- run this file with psql in autocommit mode.
+
+-- Trigram similarity (%) and ILIKE '%text%' on name/description
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_name_trgm
+ON workflow_structures USING GIN (name gin_trgm_ops)
+WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_description_trgm
+ON workflow_structures USING GIN (description gin_trgm_ops)
+WHERE is_deleted = false;
+
+-- Full-text search; the expression must match WORKFLOW_SEARCH_DOCUMENT in
+-- src/integration/database.py. 'simple' is used because Postgres has no
+-- Bulgarian text search configuration.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_search_document
+ON workflow_structures USING GIN (
+    to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))
+)
+WHERE is_deleted = false;
+
+-- Containment (@>) queries inside the workflow definitions
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_fields_gin
+ON workflow_structures USING GIN (fields jsonb_path_ops)
+WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_structures_api_config_gin
+ON workflow_structures USING GIN (api_config jsonb_path_ops)
+WHERE is_deleted = false;
@@ -0,0 +1,40 @@
+-- Cross-document entity index: every person and company of a stored RFIL
+-- result, with the pages that mention it. Filled when a result is stored;
+-- older results are indexed with: python -m src.functions.entity_index --backfill
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS rfil_entities (
+    id SERIAL PRIMARY KEY,
+    file_id VARCHAR(36) NOT NULL REFERENCES rfil_results(file_id) ON DELETE CASCADE,
+    filename VARCHAR(255),
+    identification_number VARCHAR(32),
+    original_identification_number VARCHAR(32),   -- OCR reading, when identifier repair changed it
+    identification_type VARCHAR(16),
+    entity_type VARCHAR(16),
+    name VARCHAR(512) NOT NULL,
+    normalized_name VARCHAR(512) NOT NULL,        -- case-folded, without punctuation
+    valid BOOLEAN,
+    repaired BOOLEAN NOT NULL DEFAULT false,
+    confidence REAL,
+    pages JSONB,                                  -- page numbers mentioning the entity
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Exact identification number lookups, newest documents first
+CREATE INDEX IF NOT EXISTS idx_rfil_entities_identification_number
+ON rfil_entities(identification_number, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_rfil_entities_original_identification_number
+ON rfil_entities(original_identification_number)
+WHERE original_identification_number IS NOT NULL;
+
+-- Name prefix search (LIKE 'prefix%') regardless of the database collation
+CREATE INDEX IF NOT EXISTS idx_rfil_entities_normalized_name_prefix
+ON rfil_entities(normalized_name text_pattern_ops);
+
+-- Similar names (% and similarity())
+CREATE INDEX IF NOT EXISTS idx_rfil_entities_normalized_name_trgm
+ON rfil_entities USING GIN (normalized_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_rfil_entities_file_id
+ON rfil_entities(file_id);
@@ -0,0 +1,17 @@
+-- Stored RFIL processing results, retrievable by file_id or PDF content hash
+CREATE TABLE IF NOT EXISTS rfil_results (
+    file_id VARCHAR(36) PRIMARY KEY,
+    content_hash CHAR(64) NOT NULL,
+    filename VARCHAR(255),
+    status VARCHAR(50),
+    page_count INTEGER,
+    result BYTEA,           -- zlib-compressed JSON response
+    extracted_text BYTEA,   -- zlib-compressed OCR text
+    pages JSONB,
+    timings JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Lookups of the latest result for the same PDF content
+CREATE INDEX IF NOT EXISTS idx_rfil_results_content_hash
+ON rfil_results(content_hash, created_at DESC);
@@ -0,0 +1,46 @@
+-- Feedback counters maintained together with every insert into
+-- workflow_submissions (see apply_feedback_rollup in src/integration/database.py)
+
+-- Per workflow and day
+CREATE TABLE IF NOT EXISTS workflow_feedback_daily (
+    workflow_id VARCHAR(50) NOT NULL,
+    day DATE NOT NULL,
+    positive_count INTEGER NOT NULL DEFAULT 0,
+    negative_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (workflow_id, day),
+    CONSTRAINT fk_workflow_feedback_daily_workflow
+        FOREIGN KEY(workflow_id)
+        REFERENCES workflow_structures(id)
+        ON DELETE CASCADE
+);
+
+-- Per workflow, all time
+CREATE TABLE IF NOT EXISTS workflow_feedback_totals (
+    workflow_id VARCHAR(50) PRIMARY KEY,
+    positive_count INTEGER NOT NULL DEFAULT 0,
+    negative_count INTEGER NOT NULL DEFAULT 0,
+    last_submitted_at TIMESTAMP,
+    CONSTRAINT fk_workflow_feedback_totals_workflow
+        FOREIGN KEY(workflow_id)
+        REFERENCES workflow_structures(id)
+        ON DELETE CASCADE
+);
+
+-- Backfill from the submissions recorded so far (run once, before deploying)
+INSERT INTO workflow_feedback_daily (workflow_id, day, positive_count, negative_count)
+SELECT workflow_id,
+       submitted_at::date,
+       COUNT(*) FILTER (WHERE is_positive),
+       COUNT(*) FILTER (WHERE NOT is_positive)
+FROM workflow_submissions
+GROUP BY workflow_id, submitted_at::date
+ON CONFLICT (workflow_id, day) DO NOTHING;
+
+INSERT INTO workflow_feedback_totals (workflow_id, positive_count, negative_count, last_submitted_at)
+SELECT workflow_id,
+       COUNT(*) FILTER (WHERE is_positive),
+       COUNT(*) FILTER (WHERE NOT is_positive),
+       MAX(submitted_at)
+FROM workflow_submissions
+GROUP BY workflow_id
+ON CONFLICT (workflow_id) DO NOTHING;
@@ -0,0 +1,15 @@
+-- Workflow executions, written in batches by the background log writer
+CREATE TABLE IF NOT EXISTS workflow_logs (
+    id SERIAL PRIMARY KEY,
+    workflow_id VARCHAR(255),
+    workflow_name VARCHAR(255) NOT NULL,
+    success BOOLEAN NOT NULL,
+    duration_ms INTEGER,
+    request_data JSONB,     -- truncated to WORKFLOW_LOG_MAX_PAYLOAD_BYTES
+    result JSONB,           -- result, or the error message of a failed run
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Recent executions of a workflow
+CREATE INDEX IF NOT EXISTS idx_workflow_logs_workflow_created
+ON workflow_logs(workflow_id, created_at DESC);
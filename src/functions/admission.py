@@ -0,0 +1,173 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from src.integration.metrics import observe_stage
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limits the documents and pages processed at once by this worker.
+
+    A request that does not fit waits in a short FIFO queue for at most
+    max_wait seconds; when the queue is full or the wait times out it is
+    rejected with a Retry-After estimated from the recent completion rate.
+    A single document larger than max_pages is still admitted when nothing
+    else is running, so it can never be starved.
+    """
+
+    def __init__(self, max_documents: int = 2, max_pages: int = 100, max_waiting: int = 4,
+                 max_wait: float = 10.0, rate_window: float = 60.0):
+        self.max_documents = max_documents
+        self.max_pages = max_pages
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.rate_window = rate_window
+        self.documents = 0
+        self.pages = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waiters = deque()
+        self._completions = deque()
+        self._durations = deque(maxlen=50)
+
+    @property
+    def waiting(self) -> int:
+        """
+        Requests queued for capacity
+        """
+        return len(self._waiters)
+
+    def _fits(self, pages: int) -> bool:
+        if self.documents == 0:
+            return True
+        return self.documents < self.max_documents and self.pages + pages <= self.max_pages
+
+    def _admit(self, pages: int):
+        self.documents += 1
+        self.pages += pages
+        self.admitted += 1
+        return (pages, time.monotonic())
+
+    def _wake_waiters(self):
+        # Strict FIFO: a large document at the head is not overtaken
+        while self._waiters:
+            pages, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(pages):
+                break
+            self._waiters.popleft()
+            future.set_result(self._admit(pages))
+
+    def drain_rate(self) -> float:
+        """
+        Documents finished per second over the last rate_window seconds
+        """
+        now = time.monotonic()
+        while self._completions and now - self._completions[0] > self.rate_window:
+            self._completions.popleft()
+        if not self._completions:
+            return 0.0
+        # Measured over the span actually observed, so a fresh worker is not
+        # reported as draining slowly
+        return len(self._completions) / max(now - self._completions[0], 1.0)
+
+    def retry_after(self) -> int:
+        ahead = len(self._waiters) + self.documents + 1
+        rate = self.drain_rate()
+        if rate > 0:
+            seconds = ahead / rate
+        elif self._durations:
+            seconds = ahead * (sum(self._durations) / len(self._durations)) / self.max_documents
+        else:
+            seconds = self.max_wait
+        return max(1, min(300, math.ceil(seconds)))
+
+    async def acquire(self, pages: int):
+        """
+        Wait for capacity and return a ticket for release(), or raise
+        AdmissionRejected
+        """
+        if not self._waiters and self._fits(pages):
+            observe_stage("admission", 0.0)
+            return self._admit(pages)
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected += 1
+            raise AdmissionRejected("Too many documents are being processed", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((pages, future))
+        wait_start = time.perf_counter()
+        try:
+            ticket = await asyncio.wait_for(future, self.max_wait)
+            observe_stage("admission", time.perf_counter() - wait_start)
+            return ticket
+        except asyncio.TimeoutError:
+            self._discard_waiter(pages, future)
+            self.rejected += 1
+            observe_stage("admission", time.perf_counter() - wait_start)
+            raise AdmissionRejected("Timed out waiting for processing capacity", self.retry_after())
+        except asyncio.CancelledError:
+            # Admitted just before the caller went away: give the slot back
+            if future.done() and not future.cancelled():
+                self.release(future.result())
+            else:
+                self._discard_waiter(pages, future)
+            raise
+
+    def _discard_waiter(self, pages: int, future):
+        try:
+            self._waiters.remove((pages, future))
+        except ValueError:
+            pass
+
+    def release(self, ticket, after=None):
+        """
+        Return a document's capacity. With `after`, a future of work on the
+        document that is still running (see RfilPipeline.running_ocr), the
+        capacity is returned once that future is done.
+        """
+        if after is not None and not after.done():
+            after.add_done_callback(lambda _: self.release(ticket))
+            return
+        pages, started = ticket
+        self.documents -= 1
+        self.pages -= pages
+        now = time.monotonic()
+        self._completions.append(now)
+        self._durations.append(now - started)
+        self._wake_waiters()
+
+    def stats(self):
+        return {
+            "documents": self.documents,
+            "pages": self.pages,
+            "waiting": self.waiting,
+            "max_documents": self.max_documents,
+            "max_pages": self.max_pages,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "drain_rate_per_minute": round(self.drain_rate() * 60, 2),
+        }
+
+
+RFIL_MAX_UPLOAD_BYTES = int(os.getenv("RFIL_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+RFIL_MAX_PAGES = int(os.getenv("RFIL_MAX_PAGES", "200"))
+
+rfil_admission = AdmissionController(
+    max_documents=int(os.getenv("RFIL_MAX_CONCURRENT_DOCUMENTS", "2")),
+    max_pages=int(os.getenv("RFIL_MAX_CONCURRENT_PAGES", "100")),
+    max_waiting=int(os.getenv("RFIL_MAX_WAITING", "4")),
+    max_wait=float(os.getenv("RFIL_MAX_WAIT_SECONDS", "10"))
+)
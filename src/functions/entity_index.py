@@ -0,0 +1,109 @@
+"""
+Rows of the cross-document entity index (rfil_entities), built from stored
+RFIL results. Existing results can be indexed with:
+
+    python -m src.functions.entity_index --backfill
+"""
+import argparse
+import asyncio
+import re
+import unicodedata
+
+# Quotes and punctuation around company names ("Фирма" ООД, „Фирма“ ЕООД)
+NAME_PUNCTUATION = re.compile(r"[\"'„“”«»`.,;:()\[\]{}]")
+PAGE_MARKER = re.compile(r"\n\n--- PAGE (\d+) ---\n\n")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Case-folded name without quotes or punctuation and with single spaces,
+    as stored in rfil_entities.normalized_name
+    """
+    name = unicodedata.normalize("NFKC", name or "").casefold()
+    return " ".join(NAME_PUNCTUATION.sub(" ", name).split())
+
+
+def normalize_identification_number(number) -> str:
+    return re.sub(r"\s", "", str(number or ""))
+
+
+def page_texts(extracted_text: str):
+    """
+    {page number: text} from the extracted text of a document
+    """
+    parts = PAGE_MARKER.split(extracted_text or "")
+    return {int(number): text for number, text in zip(parts[1::2], parts[2::2])}
+
+
+def entity_pages(pages: dict, numbers, normalized_name: str):
+    """
+    Pages mentioning one of the entity's numbers, or else its name
+    """
+    found = [page for page, text in pages.items() if any(number and number in text for number in numbers)]
+    if not found and normalized_name:
+        found = [page for page, text in pages.items() if normalized_name in normalize_name(text)]
+    return sorted(found)
+
+
+def entity_index_rows(file_id: str, filename: str, result: dict, extracted_text: str = None):
+    """
+    One row per distinct entity (number and name) of a stored RFIL response
+    """
+    process_results = (result or {}).get("process_results") or {}
+    entities = process_results.get("entities") or []
+    pages = page_texts(extracted_text)
+    rows = []
+    seen = set()
+    for entity in entities:
+        if not isinstance(entity, dict):
+            continue
+        number = normalize_identification_number(entity.get("identification_number"))
+        original_number = normalize_identification_number(entity.get("original_identification_number")) or None
+        normalized_name = normalize_name(entity.get("name"))
+        if not number and not normalized_name:
+            continue
+        if (number, normalized_name) in seen:
+            continue
+        seen.add((number, normalized_name))
+        try:
+            confidence = float(entity.get("confidence"))
+        except (TypeError, ValueError):
+            confidence = None
+        rows.append({
+            "file_id": file_id,
+            "filename": filename,
+            "identification_number": number or None,
+            "original_identification_number": original_number,
+            "identification_type": entity.get("identification_type"),
+            "entity_type": (entity.get("type") or "").lower() or None,
+            "name": (entity.get("name") or "")[:512],
+            "normalized_name": normalized_name[:512],
+            "valid": entity.get("ValidIdentificator") == "Valid" if "ValidIdentificator" in entity else None,
+            "repaired": bool(entity.get("repaired")),
+            "confidence": confidence,
+            "pages": entity_pages(pages, (number, original_number), normalized_name),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backfill", action="store_true", help="Index the stored results that have no entities indexed yet")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.error("nothing to do, pass --backfill")
+
+    from src.integration.database import backfill_rfil_entity_index, dispose_engine
+
+    async def run():
+        try:
+            return await backfill_rfil_entity_index(args.batch_size)
+        finally:
+            await dispose_engine()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import calendar
+import itertools
+import logging
+from functools import lru_cache
+
+from src.functions.validators import is_valid_egn, validate_bulgarian_eik
+
+logger = logging.getLogger(__name__)
+
+# Characters that OCR commonly confuses with each other. Every character in a
+# group can be misread as any other character of the same group; only the
+# digits of a group are used as replacement candidates.
+CONFUSION_GROUPS = [
+    "0OoОоDQ8BВв",  # 0/O/8/B (Latin and Cyrillic look-alikes)
+    "1lIi|!7",      # 1/l/7
+    "5Ss6бG",       # 5/S/6
+    "38З",          # 3/8
+    "2Zz",          # 2/Z
+    "4AЧч",         # 4/A
+    "9gq",          # 9/g
+]
+
+# Characters that are dropped before repairing (spacing and separators)
+IGNORED_CHARACTERS = " \t\n-./"
+
+# Positions with an OCR confidence at or above this value are never changed
+# unless the character is not a digit at all
+LOCKED_CONFIDENCE = 95.0
+
+# Digits read with a confidence below this value count as possible misreads.
+# A repair is only accepted when every changed position is such a digit or
+# a confusable non-digit character; any other candidate is only reported.
+SUSPECT_CONFIDENCE = 80.0
+
+EGN_WEIGHTS = (2, 4, 8, 5, 10, 9, 7, 3, 6)
+EIK_WEIGHTS = (1, 2, 3, 4, 5, 6, 7, 8)
+EIK_ALT_WEIGHTS = (3, 4, 5, 6, 7, 8, 9, 10)
+EIK_13_WEIGHTS = (2, 7, 3, 5)
+EIK_13_ALT_WEIGHTS = (4, 9, 5, 7)
+
+EXPECTED_LENGTHS = {
+    "EGN": (10,),
+    "EIK": (9, 13),
+}
+
+
+def _build_substitutions():
+    substitutions = {}
+    for group in CONFUSION_GROUPS:
+        digits = [c for c in group if c.isdigit()]
+        for char in group:
+            options = substitutions.setdefault(char, [])
+            for digit in digits:
+                if digit != char and digit not in options:
+                    options.append(digit)
+    return {char: tuple(options) for char, options in substitutions.items() if options}
+
+
+SUBSTITUTIONS = _build_substitutions()
+
+
+@lru_cache(maxsize=1)
+def _egn_date_table():
+    """
+    Lookup table indexed by the YYMMDD prefix of an EGN, 1 for valid dates.
+    Built once on first use using the same century rules as is_valid_egn.
+    """
+    table = bytearray(1000000)
+    for yy in range(100):
+        for month_offset, century in ((0, 1900), (20, 1800), (40, 2000)):
+            for month in range(1, 13):
+                last_day = calendar.monthrange(century + yy, month)[1]
+                base = yy * 10000 + (month + month_offset) * 100
+                for day in range(1, last_day + 1):
+                    table[base + day] = 1
+    return table
+
+
+def _check_digit(total, alt_total=None):
+    remainder = total % 11
+    if remainder == 10:
+        if alt_total is None:
+            return 0
+        remainder = alt_total % 11
+        if remainder == 10:
+            return 0
+    return remainder
+
+
+def _weighted_sum(digits, weights, offset=0):
+    return sum(digits[offset + i] * weight for i, weight in enumerate(weights))
+
+
+def _egn_passes(digits):
+    prefix = digits[0] * 100000 + digits[1] * 10000 + digits[2] * 1000 + digits[3] * 100 + digits[4] * 10 + digits[5]
+    if not _egn_date_table()[prefix]:
+        return False
+    return _check_digit(_weighted_sum(digits, EGN_WEIGHTS)) == digits[9]
+
+
+def _eik_9_passes(digits):
+    check = _check_digit(_weighted_sum(digits, EIK_WEIGHTS), _weighted_sum(digits, EIK_ALT_WEIGHTS))
+    return check == digits[8]
+
+
+def _eik_passes(digits):
+    if not _eik_9_passes(digits):
+        return False
+    if len(digits) == 9:
+        return True
+    check = _check_digit(_weighted_sum(digits, EIK_13_WEIGHTS, 9), _weighted_sum(digits, EIK_13_ALT_WEIGHTS, 9))
+    return check == digits[12]
+
+
+def _normalize_confidences(confidences, length):
+    """
+    Turn the OCR confidences into one value per character on a 0-100 scale.
+    A single number (word-level confidence) is applied to every character.
+    """
+    if confidences is None:
+        return [None] * length
+    if isinstance(confidences, (int, float)):
+        confidences = [confidences] * length
+    values = [float(c) if c is not None and float(c) >= 0 else None for c in confidences]
+    if len(values) != length:
+        return [None] * length
+    known = [v for v in values if v is not None]
+    if known and max(known) <= 1.0:
+        values = [v * 100 if v is not None else None for v in values]
+    return values
+
+
+def repair_identifier(identification_number, identification_type, confidences=None, max_substitutions=2):
+    """
+    Try to repair an EGN/EIK that failed validation because of OCR misreads.
+
+    Candidates are generated by replacing up to max_substitutions characters
+    using the OCR confusion table, least confident positions first, and are
+    kept only if they pass the EGN/EIK date and checksum rules. A candidate
+    is only accepted when there is OCR evidence for every change: a
+    non-digit character, or a digit read below SUSPECT_CONFIDENCE. Without
+    confidences a number made of digits only is therefore never repaired,
+    its candidates are only reported.
+
+    Parameters:
+    identification_number (str): The identifier as returned by extraction
+    identification_type (str): "EGN" or "EIK"
+    confidences (list|float): Optional per-character (or word-level) OCR confidences
+    max_substitutions (int): Maximum number of characters to change
+
+    Returns:
+    dict: status ("valid", "repaired", "unconfirmed", "ambiguous" or
+    "unrepairable"), the resulting identification_number, a repaired flag
+    and the candidates found
+    """
+    original = "" if identification_number is None else str(identification_number)
+    id_type = (identification_type or "").upper()
+    result = {
+        "status": "unrepairable",
+        "original": original,
+        "identification_number": original,
+        "repaired": False,
+        "substitutions": [],
+        "candidates": [],
+    }
+
+    if id_type not in EXPECTED_LENGTHS:
+        return result
+
+    validator = is_valid_egn if id_type == "EGN" else validate_bulgarian_eik
+    fast_check = _egn_passes if id_type == "EGN" else _eik_passes
+
+    chars = [c for c in original if c not in IGNORED_CHARACTERS]
+    if len(chars) not in EXPECTED_LENGTHS[id_type]:
+        return result
+
+    cleaned = "".join(chars)
+    if cleaned.isdigit() and validator(cleaned):
+        # Only spacing or separators were wrong
+        result.update({"status": "valid", "identification_number": cleaned})
+        return result
+
+    # Non-digit characters have to be replaced, digits only may be
+    mandatory = [i for i, c in enumerate(chars) if not c.isdigit()]
+    if len(mandatory) > max_substitutions or any(c not in SUBSTITUTIONS for c in (chars[i] for i in mandatory)):
+        return result
+
+    position_confidences = _normalize_confidences(confidences, len(chars))
+    optional = [
+        i for i, c in enumerate(chars)
+        if c.isdigit() and c in SUBSTITUTIONS
+        and (position_confidences[i] is None or position_confidences[i] < LOCKED_CONFIDENCE)
+    ]
+    # Least confident positions are tried first
+    optional.sort(key=lambda i: position_confidences[i] if position_confidences[i] is not None else 0.0)
+    suspect = set(mandatory) | {
+        i for i in optional
+        if position_confidences[i] is not None and position_confidences[i] < SUSPECT_CONFIDENCE
+    }
+
+    base_digits = [int(c) if c.isdigit() else 0 for c in chars]
+    found = {}
+
+    for extra in range(0, max_substitutions - len(mandatory) + 1):
+        for extra_positions in itertools.combinations(optional, extra):
+            positions = mandatory + list(extra_positions)
+            for replacement in itertools.product(*(SUBSTITUTIONS[chars[i]] for i in positions)):
+                digits = list(base_digits)
+                for position, digit in zip(positions, replacement):
+                    digits[position] = int(digit)
+                if not fast_check(digits):
+                    continue
+                candidate = "".join(str(d) for d in digits)
+                if candidate not in found and validator(candidate):
+                    found[candidate] = [
+                        {"position": position, "from": chars[position], "to": digit}
+                        for position, digit in zip(positions, replacement)
+                    ]
+        # Prefer the smallest number of changes
+        if found:
+            break
+
+    result["candidates"] = list(found.keys())
+    if len(found) == 1:
+        candidate, substitutions = next(iter(found.items()))
+        if all(change["position"] in suspect for change in substitutions):
+            result.update({
+                "status": "repaired",
+                "identification_number": candidate,
+                "repaired": True,
+                "substitutions": substitutions,
+            })
+            logger.info(f"Repaired {id_type} {original} -> {candidate}")
+        else:
+            result.update({"status": "unconfirmed", "substitutions": substitutions})
+            logger.info(f"Unconfirmed repair for {id_type} {original}: no OCR evidence for the change")
+    elif found:
+        result["status"] = "ambiguous"
+        logger.info(f"Ambiguous repair for {id_type} {original}: {len(found)} candidates")
+
+    return result
@@ -0,0 +1,187 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import orjson
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" (the classic one-line format) or "json" (one object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Format and write records on a background thread instead of the caller's
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+# Share of expensive previews (OCR text, result JSON) logged at INFO;
+# they are always logged when DEBUG is enabled
+LOG_PREVIEW_SAMPLE_RATE = float(os.getenv("LOG_PREVIEW_SAMPLE_RATE", "0"))
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(request_id)s - %(message)s'
+
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+request_id_var = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+_handlers = []
+
+
+def new_request_id(incoming: str = None) -> str:
+    """
+    Reuse a well-formed incoming X-Request-ID, otherwise create one
+    """
+    if incoming and REQUEST_ID_PATTERN.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def get_request_id():
+    return request_id_var.get()
+
+
+def set_request_id(request_id: str):
+    return request_id_var.set(request_id)
+
+
+def reset_request_id(token):
+    request_id_var.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamp records with the request id of the current context. Runs on the
+    calling thread, before a record is handed to the queue.
+    """
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "process": record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return orjson.dumps(data, default=str).decode("utf-8")
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    QueueHandler that only does what has to happen on the calling thread:
+    merge the message arguments and render a traceback. Formatting and
+    I/O happen on the listener thread.
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def create_handler(log_format: str = LOG_FORMAT, stream=None):
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT, use_queue: bool = LOG_ASYNC,
+                      stream=None, force: bool = False):
+    """
+    Configure the root logger once per process (the app and every OCR
+    worker process call this). With force=True an earlier configuration
+    is replaced.
+    """
+    global _listener
+    if _handlers and not force:
+        return
+    stop_logging()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+
+    handler = create_handler(log_format, stream)
+    if use_queue:
+        front = ContextQueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(front.queue, handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        front = handler
+    front.addFilter(RequestIdFilter())
+    root.addHandler(front)
+    _handlers.append(front)
+
+
+def stop_logging():
+    """
+    Write out everything still queued and detach the handlers
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    root = logging.getLogger()
+    while _handlers:
+        handler = _handlers.pop()
+        root.removeHandler(handler)
+        handler.close()
+
+
+atexit.register(stop_logging)
+
+
+def log_preview(logger: logging.Logger, message: str, build_preview, sample_rate: float = None):
+    """
+    Log an expensive preview: always at DEBUG, and at INFO only for a
+    sample of calls. build_preview is only called when the record is
+    actually emitted.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"{message}: {build_preview()}")
+        return
+    sample_rate = LOG_PREVIEW_SAMPLE_RATE if sample_rate is None else sample_rate
+    if sample_rate > 0 and logger.isEnabledFor(logging.INFO) and random.random() < sample_rate:
+        logger.info(f"{message}: {build_preview()}")
+
+
+def call_with_request_id(request_id: str, function, *args, **kwargs):
+    """
+    Run function in a worker process with logging configured and the
+    request id of the job that submitted it
+    """
+    configure_logging()
+    token = set_request_id(request_id)
+    try:
+        return function(*args, **kwargs)
+    finally:
+        reset_request_id(token)
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+import struct
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Unix socket of the OCR service (python -m src.functions.ocr_service).
+# Unset: OCR runs in the process pool of each API worker.
+OCR_SERVICE_SOCKET = os.getenv("OCR_SERVICE_SOCKET")
+OCR_SERVICE_TIMEOUT = float(os.getenv("OCR_SERVICE_TIMEOUT", "600"))
+# Documents each API worker sends to the OCR service at once
+OCR_SERVICE_CONCURRENCY = int(os.getenv("OCR_SERVICE_CONCURRENCY", "4"))
+
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# Every message is a 4-byte big-endian length followed by that many bytes of JSON
+HEADER = struct.Struct("!I")
+
+
+class OcrServiceError(Exception):
+    pass
+
+
+async def write_message(writer: asyncio.StreamWriter, message: dict):
+    body = orjson.dumps(message)
+    writer.write(HEADER.pack(len(body)) + body)
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> dict:
+    size, = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Message of {size} bytes is too large")
+    return orjson.loads(await reader.readexactly(size))
+
+
+class OcrServiceClient:
+    """
+    Sends OCR jobs to the OCR service, one connection per request. The
+    service reads the PDF from disk, so both must see the same files.
+    """
+
+    def __init__(self, socket_path: str = OCR_SERVICE_SOCKET, timeout: float = OCR_SERVICE_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    async def request(self, message: dict, timeout: float = None) -> dict:
+        async def exchange():
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            try:
+                await write_message(writer, message)
+                return await read_message(reader)
+            finally:
+                writer.close()
+
+        try:
+            response = await asyncio.wait_for(exchange(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise OcrServiceError(f"OCR service did not answer {message.get('op')} in time") from None
+        except (OSError, asyncio.IncompleteReadError) as e:
+            raise OcrServiceError(f"OCR service unavailable: {str(e)}") from None
+        if response.get("status") == "error":
+            raise OcrServiceError(response.get("message", "OCR service error"))
+        return response
+
+    async def ocr_pdf(self, pdf_path: str, language: str = 'bul', request_id: str = None) -> dict:
+        """
+        Same result as rfil_utils.ocr_pdf
+        """
+        response = await self.request({
+            "op": "ocr",
+            "pdf_path": os.path.abspath(pdf_path),
+            "language": language,
+            "request_id": request_id,
+        })
+        return response["result"]
+
+    async def stats(self, timeout: float = 5.0) -> dict:
+        return (await self.request({"op": "stats"}, timeout))["stats"]
@@ -0,0 +1,394 @@
+"""
+OCR service: runs the OCR of RFIL documents for the API workers of a host,
+so OCR capacity is sized separately from the API.
+
+    OCR_SERVICE_SOCKET=/run/haiper/ocr.sock python -m src.functions.ocr_service --workers 8
+
+API workers started with the same OCR_SERVICE_SOCKET send their documents
+here instead of running OCR themselves. The service renders the pages of
+each document and OCRs them in parallel in its own process pool; rendered
+pages are handed to the OCR processes in shared memory, only their name
+and shape go through the pool's pipe.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import stat
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import fitz  # PyMuPDF
+import numpy as np
+from prometheus_client import start_http_server
+
+from src.functions.ocr_client import OCR_SERVICE_SOCKET, read_message, write_message
+from src.functions.rfil_utils import render_page, ocr_page_image, page_text_block, warm_up_ocr
+from src.functions.logging_config import configure_logging, set_request_id, call_with_request_id
+from src.integration.metrics import gauge_callbacks
+
+logger = logging.getLogger(__name__)
+
+OCR_SERVICE_WORKERS = int(os.getenv("OCR_SERVICE_WORKERS", "0")) or os.cpu_count() or 1
+# Rendered pages held in shared memory at once (defaults to 2 x workers)
+OCR_SERVICE_MAX_PAGES = int(os.getenv("OCR_SERVICE_MAX_PAGES", "0"))
+# Port of the service's /metrics (0 disables)
+OCR_SERVICE_METRICS_PORT = int(os.getenv("OCR_SERVICE_METRICS_PORT", "0"))
+OCR_SERVICE_WARMUP_LANGUAGE = os.getenv("OCR_SERVICE_WARMUP_LANGUAGE", "bul")
+
+
+def ocr_shared_page(shm_name: str, shape: tuple, page_num: int, language: str, render_seconds: float):
+    """
+    OCR one rendered page stored in shared memory. Runs in an OCR process.
+    """
+    page_info = {"page": page_num + 1, "rotation": 0, "ocr_confidence": None, "characters": 0,
+                 "timings": {"render": render_seconds}}
+    word_confidences = {}
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        img_cv = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        try:
+            page_text = ocr_page_image(img_cv, page_num, language, True, word_confidences, page_info)
+        except Exception as e:
+            logger.error(f"Error processing page {page_num+1}: {str(e)}")
+            page_info["error"] = str(e)
+            page_text = None
+        del img_cv
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # An image still points into the block; it is unmapped with the image
+            pass
+    return {"text": page_text, "page": page_info, "word_confidences": word_confidences}
+
+
+def render_shared_page(doc, page_num: int):
+    """
+    Render a page and copy it into a new shared memory block
+    """
+    start = time.perf_counter()
+    img_cv = render_page(doc, page_num)
+    shm = shared_memory.SharedMemory(create=True, size=img_cv.nbytes)
+    view = np.ndarray(img_cv.shape, dtype=np.uint8, buffer=shm.buf)
+    view[:] = img_cv
+    del view
+    return shm, img_cv.shape, round(time.perf_counter() - start, 4)
+
+
+def failed_page(page_num: int, error: str):
+    return {
+        "text": None,
+        "page": {"page": page_num + 1, "rotation": 0, "ocr_confidence": None, "characters": 0,
+                 "timings": {}, "error": error},
+        "word_confidences": {},
+    }
+
+
+def release_shared_page(shm):
+    shm.close()
+    shm.unlink()
+
+
+async def wait_for_disconnect(reader: asyncio.StreamReader):
+    """
+    Return once the client closed its end; a client sends nothing after its
+    request, so anything read before EOF is ignored
+    """
+    try:
+        while await reader.read(4096):
+            pass
+    except ConnectionError:
+        pass
+
+
+class OcrService:
+    """
+    Unix socket server in front of a process pool of OCR workers.
+
+    Each connection carries one request: "ocr" (a PDF path, answered with
+    the rfil_utils.ocr_pdf result) or "stats". Pages of every document in
+    progress share max_pages slots, so rendering stays just ahead of OCR
+    and shared memory use is bounded.
+    """
+
+    def __init__(self, socket_path: str = OCR_SERVICE_SOCKET, workers: int = OCR_SERVICE_WORKERS,
+                 max_pages: int = OCR_SERVICE_MAX_PAGES):
+        self.socket_path = socket_path
+        self.workers = workers
+        self.max_pages = max_pages or 2 * workers
+        self.executor = None
+        self.server = None
+        self.page_slots = None
+        self.jobs = 0
+        self.pages_waiting = 0
+        self.pages_in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.pages_done = 0
+        self.started_at = None
+
+    def _create_executor(self):
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _replace_broken_executor(self, executor, error: BrokenProcessPool):
+        # Every page of a broken pool fails; only the first failure of the
+        # current pool replaces it
+        if executor is not self.executor:
+            return
+        logger.error(f"OCR process pool broken, restarting it: {str(error)}")
+        self.executor = self._create_executor()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def start(self, warm_up_language: str = OCR_SERVICE_WARMUP_LANGUAGE):
+        self.executor = self._create_executor()
+        self.page_slots = asyncio.Semaphore(self.max_pages)
+        if warm_up_language:
+            await self.warm_up(warm_up_language)
+
+        # A socket left behind by a previous run would make bind() fail
+        if os.path.exists(self.socket_path) and stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+            os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        self.started_at = time.time()
+        logger.info(f"OCR service listening on {self.socket_path} with {self.workers} workers")
+
+    async def warm_up(self, language: str):
+        """
+        Start every OCR process and run Tesseract once in each
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(
+                loop.run_in_executor(executor, warm_up_ocr, language) for _ in range(self.workers)
+            ))
+        except BrokenProcessPool as e:
+            self._replace_broken_executor(executor, e)
+            return
+        except Exception as e:
+            # Serve anyway; the failure shows up in the pages' errors
+            logger.warning(f"OCR warm-up failed: {str(e)}")
+            return
+        logger.info(f"Warmed up {self.workers} OCR workers in {time.perf_counter() - start:.2f}s")
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            message = await read_message(reader)
+        except (asyncio.IncompleteReadError, ValueError) as e:
+            logger.warning(f"Invalid request: {str(e)}")
+            writer.close()
+            return
+
+        op = message.get("op")
+        try:
+            if op == "ocr":
+                result = await self._ocr_while_connected(reader, message)
+                if result is None:
+                    writer.close()
+                    return
+                response = {"status": "ok", "result": result}
+            elif op == "stats":
+                response = {"status": "ok", "stats": self.stats()}
+            else:
+                response = {"status": "error", "message": f"Unknown operation: {op}"}
+        except Exception as e:
+            logger.error(f"{op} request failed: {str(e)}")
+            response = {"status": "error", "message": str(e)}
+
+        try:
+            await write_message(writer, response)
+        except ConnectionError:
+            logger.warning(f"Client went away before the {op} response was sent")
+        finally:
+            writer.close()
+
+    async def _ocr_while_connected(self, reader: asyncio.StreamReader, message: dict):
+        """
+        Run an "ocr" request, cancelling its pages if the client closes the
+        connection first (e.g. it timed out); returns None in that case
+        """
+        job = asyncio.ensure_future(self.ocr_pdf(
+            message["pdf_path"], message.get("language") or 'bul', message.get("request_id")
+        ))
+        disconnected = asyncio.ensure_future(wait_for_disconnect(reader))
+        try:
+            await asyncio.wait([job, disconnected], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            disconnected.cancel()
+        if job.done():
+            return job.result()
+
+        logger.warning(f"Client went away, cancelling OCR of {message['pdf_path']}")
+        self.cancelled += 1
+        job.cancel()
+        try:
+            await job
+        except asyncio.CancelledError:
+            pass
+        return None
+
+    async def ocr_pdf(self, pdf_path: str, language: str = 'bul', request_id: str = None):
+        # Each connection is its own task, so this only tags this job's logs
+        set_request_id(request_id)
+        stage_start = time.time()
+        try:
+            doc = await asyncio.to_thread(fitz.open, pdf_path)
+        except Exception as e:
+            logger.error(f"General error in text extraction: {str(e)}")
+            self.failed += 1
+            return {"text": None, "pages": [], "word_confidences": {}, "seconds": round(time.time() - stage_start, 3)}
+
+        page_count = len(doc)
+        remaining = page_count
+        self.jobs += 1
+        self.pages_waiting += page_count
+        pages = [None] * page_count
+        tasks = {}
+        try:
+            for page_num in range(page_count):
+                await self.page_slots.acquire()
+                self.pages_waiting -= 1
+                remaining -= 1
+                try:
+                    # PyMuPDF documents are not thread-safe: one page at a time
+                    shared_page = await asyncio.to_thread(render_shared_page, doc, page_num)
+                except Exception as e:
+                    self.page_slots.release()
+                    logger.error(f"Error processing page {page_num+1}: {str(e)}")
+                    pages[page_num] = failed_page(page_num, str(e))
+                    continue
+                self.pages_in_flight += 1
+                tasks[page_num] = asyncio.ensure_future(self._ocr_page(shared_page, page_num, language, request_id))
+            for page_num, page in zip(tasks, await asyncio.gather(*tasks.values())):
+                pages[page_num] = page
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        finally:
+            self.pages_waiting -= remaining
+            self.jobs -= 1
+            doc.close()
+
+        text = ""
+        page_details = []
+        word_confidences = {}
+        for page_num, page in enumerate(pages):
+            page_details.append(page["page"])
+            if page["text"] is not None:
+                text += page_text_block(page_num, page["text"])
+            for word, conf in page["word_confidences"].items():
+                if word not in word_confidences or conf < word_confidences[word]:
+                    word_confidences[word] = conf
+        self.completed += 1
+        return {
+            "text": text,
+            "pages": page_details,
+            "word_confidences": word_confidences,
+            "seconds": round(time.time() - stage_start, 3)
+        }
+
+    async def _ocr_page(self, shared_page, page_num: int, language: str, request_id: str):
+        shm, shape, render_seconds = shared_page
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(
+                executor, call_with_request_id, request_id,
+                ocr_shared_page, shm.name, shape, page_num, language, render_seconds
+            )
+        except BrokenProcessPool as e:
+            self._replace_broken_executor(executor, e)
+            return failed_page(page_num, "OCR worker died")
+        finally:
+            # Unlinking while a cancelled page is still being read is safe,
+            # the worker's mapping stays valid until it closes it
+            release_shared_page(shm)
+            self.pages_in_flight -= 1
+            self.pages_done += 1
+            self.page_slots.release()
+
+    def queue_depth(self) -> int:
+        """
+        Pages waiting for an OCR process: the autoscaling signal
+        """
+        return self.pages_waiting + max(0, self.pages_in_flight - self.workers)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pages": self.max_pages,
+            "jobs": self.jobs,
+            "queue_depth": self.queue_depth(),
+            "pages_waiting": self.pages_waiting,
+            "pages_in_flight": self.pages_in_flight,
+            "pages_done": self.pages_done,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else 0,
+        }
+
+
+async def serve(service: OcrService):
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop_event.set)
+    await service.start()
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("OCR service shutting down")
+        await service.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=OCR_SERVICE_SOCKET, help="Unix socket path (OCR_SERVICE_SOCKET)")
+    parser.add_argument("--workers", type=int, default=OCR_SERVICE_WORKERS, help="OCR processes (OCR_SERVICE_WORKERS)")
+    parser.add_argument("--max-pages", type=int, default=OCR_SERVICE_MAX_PAGES,
+                        help="Rendered pages in shared memory at once (OCR_SERVICE_MAX_PAGES)")
+    parser.add_argument("--metrics-port", type=int, default=OCR_SERVICE_METRICS_PORT,
+                        help="Serve Prometheus metrics on this port (OCR_SERVICE_METRICS_PORT)")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("set --socket or OCR_SERVICE_SOCKET")
+
+    configure_logging()
+    service = OcrService(args.socket, args.workers, args.max_pages)
+    gauge_callbacks.add("ocr_service_queue_depth", "Pages waiting for an OCR process", None, service.queue_depth)
+    gauge_callbacks.add("ocr_service_jobs", "Documents being processed by the OCR service", None, lambda: service.jobs)
+    gauge_callbacks.add("ocr_service_pages_in_flight", "Rendered pages in shared memory", None, lambda: service.pages_in_flight)
+    gauge_callbacks.add("ocr_service_workers", "OCR processes of the service", None, lambda: service.workers)
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    asyncio.run(serve(service))
+
+
+if __name__ == "__main__":
+    main()
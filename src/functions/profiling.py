@@ -0,0 +1,262 @@
+import hmac
+import logging
+import marshal
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Share of RFIL requests profiled without being asked (0 disables)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Sending this value in X-Profile profiles a request; it also protects the
+# admin endpoints. Unset disables both.
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "haiper_profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", str(2 * 1024 * 1024)))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+MAX_STACK_DEPTH = 128
+PROFILE_SUFFIX = ".speedscope.json"
+
+
+def token_matches(value: str) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and bool(value) and hmac.compare_digest(value, PROFILE_ADMIN_TOKEN)
+
+
+def should_profile(profile_header: str = None) -> bool:
+    """
+    Cheap check made for every RFIL request: an admin X-Profile header or
+    the sampling rate
+    """
+    if profile_header is not None and token_matches(profile_header):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread records the stacks of the
+    threads running call() every `interval` seconds. Only runs while a
+    profiled request is in progress. The event loop thread is not sampled:
+    it interleaves every request of the worker, so its stacks would not
+    belong to the profiled one.
+    """
+
+    def __init__(self, name: str, interval: float = PROFILE_INTERVAL, max_seconds: float = PROFILE_MAX_SECONDS):
+        self.name = name
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.threads = {}
+        self.stacks = {}
+        self.frames = {}
+        self.started_at = None
+        self.duration = 0.0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.time() - self.started_at
+
+    def call(self, function, *args, **kwargs):
+        """
+        Run function on the calling thread (e.g. from asyncio.to_thread)
+        with that thread sampled as well
+        """
+        ident = threading.get_ident()
+        self.threads[ident] = getattr(function, "__name__", "worker")
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.threads.pop(ident, None)
+
+    def _frame_index(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                logger.warning(f"Profile {self.name} stopped after {self.max_seconds}s")
+                break
+            current = sys._current_frames()
+            for ident, thread_name in list(self.threads.items()):
+                frame = current.get(ident)
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    stack.append(self._frame_index(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    stack.reverse()
+                    counter = self.stacks.setdefault(thread_name, Counter())
+                    counter[tuple(stack)] += 1
+            self.samples += 1
+
+    def to_speedscope(self, metadata: dict = None, max_stacks: int = None):
+        """
+        speedscope "sampled" profile, one per thread; samples are aggregated
+        stacks weighted by seconds. Only the max_stacks heaviest stacks of
+        each thread are kept.
+        """
+        frames = [None] * len(self.frames)
+        for (name, filename, line), index in self.frames.items():
+            frames[index] = {"name": name, "file": filename, "line": line}
+
+        profiles = []
+        for thread_name, counter in self.stacks.items():
+            stacks = counter.most_common(max_stacks)
+            profiles.append({
+                "type": "sampled",
+                "name": f"{self.name} ({thread_name})",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(self.duration, 6),
+                "samples": [list(stack) for stack, _ in stacks],
+                "weights": [round(count * self.interval, 6) for _, count in stacks],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "haiper_api",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "metadata": dict(metadata or {}, samples=self.samples, interval=self.interval,
+                             duration=round(self.duration, 6), startedAt=self.started_at,
+                             truncated=max_stacks is not None),
+        }
+
+
+def speedscope_to_pstats(profile: dict) -> bytes:
+    """
+    Convert a stored speedscope profile into a marshalled pstats file
+    (load with pstats.Stats(path)). Call counts are sample counts.
+    """
+    frames = [(frame["file"], frame["line"], frame["name"]) for frame in profile["shared"]["frames"]]
+    interval = profile.get("metadata", {}).get("interval") or PROFILE_INTERVAL
+    stats = {}
+
+    def entry(function):
+        if function not in stats:
+            stats[function] = [0, 0, 0.0, 0.0, {}]
+        return stats[function]
+
+    for thread_profile in profile["profiles"]:
+        for stack, weight in zip(thread_profile["samples"], thread_profile["weights"]):
+            samples = max(1, round(weight / interval))
+            functions = [frames[index] for index in stack]
+            seen = set()
+            for depth, function in enumerate(functions):
+                data = entry(function)
+                if function not in seen:
+                    # Recursion counts once towards inclusive time
+                    seen.add(function)
+                    data[0] += samples
+                    data[1] += samples
+                    data[3] += weight
+                if depth > 0:
+                    caller = data[4].setdefault(functions[depth - 1], [0, 0, 0.0, 0.0])
+                    caller[0] += samples
+                    caller[1] += samples
+                    caller[3] += weight
+            entry(functions[-1])[2] += weight
+
+    return marshal.dumps({
+        function: (cc, nc, tt, ct, {caller: tuple(values) for caller, values in callers.items()})
+        for function, (cc, nc, tt, ct, callers) in stats.items()
+    })
+
+
+class ProfileStore:
+    """
+    Profiles on disk, one file per request id; the oldest files are removed
+    beyond max_files
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES, max_bytes: int = PROFILE_MAX_BYTES):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+    def path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}{PROFILE_SUFFIX}")
+
+    def save(self, profiler: SamplingProfiler, metadata: dict = None):
+        # Drop the lightest stacks until the profile fits in max_bytes
+        max_stacks = None
+        body = orjson.dumps(profiler.to_speedscope(metadata))
+        while len(body) > self.max_bytes:
+            largest = max((len(counter) for counter in profiler.stacks.values()), default=0)
+            max_stacks = (max_stacks or largest) // 2
+            if max_stacks < 1:
+                logger.warning(f"Profile {profiler.name} is too large to store")
+                return None
+            body = orjson.dumps(profiler.to_speedscope(metadata, max_stacks))
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(profiler.name)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as profile_file:
+            profile_file.write(body)
+        os.replace(temp_path, path)
+        self.rotate()
+        return path
+
+    def rotate(self):
+        profiles = self.list()
+        for profile in profiles[self.max_files:]:
+            try:
+                os.remove(self.path(profile["id"]))
+            except OSError:
+                pass
+
+    def list(self):
+        """
+        Stored profiles, newest first
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(PROFILE_SUFFIX):
+                continue
+            stat = os.stat(os.path.join(self.directory, filename))
+            profiles.append({
+                "id": filename[:-len(PROFILE_SUFFIX)],
+                "size": stat.st_size,
+                "modified": stat.st_mtime,
+            })
+        profiles.sort(key=lambda profile: profile["modified"], reverse=True)
+        return profiles
+
+    def load(self, profile_id: str):
+        path = self.path(profile_id)
+        # Ids are request ids, but never let one point outside the directory
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.directory) or not os.path.isfile(path):
+            return None
+        with open(path, "rb") as profile_file:
+            return profile_file.read()
+
+
+profile_store = ProfileStore()
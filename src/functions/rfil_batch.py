@@ -0,0 +1,503 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+import uuid
+import zipfile
+
+import fitz  # PyMuPDF
+
+from src.functions.rfil_utils import no_text_result, request_entities_async, validate_entities, build_pdf_result
+from src.functions.admission import AdmissionRejected, RFIL_MAX_UPLOAD_BYTES, RFIL_MAX_PAGES
+from src.functions.logging_config import get_request_id, set_request_id
+from src.integration.metrics import observe_stage, record_ocr_result
+from src.prompts.rfil_prompts import BATCH_ENTITY_EXTRACTION_PROMPT
+
+logger = logging.getLogger(__name__)
+
+RFIL_BATCH_MAX_DOCUMENTS = int(os.getenv("RFIL_BATCH_MAX_DOCUMENTS", "50"))
+# Estimated prompt tokens of one combined entity extraction request
+RFIL_BATCH_TOKEN_BUDGET = int(os.getenv("RFIL_BATCH_TOKEN_BUDGET", "8000"))
+# Rough tokens per character of OCR text, for Bulgarian
+RFIL_BATCH_CHARS_PER_TOKEN = float(os.getenv("RFIL_BATCH_CHARS_PER_TOKEN", "2.5"))
+# How long a partly filled request waits for more documents to finish OCR
+RFIL_BATCH_PACK_WAIT = float(os.getenv("RFIL_BATCH_PACK_WAIT", "1.0"))
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or "") / RFIL_BATCH_CHARS_PER_TOKEN)
+
+
+def document_header(number: int) -> str:
+    return f"=== DOCUMENT {number} ==="
+
+
+class BatchDocument:
+    def __init__(self, index: int, filename: str, path: str = None, content_hash: str = None, error: str = None):
+        self.index = index
+        self.filename = filename
+        self.path = path
+        self.content_hash = content_hash
+        self.error = error
+        self.file_id = str(uuid.uuid4())
+        self.page_count = None
+        self.ticket = None
+        self.ocr_result = None
+        self.result = None
+        self.batched_with = 1
+        self.timings = {}
+        self.start_time = time.time()
+
+
+def is_pdf_name(name: str) -> bool:
+    return (name or "").lower().endswith(".pdf")
+
+
+def is_zip_name(name: str) -> bool:
+    return (name or "").lower().endswith(".zip")
+
+
+def archive_members(archive: zipfile.ZipFile):
+    """
+    Files of an archive, without directories and macOS metadata
+    """
+    for member in archive.infolist():
+        name = os.path.basename(member.filename)
+        if member.is_dir() or member.filename.startswith("__MACOSX/") or name.startswith("._"):
+            continue
+        yield member
+
+
+def count_batch_documents(uploads) -> int:
+    """
+    Files in the batch, counting the members of ZIP archives. Only the
+    archives' central directories are read.
+    """
+    count = 0
+    for upload in uploads:
+        if is_zip_name(upload.filename):
+            try:
+                with zipfile.ZipFile(upload.file) as archive:
+                    count += sum(1 for _ in archive_members(archive))
+            except zipfile.BadZipFile:
+                count += 1
+            upload.file.seek(0)
+        else:
+            count += 1
+    return count
+
+
+def copy_limited(source, path: str, max_bytes: int) -> str:
+    """
+    Copy a file object to path in chunks and return its SHA-256. Raises
+    ValueError beyond max_bytes, whatever size an archive claims.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as target:
+        while True:
+            chunk = source.read(COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"The PDF file is larger than {max_bytes} bytes")
+            digest.update(chunk)
+            target.write(chunk)
+    return digest.hexdigest()
+
+
+def iter_batch_documents(uploads, temp_dir: str, max_bytes: int = RFIL_MAX_UPLOAD_BYTES):
+    """
+    Write the PDFs of the uploads (PDF files or ZIP archives) to temp_dir
+    one at a time, yielding a BatchDocument for each. Archives are unpacked
+    member by member as the documents are consumed. Blocking: iterate it
+    from a thread.
+    """
+    index = 0
+
+    def save(filename, source):
+        # The file belongs to the consumer only once it asks for the next
+        # document; a partial copy, or a document the generator is closed
+        # on (e.g. the client went away), is removed here
+        nonlocal index
+        index += 1
+        path = os.path.join(temp_dir, f"{uuid.uuid4()}.pdf")
+        handed_over = False
+        try:
+            try:
+                content_hash = copy_limited(source, path, max_bytes)
+            except (ValueError, OSError, zipfile.BadZipFile) as e:
+                if os.path.exists(path):
+                    os.remove(path)
+                yield BatchDocument(index, filename, error=str(e))
+                return
+            yield BatchDocument(index, filename, path, content_hash)
+            handed_over = True
+        finally:
+            if not handed_over and os.path.exists(path):
+                os.remove(path)
+
+    for upload in uploads:
+        if is_pdf_name(upload.filename):
+            yield from save(upload.filename, upload.file)
+        elif is_zip_name(upload.filename):
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile:
+                index += 1
+                yield BatchDocument(index, upload.filename, error="The file is not a valid ZIP archive")
+                continue
+            with archive:
+                for member in archive_members(archive):
+                    filename = f"{upload.filename}/{member.filename}"
+                    if not is_pdf_name(member.filename):
+                        index += 1
+                        yield BatchDocument(index, filename, error="Only PDF files are accepted")
+                    elif member.file_size > max_bytes:
+                        index += 1
+                        yield BatchDocument(index, filename, error=f"The PDF file is larger than {max_bytes} bytes")
+                    else:
+                        with archive.open(member) as source:
+                            yield from save(filename, source)
+        else:
+            index += 1
+            yield BatchDocument(index, upload.filename, error="Only PDF and ZIP files are accepted")
+
+
+def count_pdf_file_pages(path: str) -> int:
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def split_batch_entities(combined: dict, texts: list):
+    """
+    Attribute the entities of a combined request to their documents: by the
+    "document" number the model returned, or else to the one document whose
+    text contains the identification number. Returns one entity result per
+    text and the number of entities that could not be attributed.
+    """
+    shared = {key: value for key, value in combined.items() if key != "entities"}
+    results = [dict(shared, entities=[]) for _ in texts]
+    unattributed = 0
+    for entity in combined.get("entities") or []:
+        if not isinstance(entity, dict):
+            continue
+        try:
+            number = int(entity.pop("document", None))
+        except (TypeError, ValueError):
+            number = None
+        if number is None or not 1 <= number <= len(texts):
+            identification_number = str(entity.get("identification_number") or "").strip()
+            matches = [i for i, text in enumerate(texts) if identification_number and identification_number in text]
+            number = matches[0] + 1 if len(matches) == 1 else None
+        if number is None:
+            unattributed += 1
+            continue
+        results[number - 1]["entities"].append(entity)
+    return results, unattributed
+
+
+class RfilBatch:
+    """
+    Processes the documents of one batch request and yields each one as
+    soon as its result is ready.
+
+    Documents are admitted one at a time (rfil_admission) and OCR'd on the
+    RFIL pipeline's OCR processes or the OCR service; the admission ticket is
+    released once the text is extracted. Texts then wait up to pack_wait
+    seconds to be packed, up to token_budget estimated tokens, into one
+    combined entity extraction request, whose entities are attributed back
+    to their documents. A document larger than the budget is sent alone.
+    """
+
+    def __init__(self, pipeline, documents, admission, ocr_language: str = 'bul',
+                 token_budget: int = RFIL_BATCH_TOKEN_BUDGET, pack_wait: float = RFIL_BATCH_PACK_WAIT,
+                 llm_concurrency: int = None, max_pages: int = RFIL_MAX_PAGES):
+        self.pipeline = pipeline
+        self.documents = documents
+        self.admission = admission
+        self.ocr_language = ocr_language
+        self.token_budget = token_budget
+        self.pack_wait = pack_wait
+        self.llm_concurrency = llm_concurrency or pipeline.llm_concurrency
+        self.max_pages = max_pages
+        self.request_id = get_request_id()
+        self.received = 0
+        self.pending = 0
+        self.ocr_pending = 0
+        self.feed_done = False
+        self.packer_closed = False
+        self.results_closed = False
+        self.llm_requests = 0
+        self.unattributed = 0
+        self.start_time = time.time()
+        self._results = None
+        self._llm_queue = None
+        self._llm_slots = None
+        self._tasks = set()
+        self._seen = []
+        self._next_document = None
+
+    async def run(self):
+        self._results = asyncio.Queue()
+        self._llm_queue = asyncio.Queue()
+        self._llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        self._spawn(self._feed())
+        self._spawn(self._pack())
+        try:
+            while True:
+                doc = await self._results.get()
+                if doc is None:
+                    break
+                yield doc
+        finally:
+            await self._close()
+
+    def stats(self):
+        return {
+            "documents": self.received,
+            "llm_requests": self.llm_requests,
+            "unattributed_entities": self.unattributed,
+            "processing_time": f"{time.time() - self.start_time:.2f} seconds",
+        }
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Batch task failed: {str(task.exception())}")
+
+    async def _close(self):
+        # The client went away or every document is done
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._next_document is not None:
+            # next() runs in a thread that can not be interrupted; once it
+            # returns the generator can be closed and clean up after itself
+            await asyncio.gather(self._next_document, return_exceptions=True)
+        close = getattr(self.documents, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                # Still running in a cancelled thread
+                pass
+        for doc in self._seen:
+            self._cleanup(doc)
+
+    def _release(self, doc: BatchDocument):
+        # OCR that outlived a timeout keeps its capacity until it ends
+        if doc.ticket is not None:
+            self.admission.release(doc.ticket, after=self.pipeline.running_ocr(doc.path))
+            doc.ticket = None
+
+    def _cleanup(self, doc: BatchDocument):
+        self._release(doc)
+        if doc.path and os.path.exists(doc.path):
+            os.remove(doc.path)
+
+    def _finish(self, doc: BatchDocument):
+        self._cleanup(doc)
+        self.pending -= 1
+        self._results.put_nowait(doc)
+        self._check_done()
+
+    def _check_done(self):
+        if self.feed_done and self.ocr_pending == 0 and not self.packer_closed:
+            # Nothing else can reach the packer: send what it holds
+            self.packer_closed = True
+            self._llm_queue.put_nowait(None)
+        if self.feed_done and self.pending == 0 and not self.results_closed:
+            self.results_closed = True
+            self._results.put_nowait(None)
+
+    async def _admit(self, pages: int):
+        # A batch waits for capacity instead of failing its documents
+        while True:
+            try:
+                return await self.admission.acquire(pages)
+            except AdmissionRejected as e:
+                await asyncio.sleep(e.retry_after)
+
+    async def _feed(self):
+        set_request_id(self.request_id)
+        iterator = iter(self.documents)
+        try:
+            while True:
+                self._next_document = asyncio.ensure_future(asyncio.to_thread(next, iterator, None))
+                doc = await asyncio.shield(self._next_document)
+                self._next_document = None
+                if doc is None:
+                    break
+                self._seen.append(doc)
+                self.received += 1
+                self.pending += 1
+                if doc.error:
+                    self._finish(doc)
+                    continue
+                try:
+                    doc.page_count = await asyncio.to_thread(count_pdf_file_pages, doc.path)
+                except Exception as e:
+                    logger.error(f"Invalid PDF format in {doc.filename}: {str(e)}")
+                    doc.error = "The file is not a valid PDF"
+                if not doc.error and doc.page_count < 1:
+                    doc.error = "The PDF file is empty or corrupt"
+                if not doc.error and doc.page_count > self.max_pages:
+                    doc.error = f"The PDF has {doc.page_count} pages, the limit is {self.max_pages}"
+                if doc.error:
+                    self._finish(doc)
+                    continue
+                doc.ticket = await self._admit(doc.page_count)
+                self.ocr_pending += 1
+                self._spawn(self._ocr(doc))
+        finally:
+            self.feed_done = True
+            self._check_done()
+
+    async def _ocr(self, doc: BatchDocument):
+        set_request_id(self.request_id)
+        try:
+            doc.ocr_result = await self.pipeline.extract_text(doc.path, self.ocr_language, self.request_id)
+        except Exception as e:
+            logger.error(f"OCR failed for {doc.filename}: {str(e)}")
+            doc.error = "Error extracting text from the PDF"
+        finally:
+            self._release(doc)
+            self.ocr_pending -= 1
+
+        if not doc.error:
+            extracted_text = doc.ocr_result["text"]
+            doc.timings["text_extraction"] = doc.ocr_result["seconds"]
+            observe_stage("text_extraction", doc.ocr_result["seconds"])
+            record_ocr_result(doc.ocr_result["pages"], extracted_text)
+            if extracted_text and extracted_text.strip():
+                self._llm_queue.put_nowait(doc)
+            else:
+                doc.result = no_text_result(doc.path)
+                self._finish(doc)
+        else:
+            self._finish(doc)
+        self._check_done()
+
+    async def _pack(self):
+        pack, tokens, deadline = [], 0, None
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if pack else None
+            try:
+                doc = await asyncio.wait_for(self._llm_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                self._flush(pack)
+                pack, tokens = [], 0
+                continue
+            if doc is None:
+                self._flush(pack)
+                return
+            doc_tokens = estimate_tokens(doc.ocr_result["text"])
+            if pack and tokens + doc_tokens > self.token_budget:
+                self._flush(pack)
+                pack, tokens = [], 0
+            if not pack:
+                deadline = time.monotonic() + self.pack_wait
+            pack.append(doc)
+            tokens += doc_tokens
+            if tokens >= self.token_budget:
+                self._flush(pack)
+                pack, tokens = [], 0
+
+    def _flush(self, pack: list):
+        if pack:
+            self._spawn(self._extract(pack))
+
+    async def _extract(self, pack: list):
+        set_request_id(self.request_id)
+        texts = [doc.ocr_result["text"] for doc in pack]
+        try:
+            async with self._llm_slots:
+                stage_start = time.time()
+                if len(pack) == 1:
+                    entity_results = [await request_entities_async(texts[0])]
+                    self.llm_requests += 1
+                else:
+                    combined_text = "\n\n".join(
+                        f"{document_header(number)}\n{text}" for number, text in enumerate(texts, start=1)
+                    )
+                    combined = await request_entities_async(combined_text, system_prompt=BATCH_ENTITY_EXTRACTION_PROMPT)
+                    self.llm_requests += 1
+                    if combined and "error" not in combined:
+                        entity_results, unattributed = split_batch_entities(combined, texts)
+                        if unattributed:
+                            logger.warning(f"{unattributed} entities of a combined request could not be attributed")
+                            self.unattributed += unattributed
+                    else:
+                        logger.warning(f"Combined entity extraction for {len(pack)} documents failed, requesting them one by one")
+                        entity_results = await asyncio.gather(*(request_entities_async(text) for text in texts))
+                        self.llm_requests += len(pack)
+                seconds = round(time.time() - stage_start, 3)
+        except Exception as e:
+            logger.error(f"Entity extraction failed for {len(pack)} documents: {str(e)}")
+            entity_results = [{"error": "Unexpected error during entity extraction"}] * len(pack)
+            seconds = None
+
+        for doc, entities in zip(pack, entity_results):
+            doc.batched_with = len(pack)
+            doc.timings["entity_extraction"] = seconds
+            observe_stage("entity_extraction", seconds)
+            self._spawn(self._validate(doc, entities))
+
+    async def _validate(self, doc: BatchDocument, entities):
+        set_request_id(self.request_id)
+        try:
+            if entities and "error" not in entities:
+                # Identifier repair is CPU work, keep it off the event loop
+                entities = await asyncio.to_thread(validate_entities, entities, doc.ocr_result["word_confidences"])
+            doc.result = build_pdf_result(
+                entities, doc.ocr_result["text"], doc.ocr_result["pages"],
+                doc.timings, doc.start_time, include_text=True
+            )
+        except Exception as e:
+            logger.error(f"Validation failed for {doc.filename}: {str(e)}")
+            doc.result = {"error": "Error extracting entities"}
+        self._finish(doc)
+
+
+def document_response(doc: BatchDocument):
+    """
+    The line streamed for a document, shaped like the response of
+    POST /api/workflow/rfil, and the extracted text to store with it
+    """
+    response = {
+        "index": doc.index,
+        "filename": doc.filename,
+        "file_id": doc.file_id,
+    }
+    if doc.error or doc.result is None or "error" in doc.result:
+        message = doc.error or f"Error processing PDF: {(doc.result or {}).get('error', 'unknown error')}"
+        response.update({"status": "error", "message": message})
+        return response, None
+
+    process_results = dict(doc.result)
+    extracted_text = process_results.pop("extracted_text", None)
+    response.update({
+        "status": "success",
+        "message": "PDF file has been processed successfully",
+        "pages": doc.page_count,
+        "process_results": process_results,
+        "batched_with": doc.batched_with,
+        "processing_time": f"{time.time() - doc.start_time:.2f} seconds",
+        "content_hash": doc.content_hash,
+    })
+    if "text_length" in process_results:
+        response["text_length"] = process_results["text_length"]
+    if "entities" in process_results:
+        response["entity_count"] = len(process_results["entities"])
+    return response, extracted_text
@@ -0,0 +1,100 @@
+import asyncio
+import importlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Load and warm up the OCR stack (cv2, fitz, numpy, PIL, pytesseract, the
+# OpenAI SDK) when the worker starts instead of on the first RFIL request
+RFIL_PRELOAD = os.getenv("RFIL_PRELOAD", "false").lower() == "true"
+RFIL_PIPELINE_ENABLED = os.getenv("RFIL_PIPELINE_ENABLED", "true").lower() == "true"
+
+RFIL_UTILS_MODULE = "src.functions.rfil_utils"
+RFIL_PIPELINE_MODULE = "src.functions.rfil_pipeline"
+RFIL_BATCH_MODULE = "src.functions.rfil_batch"
+AZURE_OPENAI_MODULE = "src.providers.azure_openai"
+
+_load_lock = None
+_load_seconds = None
+# Modules whose import finished. sys.modules is not enough: a module is
+# put there before its body runs, so a concurrent request would see it
+# half initialised.
+_loaded = {}
+
+
+async def _load(name: str):
+    global _load_lock, _load_seconds
+    module = _loaded.get(name)
+    if module is not None:
+        return module
+    if _load_lock is None:
+        _load_lock = asyncio.Lock()
+    async with _load_lock:
+        module = _loaded.get(name)
+        if module is None:
+            # Importing takes about a second; keep it off the event loop.
+            # import_module waits for an import already running in another thread.
+            start = time.perf_counter()
+            module = await asyncio.to_thread(importlib.import_module, name)
+            seconds = time.perf_counter() - start
+            _load_seconds = (_load_seconds or 0.0) + seconds
+            _loaded[name] = module
+            logger.info(f"Loaded {name} in {seconds:.2f}s")
+    return module
+
+
+async def load_rfil_utils():
+    """
+    The src.functions.rfil_utils module, imported on first use
+    """
+    return await _load(RFIL_UTILS_MODULE)
+
+
+async def load_rfil_pipeline():
+    """
+    The worker's RfilPipeline, imported on first use
+    """
+    return (await _load(RFIL_PIPELINE_MODULE)).rfil_pipeline
+
+
+async def load_rfil_batch():
+    """
+    The src.functions.rfil_batch module, imported on first use
+    """
+    return await _load(RFIL_BATCH_MODULE)
+
+
+async def warm_up_rfil(language: str = 'bul'):
+    """
+    Load the OCR stack and run Tesseract once, in every OCR process when
+    the pipeline is enabled
+    """
+    rfil_utils = await load_rfil_utils()
+    if RFIL_PIPELINE_ENABLED:
+        return await (await load_rfil_pipeline()).warm_up(language)
+    return {"tesseract_seconds": await asyncio.to_thread(rfil_utils.warm_up_ocr, language)}
+
+
+async def warm_up_llm():
+    """
+    Open the connection of the async Azure OpenAI client used by the pipeline
+    """
+    return await (await _load(AZURE_OPENAI_MODULE)).warm_up_async_client()
+
+
+def loaded_rfil_pipeline():
+    """
+    The RfilPipeline if it was already loaded, otherwise None
+    """
+    module = _loaded.get(RFIL_PIPELINE_MODULE)
+    return module.rfil_pipeline if module is not None else None
+
+
+def rfil_loader_stats():
+    return {
+        "loaded": RFIL_UTILS_MODULE in _loaded or RFIL_PIPELINE_MODULE in _loaded,
+        "preload": RFIL_PRELOAD,
+        "load_seconds": round(_load_seconds, 3) if _load_seconds is not None else None,
+    }
@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.functions.rfil_utils import (
+    check_pdf_file, ocr_pdf, save_pdf_text, no_text_result, warm_up_ocr,
+    request_entities_async, validate_entities, build_pdf_result
+)
+from src.integration.metrics import observe_stage, record_ocr_result
+from src.functions.logging_config import get_request_id, set_request_id, call_with_request_id
+from src.functions.ocr_client import OcrServiceClient, OCR_SERVICE_SOCKET, OCR_SERVICE_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# API worker processes of the host (uvicorn reads the same variable as the
+# default for --workers); OCR processes are shared out between them
+API_WORKERS = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+# Longest a request waits for its document to come out of the pipeline
+RFIL_JOB_TIMEOUT = float(os.getenv("RFIL_JOB_TIMEOUT", "600"))
+
+
+class RfilJob:
+    def __init__(self, pdf_path: str, ocr_language: str, save_text: bool, output_dir: str, include_text: bool):
+        self.pdf_path = pdf_path
+        self.ocr_language = ocr_language
+        self.save_text = save_text
+        self.output_dir = output_dir
+        self.include_text = include_text
+        # Stage workers are long-lived tasks, so the id travels with the job
+        self.request_id = get_request_id()
+        self.future = asyncio.get_running_loop().create_future()
+        self.start_time = time.time()
+        self.ocr_result = None
+        self.entities = None
+        self.timings = {}
+
+    def finish(self, result):
+        if not self.future.done():
+            self.future.set_result(result)
+
+
+class RfilPipeline:
+    """
+    RFIL processing as three stages joined by bounded queues:
+
+    OCR (CPU-bound, process pool) -> entity extraction (LLM calls, async)
+    -> validation and result assembly.
+
+    Every stage has its own number of workers, so while one document waits
+    for the model the OCR workers already render the next ones. A full
+    queue makes the stage in front of it wait, and submit() waits when the
+    OCR queue is full, so work in flight stays bounded.
+
+    With OCR_SERVICE_SOCKET set, the OCR stage sends documents to the OCR
+    service (src.functions.ocr_service) instead of a process pool of its
+    own, OCR_SERVICE_CONCURRENCY at a time.
+
+    Settings (environment): RFIL_OCR_WORKERS (processes, default CPU count
+    divided by WEB_CONCURRENCY), RFIL_LLM_CONCURRENCY,
+    RFIL_VALIDATION_CONCURRENCY, RFIL_QUEUE_SIZE (capacity of each queue
+    between stages) and RFIL_JOB_TIMEOUT.
+    """
+
+    def __init__(self, ocr_workers: int = None, llm_concurrency: int = None,
+                 validation_concurrency: int = None, queue_size: int = None,
+                 ocr_service_socket: str = OCR_SERVICE_SOCKET, job_timeout: float = RFIL_JOB_TIMEOUT):
+        self.ocr_service = OcrServiceClient(ocr_service_socket) if ocr_service_socket else None
+        if self.ocr_service is not None:
+            default_ocr_workers = OCR_SERVICE_CONCURRENCY
+        else:
+            default_ocr_workers = max((os.cpu_count() or 1) // API_WORKERS, 1)
+        self.ocr_workers = ocr_workers or int(os.getenv("RFIL_OCR_WORKERS", "0")) or default_ocr_workers
+        self.llm_concurrency = llm_concurrency or int(os.getenv("RFIL_LLM_CONCURRENCY", "4"))
+        self.validation_concurrency = validation_concurrency or int(os.getenv("RFIL_VALIDATION_CONCURRENCY", "2"))
+        self.queue_size = queue_size or int(os.getenv("RFIL_QUEUE_SIZE", "0")) or 2 * self.ocr_workers
+        self.job_timeout = job_timeout
+        self.executor = None
+        self.ocr_queue = None
+        self.llm_queue = None
+        self.validation_queue = None
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self._tasks = []
+        self._jobs = set()
+        # OCR running in the process pool, by PDF path
+        self._running_ocr = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        if self.ocr_service is None:
+            self.executor = self._create_executor()
+        self.ocr_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.llm_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.validation_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = (
+            [asyncio.create_task(self._ocr_worker()) for _ in range(self.ocr_workers)]
+            + [asyncio.create_task(self._llm_worker()) for _ in range(self.llm_concurrency)]
+            + [asyncio.create_task(self._validation_worker()) for _ in range(self.validation_concurrency)]
+        )
+
+    def _create_executor(self):
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.ocr_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _replace_broken_executor(self, executor, error: BrokenProcessPool):
+        # A worker died (e.g. killed for memory); every job of the pool fails
+        # with it, so only the first failure of the current pool replaces it
+        if executor is not self.executor:
+            return
+        logger.error(f"OCR process pool broken, restarting it: {str(error)}")
+        self.executor = self._create_executor()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Queued jobs and jobs a cancelled worker was holding
+        for job in list(self._jobs):
+            job.finish({"error": "Service is shutting down"})
+        self._jobs.clear()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def warm_up(self, language: str = 'bul'):
+        """
+        Start every OCR process and run Tesseract once in each, so the
+        first documents do not pay for process start-up and imports
+        """
+        if not self.running:
+            self.start()
+        if self.ocr_service is not None:
+            # The service warms up its own processes; check it answers
+            return {"ocr_service": await self.ocr_service.stats()}
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        # Submitted together, so the pool starts all of its processes
+        try:
+            seconds = await asyncio.gather(*(
+                loop.run_in_executor(executor, warm_up_ocr, language) for _ in range(self.ocr_workers)
+            ))
+        except BrokenProcessPool as e:
+            self._replace_broken_executor(executor, e)
+            raise
+        return {"ocr_workers": self.ocr_workers, "tesseract_seconds": max(seconds)}
+
+    async def process(self, pdf_path: str, ocr_language: str = 'bul', save_text: bool = False,
+                      output_dir: str = None, include_text: bool = False):
+        """
+        Same result as process_pdf_end_to_end, produced by the pipeline
+        """
+        if not self.running:
+            self.start()
+        file_error = check_pdf_file(pdf_path)
+        if file_error:
+            return file_error
+
+        job = RfilJob(pdf_path, ocr_language, save_text, output_dir, include_text)
+        self._jobs.add(job)
+        try:
+            await self.ocr_queue.put(job)
+            # A timed out job is cancelled, so the stages skip it
+            return await asyncio.wait_for(job.future, self.job_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"RFIL processing of {pdf_path} did not finish in {self.job_timeout}s")
+            self.failed += 1
+            self.timed_out += 1
+            return {"error": "Processing the PDF took too long"}
+        finally:
+            self._jobs.discard(job)
+
+    def _fail(self, job, message: str):
+        self.failed += 1
+        job.finish({"error": message})
+
+    async def extract_text(self, pdf_path: str, ocr_language: str = 'bul', request_id: str = None):
+        """
+        OCR one PDF on the pipeline's OCR processes (or the OCR service),
+        outside the stage queues; returns the rfil_utils.ocr_pdf result
+        """
+        if not self.running:
+            self.start()
+        if self.ocr_service is not None:
+            return await self.ocr_service.ocr_pdf(pdf_path, ocr_language, request_id)
+        executor = self.executor
+        try:
+            ocr = executor.submit(call_with_request_id, request_id, ocr_pdf, pdf_path, ocr_language)
+            running = asyncio.wrap_future(ocr)
+            self._running_ocr[pdf_path] = running
+            running.add_done_callback(lambda _: self._forget_ocr(pdf_path, running))
+            try:
+                # Shielded: the future has to stay pending while the process
+                # still works on the document, see running_ocr
+                return await asyncio.wait_for(asyncio.shield(running), self.job_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Drops the document if it has not started; a running OCR
+                # can not be stopped and finishes in the background
+                ocr.cancel()
+                raise
+        except BrokenProcessPool as e:
+            self._replace_broken_executor(executor, e)
+            raise
+
+    def _forget_ocr(self, pdf_path: str, running):
+        if self._running_ocr.get(pdf_path) is running:
+            del self._running_ocr[pdf_path]
+
+    def running_ocr(self, pdf_path: str):
+        """
+        Future of the OCR of pdf_path if a pool process is still working on
+        it, e.g. after the request gave up waiting; None otherwise. Callers
+        pass it to AdmissionController.release so the capacity stays taken
+        until the process is free again.
+        """
+        running = self._running_ocr.get(pdf_path)
+        return running if running is not None and not running.done() else None
+
+    async def _ocr_worker(self):
+        while True:
+            job = await self.ocr_queue.get()
+            # The caller went away while the job was queued
+            if job.future.done():
+                continue
+            set_request_id(job.request_id)
+            try:
+                job.ocr_result = await self.extract_text(job.pdf_path, job.ocr_language, job.request_id)
+            except Exception as e:
+                logger.error(f"OCR stage failed for {job.pdf_path}: {str(e)}")
+                self._fail(job, "Error extracting text from the PDF")
+                continue
+
+            extracted_text = job.ocr_result["text"]
+            job.timings["text_extraction"] = job.ocr_result["seconds"]
+            observe_stage("text_extraction", job.ocr_result["seconds"])
+            record_ocr_result(job.ocr_result["pages"], extracted_text)
+            if extracted_text and job.save_text:
+                save_pdf_text(job.pdf_path, extracted_text, job.output_dir)
+            if not extracted_text or not extracted_text.strip():
+                job.finish(no_text_result(job.pdf_path))
+                continue
+            await self.llm_queue.put(job)
+
+    async def _llm_worker(self):
+        while True:
+            job = await self.llm_queue.get()
+            if job.future.done():
+                continue
+            set_request_id(job.request_id)
+            stage_start = time.time()
+            job.entities = await request_entities_async(job.ocr_result["text"])
+            job.timings["entity_extraction"] = round(time.time() - stage_start, 3)
+            observe_stage("entity_extraction", job.timings["entity_extraction"])
+            await self.validation_queue.put(job)
+
+    async def _validation_worker(self):
+        while True:
+            job = await self.validation_queue.get()
+            if job.future.done():
+                continue
+            set_request_id(job.request_id)
+            try:
+                entities = job.entities
+                if entities and "error" not in entities:
+                    # Identifier repair is CPU work, keep it off the event loop
+                    entities = await asyncio.to_thread(validate_entities, entities, job.ocr_result["word_confidences"])
+                result = build_pdf_result(
+                    entities, job.ocr_result["text"], job.ocr_result["pages"],
+                    job.timings, job.start_time, job.include_text
+                )
+            except Exception as e:
+                logger.error(f"Validation stage failed for {job.pdf_path}: {str(e)}")
+                self._fail(job, "Error extracting entities")
+                continue
+            if "error" in result:
+                self.failed += 1
+            else:
+                self.completed += 1
+            job.finish(result)
+
+    def stats(self):
+        def queue_size(queue):
+            return queue.qsize() if queue is not None else 0
+        return {
+            "running": self.running,
+            "ocr_workers": self.ocr_workers,
+            "ocr_service": self.ocr_service.socket_path if self.ocr_service is not None else None,
+            "llm_concurrency": self.llm_concurrency,
+            "validation_concurrency": self.validation_concurrency,
+            "queue_size": self.queue_size,
+            "job_timeout": self.job_timeout,
+            "queued": {
+                "ocr": queue_size(self.ocr_queue),
+                "llm": queue_size(self.llm_queue),
+                "validation": queue_size(self.validation_queue),
+            },
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+        }
+
+    async def ocr_service_stats(self):
+        """
+        Queue depth and workers of the OCR service, None without one
+        """
+        if self.ocr_service is None:
+            return None
+        try:
+            return await self.ocr_service.stats()
+        except Exception as e:
+            return {"reachable": False, "error": str(e)}
+
+
+rfil_pipeline = RfilPipeline()
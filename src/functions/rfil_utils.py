@@ -1,12 +1,10 @@
 import PyPDF2
 import pytesseract
 from PIL import Image
-import io
 import numpy as np
 import httpx
 import json
 import time
-import calendar
 import re
 import cv2
 import os
@@ -15,11 +13,13 @@ import fitz  # PyMuPDF
 from dotenv import load_dotenv
 
 # Import the new modules
-from src.providers.azure_openai import get_completion_with_retries
+from src.providers.azure_openai import get_completion_with_retries, get_completion_with_retries_async
 from src.prompts.rfil_prompts import ENTITY_EXTRACTION_PROMPT
+from src.functions.validators import is_valid_egn, is_valid_date, validate_bulgarian_eik, validate_eik_9_digits, validate_eik_13_digits
+from src.functions.identifier_repair import repair_identifier
+from src.integration.metrics import RFIL_IDENTIFIERS, observe_stage, record_ocr_result
+from src.functions.logging_config import log_preview
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Get configuration from environment variables
@@ -35,128 +35,6 @@ if tesseract_path:
 else:
     logger.warning("TESSERACT_PATH environment variable not set")
 
-def is_valid_egn(egn):
-    """
-    Check if a Bulgarian EGN (Unified Civil Number) is valid
-    """
-    # Weights used for checksum calculation
-    EGN_WEIGHTS = [2, 4, 8, 5, 10, 9, 7, 3, 6]
-    
-    # Check if EGN is exactly 10 digits
-    if len(egn) != 10 or not egn.isdigit():
-        return False
-        
-    year = int(egn[0:2])
-    month = int(egn[2:4])
-    day = int(egn[4:6])
-    
-    # Adjust for different centuries based on month codes
-    if month > 40:  # 2000+
-        if not is_valid_date(day, month - 40, year + 2000):
-            return False
-    elif month > 20:  # 1800+
-        if not is_valid_date(day, month - 20, year + 1800):
-            return False
-    else:  # 1900+
-        if not is_valid_date(day, month, year + 1900):
-            return False
-            
-    # Calculate and validate checksum
-    checksum = int(egn[9])
-    egn_sum = 0
-    for i in range(9):
-        egn_sum += int(egn[i]) * EGN_WEIGHTS[i]
-    valid_checksum = egn_sum % 11
-    if valid_checksum == 10:
-        valid_checksum = 0
-        
-    return checksum == valid_checksum
-
-def is_valid_date(day, month, year):
-    """
-    Helper function to check if a date is valid
-    """
-    try:
-        if month < 1 or month > 12:
-            return False
-        # Get the last day of the month
-        last_day = calendar.monthrange(year, month)[1]
-        return 1 <= day <= last_day
-    except ValueError:
-        return False
-
-def validate_bulgarian_eik(eik):
-    """ 
-    Validates a Bulgarian EIK/BULSTAT number.
-    """
-    # Check if EIK is a string and only contains digits
-    if not isinstance(eik, str) or not eik.isdigit():
-        return False
-        
-    # EIK can be either 9 or 13 digits
-    if len(eik) == 9:
-        return validate_eik_9_digits(eik)
-    elif len(eik) == 13:
-        return validate_eik_13_digits(eik)
-    else:
-        return False
-        
-def validate_eik_9_digits(eik):
-    """Validates a 9-digit EIK number."""
-    # First check digit (position 8) weights
-    weights_1 = [1, 2, 3, 4, 5, 6, 7, 8]
-    sum_1 = 0
-    
-    for i in range(8):
-        sum_1 += int(eik[i]) * weights_1[i]
-        
-    remainder_1 = sum_1 % 11
-    
-    if remainder_1 == 10:
-        # Recalculate with different weights
-        weights_alt = [3, 4, 5, 6, 7, 8, 9, 10]
-        sum_alt = 0
-        
-        for i in range(8):
-            sum_alt += int(eik[i]) * weights_alt[i]
-            
-        remainder_1 = sum_alt % 11
-        if remainder_1 == 10:
-            remainder_1 = 0
-            
-    # Verify the check digit
-    return remainder_1 == int(eik[8])
-    
-def validate_eik_13_digits(eik):
-    """Validates a 13-digit EIK number."""
-    # First check if the first 9 digits are valid
-    if not validate_eik_9_digits(eik[:9]):
-        return False
-        
-    # Check the additional 4 digits
-    weights_2 = [2, 7, 3, 5]
-    sum_2 = 0
-    
-    for i in range(4):
-        sum_2 += int(eik[i+9]) * weights_2[i]
-        
-    remainder_2 = sum_2 % 11
-    
-    if remainder_2 == 10:
-        # Recalculate with different weights
-        weights_alt = [4, 9, 5, 7]
-        sum_alt = 0
-        
-        for i in range(4):
-            sum_alt += int(eik[i+9]) * weights_alt[i]
-            
-        remainder_2 = sum_alt % 11
-        if remainder_2 == 10:
-            remainder_2 = 0
-            
-    # Verify the check digit for the extension
-    return remainder_2 == int(eik[12])
-
 def save_extracted_text(text, output_path=None, filename=None):
     """
     Save extracted text to a file for review
@@ -190,9 +68,164 @@ def save_extracted_text(text, output_path=None, filename=None):
         logger.error(f"Error saving text file: {str(e)}")
         return None
 
-def extract_text_from_pdf_with_fitz(pdf_path, language='bul', display_pages=False, auto_rotate=True):
+def warm_up_ocr(language='bul'):
+    """
+    Run Tesseract once on a blank page so the binary and the language data
+    are loaded (and in the OS file cache) before the first document
+    """
+    start = time.perf_counter()
+    try:
+        pytesseract.image_to_string(Image.new("L", (320, 80), 255), lang=language)
+    except Exception as e:
+        # pytesseract's errors cannot be unpickled, which would break the process pool
+        raise RuntimeError(str(e)) from None
+    return round(time.perf_counter() - start, 3)
+
+def render_page(doc, page_num):
+    """
+    Render a page at twice its size (higher resolution for better OCR)
+    as an RGB array of shape (height, width, 3)
+    """
+    page = doc.load_page(page_num)
+    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
+    # The raw samples, without a PNG round trip; rows may be padded to the stride
+    samples = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    img_cv = samples[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+    return img_cv[:, :, :3]
+
+def ocr_page_image(img_cv, page_num, language='bul', auto_rotate=True, word_confidences=None, page_info=None):
+    """
+    Detect the orientation of a rendered page and OCR it.
+
+    Orientation and OCR timings, the rotation, OCR confidence and character
+    count are written to page_info. Returns the page text, or None when
+    Tesseract failed (the error is in page_info["error"]).
+    """
+    if page_info is None:
+        page_info = {"page": page_num + 1, "rotation": 0, "ocr_confidence": None, "characters": 0, "timings": {}}
+    img = Image.fromarray(img_cv)
+    stage_start = time.perf_counter()
+    rotation_angle = 0
+    
+    # Auto-rotate image if enabled
+    if auto_rotate:
+        try:
+            # First try with Tesseract's orientation detection
+            osd = pytesseract.image_to_osd(img)
+            rotation_angle = int(re.search(r'Rotate: (\d+)', osd).group(1))
+            logger.debug(f"Detected page rotation: {rotation_angle} degrees")
+            
+            if rotation_angle == 0:
+                # If Tesseract says no rotation needed, check with advanced method as backup
+                img_cv_gray = cv2.cvtColor(img_cv, cv2.COLOR_RGB2GRAY)
+                non_zero_pixels = cv2.findNonZero(cv2.threshold(img_cv_gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1])
+                if non_zero_pixels is not None:
+                    rect = cv2.minAreaRect(non_zero_pixels)
+                    angle = rect[2]
+                    if abs(angle) > 5:  # Only apply if significant angle detected
+                        rotation_angle = 90 if (angle < -45) else 0
+            
+        except Exception as e:
+            logger.warning(f"Error in orientation detection: {str(e)}")
+            logger.debug("Trying alternative orientation detection...")
+            
+            # Fall back to trying all orientations
+            best_conf = 0
+            best_angle = 0
+            
+            for angle in [0, 90, 180, 270]:
+                # Rotate image for testing
+                if angle == 0:
+                    test_img = img
+                else:
+                    test_img = img.rotate(angle, expand=True)
+                
+                # Get confidence at this orientation
+                try:
+                    data = pytesseract.image_to_data(test_img, lang=language, 
+                                                 output_type=pytesseract.Output.DICT)
+                    confidences = [conf for conf in data['conf'] if conf != -1]
+                    
+                    if confidences:
+                        avg_conf = sum(confidences) / len(confidences)
+                        logger.debug(f"Angle {angle} - Average confidence: {avg_conf}")
+                        if avg_conf > best_conf:
+                            best_conf = avg_conf
+                            best_angle = angle
+                except Exception as conf_error:
+                    logger.warning(f"Error testing angle {angle}: {str(conf_error)}")
+            
+            rotation_angle = best_angle
+            logger.debug(f"Selected best rotation angle: {rotation_angle}")
+    
+    # Apply rotation if needed
+    if rotation_angle != 0:
+        logger.debug(f"Rotating image by {rotation_angle} degrees")
+        # Rotate using OpenCV for better quality
+        if rotation_angle == 90:
+            img_cv = cv2.rotate(img_cv, cv2.ROTATE_90_CLOCKWISE)
+        elif rotation_angle == 180:
+            img_cv = cv2.rotate(img_cv, cv2.ROTATE_180)
+        elif rotation_angle == 270:
+            img_cv = cv2.rotate(img_cv, cv2.ROTATE_90_COUNTERCLOCKWISE)
+        
+        # Convert back to PIL
+        img = Image.fromarray(img_cv)
+    
+    page_info["rotation"] = rotation_angle
+    page_info["timings"]["orientation"] = round(time.perf_counter() - stage_start, 4)
+    stage_start = time.perf_counter()
+    
+    # Use Tesseract for OCR
+    logger.debug(f"Running OCR with language: {language}")
+    try:
+        # Standard approach using the specified language(s)
+        page_text = pytesseract.image_to_string(img, lang=language)
+        
+        # Get Tesseract data including confidence
+        data = pytesseract.image_to_data(img, lang=language, output_type=pytesseract.Output.DICT)
+        
+        # Calculate average confidence for the page
+        confidences = [conf for conf in data['conf'] if conf != -1]  # Filter out -1 values
+        if word_confidences is not None:
+            collect_word_confidences(data, word_confidences)
+        if confidences:
+            avg_confidence = sum(confidences) / len(confidences)
+            page_info["ocr_confidence"] = round(float(avg_confidence), 2)
+            logger.debug(f"Page {page_num+1} OCR confidence: {avg_confidence:.2f}%")
+            
+            # Add a warning if OCR confidence is low
+            if avg_confidence < 70:  # 70% threshold
+                logger.warning(f"OCR confidence is low for page {page_num+1}. Text extraction may be unreliable.")
+        
+        page_info["characters"] = len(page_text)
+        page_info["timings"]["ocr"] = round(time.perf_counter() - stage_start, 4)
+        logger.debug(f"OCR completed for page {page_num+1}")
+        if not page_text.strip():
+            logger.warning(f"No text extracted from page {page_num+1}")
+        else:
+            logger.debug(f"Extracted {len(page_text)} characters from page {page_num+1}")
+            log_preview(logger, f"Page {page_num+1} text preview", lambda: page_text[:100].replace('\n', ' '))
+    except Exception as ocr_error:
+        logger.error(f"OCR error on page {page_num+1}: {str(ocr_error)}")
+        page_info["error"] = str(ocr_error)
+        return None
+    return page_text
+
+def page_text_block(page_num, page_text):
+    """
+    A page's text as it appears in the extracted text of the whole document
+    """
+    return f"\n\n--- PAGE {page_num+1} ---\n\n" + page_text
+
+def extract_text_from_pdf_with_fitz(pdf_path, language='bul', display_pages=False, auto_rotate=True, word_confidences=None, page_details=None):
     """
     Extract text from PDF using PyMuPDF (fitz) and Tesseract OCR
+
+    If word_confidences is a dict, it is filled with the lowest OCR confidence
+    seen for every recognised word (used later to repair invalid identifiers).
+    If page_details is a list, one metadata dict per page (rotation, OCR
+    confidence, characters and stage timings) is appended to it.
     """
     try:
         logger.info(f"Opening PDF with PyMuPDF: {pdf_path}")
@@ -205,132 +238,32 @@ def extract_text_from_pdf_with_fitz(pdf_path, language='bul', display_pages=Fals
         
         # Process each page
         for page_num in range(len(doc)):
+            page_info = {"page": page_num + 1, "rotation": 0, "ocr_confidence": None, "characters": 0, "timings": {}}
+            if page_details is not None:
+                page_details.append(page_info)
+            stage_start = time.perf_counter()
             try:
-                logger.info(f"Processing page {page_num+1} of {len(doc)}")
-                
-                # Get the page
-                page = doc.load_page(page_num)
-                
-                # Convert to pixmap (image)
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # Higher resolution for better OCR
-                
-                # Convert pixmap to PIL Image
-                img_data = pix.tobytes("png")
-                img = Image.open(io.BytesIO(img_data))
-                
-                # Convert PIL image to OpenCV format for better rotation handling
-                img_cv = np.array(img)
-                img_cv = img_cv[:, :, :3]  # Remove alpha channel if present
-                
-                rotation_angle = 0
+                logger.debug(f"Processing page {page_num+1} of {len(doc)}")
                 
-                # Auto-rotate image if enabled
-                if auto_rotate:
-                    try:
-                        # First try with Tesseract's orientation detection
-                        osd = pytesseract.image_to_osd(img)
-                        rotation_angle = int(re.search(r'Rotate: (\d+)', osd).group(1))
-                        logger.info(f"Detected page rotation: {rotation_angle} degrees")
-                        
-                        if rotation_angle == 0:
-                            # If Tesseract says no rotation needed, check with advanced method as backup
-                            img_cv_gray = cv2.cvtColor(img_cv, cv2.COLOR_RGB2GRAY)
-                            non_zero_pixels = cv2.findNonZero(cv2.threshold(img_cv_gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1])
-                            if non_zero_pixels is not None:
-                                rect = cv2.minAreaRect(non_zero_pixels)
-                                angle = rect[2]
-                                if abs(angle) > 5:  # Only apply if significant angle detected
-                                    rotation_angle = 90 if (angle < -45) else 0
-                        
-                    except Exception as e:
-                        logger.warning(f"Error in orientation detection: {str(e)}")
-                        logger.info("Trying alternative orientation detection...")
-                        
-                        # Fall back to trying all orientations
-                        best_conf = 0
-                        best_angle = 0
-                        
-                        for angle in [0, 90, 180, 270]:
-                            # Rotate image for testing
-                            if angle == 0:
-                                test_img = img
-                            else:
-                                test_img = img.rotate(angle, expand=True)
-                            
-                            # Get confidence at this orientation
-                            try:
-                                data = pytesseract.image_to_data(test_img, lang=language, 
-                                                             output_type=pytesseract.Output.DICT)
-                                confidences = [conf for conf in data['conf'] if conf != -1]
-                                
-                                if confidences:
-                                    avg_conf = sum(confidences) / len(confidences)
-                                    logger.info(f"Angle {angle} - Average confidence: {avg_conf}")
-                                    if avg_conf > best_conf:
-                                        best_conf = avg_conf
-                                        best_angle = angle
-                            except Exception as conf_error:
-                                logger.warning(f"Error testing angle {angle}: {str(conf_error)}")
-                        
-                        rotation_angle = best_angle
-                        logger.info(f"Selected best rotation angle: {rotation_angle}")
+                img_cv = render_page(doc, page_num)
+                page_info["timings"]["render"] = round(time.perf_counter() - stage_start, 4)
                 
-                # Apply rotation if needed
-                if rotation_angle != 0:
-                    logger.info(f"Rotating image by {rotation_angle} degrees")
-                    # Rotate using OpenCV for better quality
-                    if rotation_angle == 90:
-                        img_cv = cv2.rotate(img_cv, cv2.ROTATE_90_CLOCKWISE)
-                    elif rotation_angle == 180:
-                        img_cv = cv2.rotate(img_cv, cv2.ROTATE_180)
-                    elif rotation_angle == 270:
-                        img_cv = cv2.rotate(img_cv, cv2.ROTATE_90_COUNTERCLOCKWISE)
-                    
-                    # Convert back to PIL
-                    img = Image.fromarray(img_cv)
-                
-                # Use Tesseract for OCR
-                logger.info(f"Running OCR with language: {language}")
-                try:
-                    # Standard approach using the specified language(s)
-                    page_text = pytesseract.image_to_string(img, lang=language)
-                    
-                    # Get Tesseract data including confidence
-                    data = pytesseract.image_to_data(img, lang=language, output_type=pytesseract.Output.DICT)
-                    
-                    # Calculate average confidence for the page
-                    confidences = [conf for conf in data['conf'] if conf != -1]  # Filter out -1 values
-                    if confidences:
-                        avg_confidence = sum(confidences) / len(confidences)
-                        logger.info(f"Page {page_num+1} OCR confidence: {avg_confidence:.2f}%")
-                        
-                        # Add a warning if OCR confidence is low
-                        if avg_confidence < 70:  # 70% threshold
-                            logger.warning(f"OCR confidence is low for page {page_num+1}. Text extraction may be unreliable.")
-                    
-                    logger.info(f"OCR completed for page {page_num+1}")
-                    if not page_text.strip():
-                        logger.warning(f"No text extracted from page {page_num+1}")
-                    else:
-                        logger.info(f"Extracted {len(page_text)} characters from page {page_num+1}")
-                        # Log a preview of the text (first 100 chars)
-                        preview = page_text[:100].replace('\n', ' ')
-                        logger.info(f"Text preview: {preview}...")
-                except Exception as ocr_error:
-                    logger.error(f"OCR error on page {page_num+1}: {str(ocr_error)}")
+                page_text = ocr_page_image(img_cv, page_num, language, auto_rotate, word_confidences, page_info)
+                if page_text is None:
                     continue
                 
                 # Add page text to all text
-                all_text += f"\n\n--- PAGE {page_num+1} ---\n\n" + page_text
+                all_text += page_text_block(page_num, page_text)
                 
             except Exception as page_error:
                 logger.error(f"Error processing page {page_num+1}: {str(page_error)}")
+                page_info["error"] = str(page_error)
                 continue
         
         if not all_text.strip():
             logger.warning("No text was extracted from any page of the PDF with Tesseract")
         else:
-            logger.info(f"Successfully extracted {len(all_text)} characters of text")
+            logger.info(f"Successfully extracted {len(all_text)} characters of text from {len(doc)} pages")
             
         return all_text
         
@@ -340,9 +273,100 @@ def extract_text_from_pdf_with_fitz(pdf_path, language='bul', display_pages=Fals
         logger.error(traceback.format_exc())
         return None
 
-def extract_entities_from_text(text, max_retries=3, retry_delay=60):
+def collect_word_confidences(data, word_confidences):
+    """
+    Store the lowest Tesseract confidence for every word of an image_to_data result
+    """
+    for word, conf in zip(data['text'], data['conf']):
+        try:
+            conf = float(conf)
+        except (TypeError, ValueError):
+            continue
+        word = word.strip().strip('.,;:()[]"\'')
+        if not word or conf < 0:
+            continue
+        if word not in word_confidences or conf < word_confidences[word]:
+            word_confidences[word] = conf
+
+def repair_invalid_identifier(entity, ocr_confidences=None):
+    """
+    Try to fix an entity whose EGN/EIK failed validation because of OCR misreads.
+    Repaired entities keep the original number and get a repaired flag.
+    Candidates without OCR evidence are listed in repair_candidates and the
+    entity stays Invalid.
+    """
+    number = str(entity.get("identification_number") or "")
+    confidences = None
+    if ocr_confidences:
+        confidences = ocr_confidences.get(number.strip())
+
+    repair = repair_identifier(number, entity["identification_type"], confidences=confidences)
+    entity["repaired"] = repair["repaired"]
+
+    if repair["repaired"]:
+        entity["original_identification_number"] = number
+        entity["identification_number"] = repair["identification_number"]
+        entity["ValidIdentificator"] = "Valid"
+        logger.info(f"Identifier repaired: {number} -> {repair['identification_number']}")
+    elif repair["status"] == "valid":
+        # Valid once spacing and separators are dropped
+        entity["original_identification_number"] = number
+        entity["identification_number"] = repair["identification_number"]
+        entity["ValidIdentificator"] = "Valid"
+    elif repair["status"] in ("ambiguous", "unconfirmed"):
+        entity["repair_candidates"] = repair["candidates"]
+        logger.info(f"Identifier repair {repair['status']} for {number}: {len(repair['candidates'])} candidates")
+
+    return entity
+
+def validate_entities(result, ocr_confidences=None):
+    """
+    Validate the EGN/EIK of every extracted entity and pass invalid ones
+    through the OCR repair step
+    """
+    validation_start = time.perf_counter()
+    # Validate identifiers for each entity
+    if "entities" in result and len(result["entities"]) > 0:
+        entity_count = len(result["entities"])
+        logger.info(f"Found {entity_count} entities, validating identifiers")
+        
+        for i, entity in enumerate(result["entities"]):
+            logger.debug(f"Validating entity {i+1}/{entity_count}: {entity.get('name', 'Unknown')} - {entity.get('identification_number', 'No ID')}")
+            
+            if entity["type"].lower() == "person" and entity["identification_type"] == "EGN":
+                # Validate person's EGN
+                is_valid = is_valid_egn(entity["identification_number"])
+                entity["ValidIdentificator"] = "Valid" if is_valid else "Invalid"
+                logger.debug(f"EGN validation result: {entity['ValidIdentificator']}")
+                if not is_valid:
+                    repair_invalid_identifier(entity, ocr_confidences)
+                
+            elif entity["type"].lower() == "company" and entity["identification_type"] == "EIK":
+                # Validate company's EIK
+                is_valid = validate_bulgarian_eik(entity["identification_number"])
+                entity["ValidIdentificator"] = "Valid" if is_valid else "Invalid"
+                logger.debug(f"EIK validation result: {entity['ValidIdentificator']}")
+                if not is_valid:
+                    repair_invalid_identifier(entity, ocr_confidences)
+                
+            else:
+                # For other types or identification types, mark as Valid
+                entity["ValidIdentificator"] = "Valid"
+                logger.debug(f"Other ID type, marking as: {entity['ValidIdentificator']}")
+                continue
+            
+            outcome = "repaired" if entity.get("repaired") else entity["ValidIdentificator"].lower()
+            RFIL_IDENTIFIERS.labels(entity["identification_type"], outcome).inc()
+    
+    observe_stage("identifier_validation", time.perf_counter() - validation_start)
+    return result
+
+def extract_entities_from_text(text, max_retries=3, retry_delay=60, ocr_confidences=None):
     """
     Extract structured information from text using Azure OpenAI
+
+    Invalid EGN/EIK numbers are passed through the OCR repair step, using
+    ocr_confidences (word -> confidence) when available.
     """
     try:
         logger.info("Starting entity extraction from text")
@@ -369,30 +393,7 @@ def extract_entities_from_text(text, max_retries=3, retry_delay=60):
             logger.error(f"Error in entity extraction: {result['error']}")
             return result
         
-        # Validate identifiers for each entity
-        if "entities" in result and len(result["entities"]) > 0:
-            entity_count = len(result["entities"])
-            logger.info(f"Found {entity_count} entities, validating identifiers")
-            
-            for i, entity in enumerate(result["entities"]):
-                logger.info(f"Validating entity {i+1}/{entity_count}: {entity.get('name', 'Unknown')} - {entity.get('identification_number', 'No ID')}")
-                
-                if entity["type"].lower() == "person" and entity["identification_type"] == "EGN":
-                    # Validate person's EGN
-                    is_valid = is_valid_egn(entity["identification_number"])
-                    entity["ValidIdentificator"] = "Valid" if is_valid else "Invalid"
-                    logger.info(f"EGN validation result: {entity['ValidIdentificator']}")
-                    
-                elif entity["type"].lower() == "company" and entity["identification_type"] == "EIK":
-                    # Validate company's EIK
-                    is_valid = validate_bulgarian_eik(entity["identification_number"])
-                    entity["ValidIdentificator"] = "Valid" if is_valid else "Invalid"
-                    logger.info(f"EIK validation result: {entity['ValidIdentificator']}")
-                    
-                else:
-                    # For other types or identification types, mark as Valid
-                    entity["ValidIdentificator"] = "Valid"
-                    logger.info(f"Other ID type, marking as: {entity['ValidIdentificator']}")
+        result = validate_entities(result, ocr_confidences)
         
         logger.info("Entity extraction completed successfully")
         return result
@@ -403,25 +404,40 @@ def extract_entities_from_text(text, max_retries=3, retry_delay=60):
         logger.error(traceback.format_exc())
         return {"error": "Unexpected error during entity extraction"}
 
-def process_pdf_end_to_end(pdf_path, ocr_language='bul', save_text=False, output_dir=None):
+async def request_entities_async(text, max_retries=3, retry_delay=60, system_prompt=ENTITY_EXTRACTION_PROMPT):
     """
-    Process a PDF file from start to finish:
-    1. Extract text with PyMuPDF and Tesseract OCR
-    2. Extract entities with Azure OpenAI
-    
-    Parameters:
-    pdf_path (str): Path to the PDF file
-    ocr_language (str): Language code for Tesseract OCR
-    save_text (bool): Whether to save the extracted text to a file
-    output_dir (str): Directory to save the extracted text (default: same directory as PDF)
-    
-    Returns:
-    dict: Extracted entities in JSON format
+    Entity extraction stage without validation: the raw model result for
+    the text, requested without blocking the event loop
+    """
+    if not text or not text.strip():
+        logger.error("No text provided for entity extraction")
+        return None
+    logger.info(f"Requesting entities for {len(text)} characters")
+    try:
+        return await get_completion_with_retries_async(
+            text=text,
+            system_prompt=system_prompt,
+            max_retries=max_retries,
+            retry_delay=retry_delay,
+            temperature=0,
+            response_format={"type": "json_object"}
+        )
+    except Exception as e:
+        logger.error(f"General error in entity extraction: {str(e)}")
+        return {"error": "Unexpected error during entity extraction"}
+
+def count_pdf_pages(contents):
+    """
+    Page count of an in-memory PDF. Only the cross-reference table is read,
+    no page is parsed or rendered.
+    """
+    with fitz.open(stream=contents, filetype="pdf") as doc:
+        return doc.page_count
+
+def check_pdf_file(pdf_path):
+    """
+    Return an error result for a missing or empty PDF file, or None
     """
-    start_time = time.time()
-    logger.info(f"Starting end-to-end PDF processing for {pdf_path}")
-    logger.info(f"Parameters: ocr_language={ocr_language}")
-    
     # Check if the PDF file exists
     if not os.path.exists(pdf_path):
         logger.error(f"PDF file not found: {pdf_path}")
@@ -436,94 +452,165 @@ def process_pdf_end_to_end(pdf_path, ocr_language='bul', save_text=False, output
             return {"error": "PDF file is empty"}
     except Exception as e:
         logger.error(f"Error checking PDF file size: {str(e)}")
-    
-    # Step 1: Extract text from PDF using PyMuPDF and Tesseract OCR
+    return None
+
+def ocr_pdf(pdf_path, ocr_language='bul'):
+    """
+    Text extraction stage: OCR every page of the PDF.
+    Returns a plain dict (text, pages, word_confidences, seconds), so it can
+    run in a worker process.
+    """
+    word_confidences = {}
+    page_details = []
+    stage_start = time.time()
     extracted_text = extract_text_from_pdf_with_fitz(
         pdf_path, 
-        language=ocr_language
+        language=ocr_language,
+        word_confidences=word_confidences,
+        page_details=page_details
     )
+    return {
+        "text": extracted_text,
+        "pages": page_details,
+        "word_confidences": word_confidences,
+        "seconds": round(time.time() - stage_start, 3)
+    }
+
+def save_pdf_text(pdf_path, extracted_text, output_dir=None):
+    logger.info("Saving extracted text to file")
+    if not output_dir:
+        # Default to the same directory as the PDF
+        output_dir = os.path.dirname(pdf_path)
+        
+    # Generate filename based on the PDF name
+    pdf_filename = os.path.basename(pdf_path)
+    pdf_name = os.path.splitext(pdf_filename)[0]
+    text_filename = f"{pdf_name}_extracted_text.txt"
+    
+    # Save the text
+    text_path = save_extracted_text(extracted_text, output_dir, text_filename)
+    logger.info(f"Extracted text saved to: {text_path}")
+    return text_path
+
+def no_text_result(pdf_path):
+    """
+    Result for a PDF without any extractable text
+    """
+    logger.error("No text was extracted from the PDF using any method")
+    
+    # For debugging: save a small sample of the PDF info
+    try:
+        logger.info("Logging PDF metadata for debugging")
+        doc = fitz.open(pdf_path)
+        metadata = doc.metadata
+        logger.info(f"PDF metadata: {metadata}")
+        doc.close()
+    except Exception as md_error:
+        logger.error(f"Could not get PDF metadata: {str(md_error)}")
+    
+    # Development mode option
+    if os.getenv('HAIPER_DEV_MODE') == 'true':
+        logger.info("DEV MODE: Creating mock extraction result for testing purposes")
+        return {
+            "entities": [],
+            "overall_extraction_quality": 0.0,
+            "warning": "No text was extracted from the PDF",
+            "process_status": "completed_with_warnings"
+        }
+    # In production, return the error
+    return {"error": "No text was extracted from the PDF"}
+
+def build_pdf_result(entities, extracted_text, page_details, timings, start_time, include_text=False):
+    """
+    Final result of a processed PDF from the entity extraction result
+    """
+    if not entities:
+        logger.error("Failed to extract entities")
+        return {
+            "error": "Failed to extract entities",
+            "text_extraction": "success",
+            "text_length": len(extracted_text)
+        }
+        
+    if "error" in entities:
+        logger.error(f"Error in entity extraction: {entities['error']}")
+        return {
+            "error": entities["error"],
+            "text_extraction": "success",
+            "text_length": len(extracted_text)
+        }
+        
+    logger.info("Entity extraction completed successfully")
+    # Add extra information to the response
+    entities["text_extraction"] = "success"
+    entities["text_length"] = len(extracted_text)
+    
+    # Calculate and log processing time
+    end_time = time.time()
+    processing_time = end_time - start_time
+    logger.info(f"Processing completed in {processing_time:.2f} seconds")
+    entities["processing_time"] = f"{processing_time:.2f} seconds"
+    timings["total"] = round(processing_time, 3)
+    entities["pages"] = page_details
+    entities["timings"] = timings
+    if include_text:
+        entities["extracted_text"] = extracted_text
+    
+    return entities
+
+def process_pdf_end_to_end(pdf_path, ocr_language='bul', save_text=False, output_dir=None, include_text=False):
+    """
+    Process a PDF file from start to finish:
+    1. Extract text with PyMuPDF and Tesseract OCR
+    2. Extract entities with Azure OpenAI
+    
+    Parameters:
+    pdf_path (str): Path to the PDF file
+    ocr_language (str): Language code for Tesseract OCR
+    save_text (bool): Whether to save the extracted text to a file
+    output_dir (str): Directory to save the extracted text (default: same directory as PDF)
+    include_text (bool): Whether to return the extracted text under "extracted_text"
+    
+    Returns:
+    dict: Extracted entities in JSON format, with per-page metadata ("pages")
+    and stage timings ("timings")
+    """
+    start_time = time.time()
+    logger.info(f"Starting end-to-end PDF processing for {pdf_path}")
+    logger.info(f"Parameters: ocr_language={ocr_language}")
+    
+    file_error = check_pdf_file(pdf_path)
+    if file_error:
+        return file_error
+    
+    # Step 1: Extract text from PDF using PyMuPDF and Tesseract OCR
+    ocr_result = ocr_pdf(pdf_path, ocr_language)
+    extracted_text = ocr_result["text"]
+    timings = {"text_extraction": ocr_result["seconds"]}
+    observe_stage("text_extraction", ocr_result["seconds"])
+    record_ocr_result(ocr_result["pages"], extracted_text)
     
     # Save the extracted text to a file if requested and if we have text
     if extracted_text and save_text:
-        logger.info("Saving extracted text to file")
-        if not output_dir:
-            # Default to the same directory as the PDF
-            output_dir = os.path.dirname(pdf_path)
-            
-        # Generate filename based on the PDF name
-        pdf_filename = os.path.basename(pdf_path)
-        pdf_name = os.path.splitext(pdf_filename)[0]
-        text_filename = f"{pdf_name}_extracted_text.txt"
-        
-        # Save the text
-        text_path = save_extracted_text(extracted_text, output_dir, text_filename)
-        logger.info(f"Extracted text saved to: {text_path}")
+        save_pdf_text(pdf_path, extracted_text, output_dir)
     
     # Check if we got any text
     if not extracted_text or len(extracted_text.strip()) == 0:
-        logger.error("No text was extracted from the PDF using any method")
-        
-        # For debugging: save a small sample of the PDF info
-        try:
-            logger.info("Logging PDF metadata for debugging")
-            doc = fitz.open(pdf_path)
-            metadata = doc.metadata
-            logger.info(f"PDF metadata: {metadata}")
-            doc.close()
-        except Exception as md_error:
-            logger.error(f"Could not get PDF metadata: {str(md_error)}")
-        
-        # Development mode option
-        if os.getenv('HAIPER_DEV_MODE') == 'true':
-            logger.info("DEV MODE: Creating mock extraction result for testing purposes")
-            return {
-                "entities": [],
-                "overall_extraction_quality": 0.0,
-                "warning": "No text was extracted from the PDF",
-                "process_status": "completed_with_warnings"
-            }
-        else:
-            # In production, return the error
-            return {"error": "No text was extracted from the PDF"}
+        return no_text_result(pdf_path)
     
     # Log text extraction success
     logger.info(f"Successfully extracted {len(extracted_text)} characters from PDF")
-    text_preview = extracted_text[:200].replace('\n', ' ')
-    logger.info(f"Text preview: {text_preview}...")
+    log_preview(logger, "Text preview", lambda: extracted_text[:200].replace('\n', ' '))
     
     # Step 2: Extract entities from the text using Azure OpenAI
     logger.info("Starting entity extraction from extracted text")
     try:
-        entities = extract_entities_from_text(extracted_text)
-        
-        if not entities:
-            logger.error("Failed to extract entities")
-            return {
-                "error": "Failed to extract entities",
-                "text_extraction": "success",
-                "text_length": len(extracted_text)
-            }
-            
-        if "error" in entities:
-            logger.error(f"Error in entity extraction: {entities['error']}")
-            return {
-                "error": entities["error"],
-                "text_extraction": "success",
-                "text_length": len(extracted_text)
-            }
-            
-        logger.info("Entity extraction completed successfully")
-        # Add extra information to the response
-        entities["text_extraction"] = "success"
-        entities["text_length"] = len(extracted_text)
-        
-        # Calculate and log processing time
-        end_time = time.time()
-        processing_time = end_time - start_time
-        logger.info(f"Processing completed in {processing_time:.2f} seconds")
-        entities["processing_time"] = f"{processing_time:.2f} seconds"
+        stage_start = time.time()
+        entities = extract_entities_from_text(extracted_text, ocr_confidences=ocr_result["word_confidences"])
+        timings["entity_extraction"] = round(time.time() - stage_start, 3)
+        observe_stage("entity_extraction", timings["entity_extraction"])
         
-        return entities
+        return build_pdf_result(entities, extracted_text, ocr_result["pages"], timings, start_time, include_text)
         
     except Exception as entity_error:
         logger.error(f"Error during entity extraction: {str(entity_error)}")
@@ -534,5 +621,5 @@ def process_pdf_end_to_end(pdf_path, ocr_language='bul', save_text=False, output
             "error": "Error extracting entities",
             "text_extraction": "success", 
             "text_length": len(extracted_text),
-            "text_preview": text_preview
-        }
\ No newline at end of file
+            "text_preview": extracted_text[:200].replace('\n', ' ')
+        }
@@ -1,4 +1,10 @@
 # This file will contain common utility functions
+import json
+import zlib
+
+import orjson
+
+
 def format_response(data, status="success", message=None):
     return {
         "status": status,
@@ -24,4 +30,47 @@ def assign_new_values(workflow:any, workflow_data: dict):
         elif key == "createdBy":
             setattr(workflow, "created_by", value)
         else:
-            setattr(workflow, key, value)
\ No newline at end of file
+            setattr(workflow, key, value)
+
+
+def compress_text(text: str, level: int = 6):
+    if text is None:
+        return None
+    return zlib.compress(text.encode("utf-8"), level)
+
+
+def decompress_text(data: bytes):
+    if data is None:
+        return None
+    return zlib.decompress(data).decode("utf-8")
+
+
+def compress_json(data, level: int = 6):
+    if data is None:
+        return None
+    return compress_text(json.dumps(data, ensure_ascii=False), level)
+
+
+def decompress_json(data: bytes):
+    if data is None:
+        return None
+    return json.loads(decompress_text(data))
+
+
+async def stream_json_array(items, chunk_bytes: int = 65536):
+    """
+    Encode an async iterable as a JSON array, yielding chunks of about
+    chunk_bytes instead of building the whole document in memory
+    """
+    buffer = bytearray(b"[")
+    first = True
+    async for item in items:
+        if not first:
+            buffer += b","
+        buffer += orjson.dumps(item)
+        first = False
+        if len(buffer) >= chunk_bytes:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b"]"
+    yield bytes(buffer)
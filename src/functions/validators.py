@@ -0,0 +1,123 @@
+import calendar
+
+def is_valid_egn(egn):
+    """
+    Check if a Bulgarian EGN (Unified Civil Number) is valid
+    """
+    # Weights used for checksum calculation
+    EGN_WEIGHTS = [2, 4, 8, 5, 10, 9, 7, 3, 6]
+    
+    # Check if EGN is exactly 10 digits
+    if len(egn) != 10 or not egn.isdigit():
+        return False
+        
+    year = int(egn[0:2])
+    month = int(egn[2:4])
+    day = int(egn[4:6])
+    
+    # Adjust for different centuries based on month codes
+    if month > 40:  # 2000+
+        if not is_valid_date(day, month - 40, year + 2000):
+            return False
+    elif month > 20:  # 1800+
+        if not is_valid_date(day, month - 20, year + 1800):
+            return False
+    else:  # 1900+
+        if not is_valid_date(day, month, year + 1900):
+            return False
+            
+    # Calculate and validate checksum
+    checksum = int(egn[9])
+    egn_sum = 0
+    for i in range(9):
+        egn_sum += int(egn[i]) * EGN_WEIGHTS[i]
+    valid_checksum = egn_sum % 11
+    if valid_checksum == 10:
+        valid_checksum = 0
+        
+    return checksum == valid_checksum
+
+def is_valid_date(day, month, year):
+    """
+    Helper function to check if a date is valid
+    """
+    try:
+        if month < 1 or month > 12:
+            return False
+        # Get the last day of the month
+        last_day = calendar.monthrange(year, month)[1]
+        return 1 <= day <= last_day
+    except ValueError:
+        return False
+
+def validate_bulgarian_eik(eik):
+    """ 
+    Validates a Bulgarian EIK/BULSTAT number.
+    """
+    # Check if EIK is a string and only contains digits
+    if not isinstance(eik, str) or not eik.isdigit():
+        return False
+        
+    # EIK can be either 9 or 13 digits
+    if len(eik) == 9:
+        return validate_eik_9_digits(eik)
+    elif len(eik) == 13:
+        return validate_eik_13_digits(eik)
+    else:
+        return False
+        
+def validate_eik_9_digits(eik):
+    """Validates a 9-digit EIK number."""
+    # First check digit (position 8) weights
+    weights_1 = [1, 2, 3, 4, 5, 6, 7, 8]
+    sum_1 = 0
+    
+    for i in range(8):
+        sum_1 += int(eik[i]) * weights_1[i]
+        
+    remainder_1 = sum_1 % 11
+    
+    if remainder_1 == 10:
+        # Recalculate with different weights
+        weights_alt = [3, 4, 5, 6, 7, 8, 9, 10]
+        sum_alt = 0
+        
+        for i in range(8):
+            sum_alt += int(eik[i]) * weights_alt[i]
+            
+        remainder_1 = sum_alt % 11
+        if remainder_1 == 10:
+            remainder_1 = 0
+            
+    # Verify the check digit
+    return remainder_1 == int(eik[8])
+    
+def validate_eik_13_digits(eik):
+    """Validates a 13-digit EIK number."""
+    # First check if the first 9 digits are valid
+    if not validate_eik_9_digits(eik[:9]):
+        return False
+        
+    # Check the additional 4 digits
+    weights_2 = [2, 7, 3, 5]
+    sum_2 = 0
+    
+    for i in range(4):
+        sum_2 += int(eik[i+9]) * weights_2[i]
+        
+    remainder_2 = sum_2 % 11
+    
+    if remainder_2 == 10:
+        # Recalculate with different weights
+        weights_alt = [4, 9, 5, 7]
+        sum_alt = 0
+        
+        for i in range(4):
+            sum_alt += int(eik[i+9]) * weights_alt[i]
+            
+        remainder_2 = sum_alt % 11
+        if remainder_2 == 10:
+            remainder_2 = 0
+            
+    # Verify the check digit for the extension
+    return remainder_2 == int(eik[12])
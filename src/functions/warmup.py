@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+import time
+
+from src.functions.rfil_loader import RFIL_PRELOAD
+
+logger = logging.getLogger(__name__)
+
+# Pool connections opened at startup (-1: the pool size, 0: none)
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "-1"))
+# Seconds each warm-up step may take before it counts as failed
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "120"))
+# Steps that must succeed before the worker reports ready; by default the
+# steps this worker runs (the OCR step only runs with RFIL_PRELOAD)
+DEFAULT_REQUIRED_STEPS = ",".join(
+    (["db_pool"] if WARMUP_DB_CONNECTIONS else []) + (["ocr"] if RFIL_PRELOAD else [])
+)
+WARMUP_REQUIRED_STEPS = {
+    step.strip() for step in os.getenv("WARMUP_REQUIRED_STEPS", DEFAULT_REQUIRED_STEPS).split(",") if step.strip()
+}
+# Failed required steps are retried, waiting twice as long each time
+WARMUP_RETRY_DELAY = float(os.getenv("WARMUP_RETRY_DELAY", "1"))
+WARMUP_RETRY_MAX_DELAY = float(os.getenv("WARMUP_RETRY_MAX_DELAY", "60"))
+
+
+class Warmup:
+    """
+    Warm-up steps run in the background after the worker started; the
+    readiness endpoint reports ready once all of them finished and all the
+    required ones succeeded. Required steps are retried with backoff until
+    they succeed, so a database blip at startup only delays readiness. A
+    failed optional step (e.g. the model endpoint being down) only shows up
+    in the status.
+    """
+
+    def __init__(self, timeout: float = WARMUP_TIMEOUT, required_steps: set = None,
+                 retry_delay: float = WARMUP_RETRY_DELAY, retry_max_delay: float = WARMUP_RETRY_MAX_DELAY):
+        self.timeout = timeout
+        self.required_steps = WARMUP_REQUIRED_STEPS if required_steps is None else required_steps
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.steps = {}
+        self.started_at = None
+        self.finished_at = None
+        self._task = None
+
+    def start(self, steps: list):
+        """
+        steps: (name, coroutine function) pairs, run concurrently
+        """
+        self.started_at = time.time()
+        self.finished_at = None
+        self.steps = {name: {"status": "pending", "attempts": 0} for name, _ in steps}
+        # A required step that never runs would otherwise be skipped silently
+        for name in sorted(self.required_steps - set(self.steps)):
+            self.steps[name] = {"status": "failed", "attempts": 0, "error": "Required step is not registered for this worker"}
+            logger.error(f"Warm-up step {name} is required (WARMUP_REQUIRED_STEPS) but not registered; "
+                         f"the worker will not report ready")
+        self._task = asyncio.create_task(self._run(steps))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, steps: list):
+        await asyncio.gather(*(self._run_step(name, step) for name, step in steps))
+        self.finished_at = time.time()
+        failed = [name for name, step in self.steps.items() if step["status"] == "failed"]
+        seconds = self.finished_at - self.started_at
+        if failed:
+            logger.warning(f"Warm-up finished in {seconds:.2f}s, failed steps: {', '.join(failed)}")
+        else:
+            logger.info(f"Warm-up finished in {seconds:.2f}s")
+
+    async def _run_step(self, name: str, step):
+        status = self.steps[name]
+        start = time.perf_counter()
+        delay = self.retry_delay
+        while True:
+            status["status"] = "running"
+            status["attempts"] += 1
+            try:
+                status["detail"] = await asyncio.wait_for(step(), self.timeout)
+                status["status"] = "ok"
+                status.pop("error", None)
+                break
+            except asyncio.TimeoutError:
+                status["error"] = f"Timed out after {self.timeout}s"
+            except Exception as e:
+                status["error"] = str(e)
+            if name not in self.required_steps:
+                status["status"] = "failed"
+                logger.warning(f"Warm-up step {name} failed: {status['error']}")
+                break
+            status["status"] = "retrying"
+            logger.warning(f"Warm-up step {name} failed (attempt {status['attempts']}), retrying in {delay:g}s: {status['error']}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_max_delay)
+        status["seconds"] = round(time.perf_counter() - start, 3)
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and all(
+            step["status"] == "ok" for name, step in self.steps.items() if name in self.required_steps
+        )
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "finished": self.finished,
+            "seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "required_steps": sorted(self.required_steps),
+            "steps": self.steps,
+        }
+
+
+worker_warmup = Warmup()
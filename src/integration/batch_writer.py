@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Bounded in-memory queue flushed to the database in batches by one
+    background task.
+
+    A batch is written when batch_size items are waiting or flush_interval
+    seconds after its first item arrived, whichever comes first. flush_batch
+    returns the number of items it wrote; the rest of the batch counts as
+    failed. submit() never waits: it returns False when the queue is full or
+    the writer is not running, and the caller decides what to do with the item.
+    """
+
+    def __init__(self, name: str, flush_batch, max_queue_size: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0):
+        self.name = name
+        self.flush_batch = flush_batch
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = None
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_seconds = 0.0
+        self._task = None
+        self._pending = []
+        self._current_flush = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        # The queue belongs to the running event loop
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    def submit(self, item) -> bool:
+        if not self.running:
+            self.rejected += 1
+            return False
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Stop accepting items and flush everything still queued
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # A batch already being written is allowed to finish
+        if self._current_flush is not None and not self._current_flush.done():
+            await asyncio.wait([self._current_flush], timeout=timeout)
+
+        remaining, self._pending = self._pending, []
+        while not self.queue.empty():
+            remaining.append(self.queue.get_nowait())
+        for start in range(0, len(remaining), self.batch_size):
+            try:
+                await asyncio.wait_for(self._flush(remaining[start:start + self.batch_size]), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"{self.name}: timed out flushing on shutdown")
+                self.failed += len(remaining) - start
+                break
+
+    async def _collect(self):
+        # Items are kept in self._pending so stop() can still write them
+        # if the task is cancelled while a batch is being collected
+        self._pending.append(await self.queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._pending) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            if not await self._get_pending(timeout):
+                break
+        batch, self._pending = self._pending, []
+        return batch
+
+    async def _get_pending(self, timeout: float) -> bool:
+        # asyncio.wait rather than wait_for: on 3.11 wait_for can swallow a
+        # cancellation that arrives as the get completes, and stop() would
+        # then wait forever. An item that was already taken is kept.
+        getter = asyncio.ensure_future(self.queue.get())
+        try:
+            await asyncio.wait([getter], timeout=timeout)
+        finally:
+            if not getter.done():
+                getter.cancel()
+            elif not getter.cancelled():
+                self._pending.append(getter.result())
+        return getter.done() and not getter.cancelled()
+
+    async def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            written = await self.flush_batch(batch)
+            self.flushed += written
+            if written < len(batch):
+                self.failed += len(batch) - written
+                logger.warning(f"{self.name}: dropped {len(batch) - written} of {len(batch)} items")
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"{self.name}: failed to write {len(batch)} items: {str(e)}")
+        finally:
+            self.batches += 1
+            self.last_flush_seconds = time.perf_counter() - start
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Shielded so cancelling the writer never interrupts a write half way
+            self._current_flush = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._current_flush)
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_size": self.max_queue_size,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
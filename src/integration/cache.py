@@ -0,0 +1,198 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+import orjson
+
+WORKFLOW_LIST_KEY = "workflows:list"
+WORKFLOW_KEY_PREFIX = "workflow:"
+
+
+def workflow_key(workflow_id: str) -> str:
+    return f"{WORKFLOW_KEY_PREFIX}{workflow_id}"
+
+
+def executable_workflow_key(workflow_id: str) -> str:
+    """
+    Definition used to execute a workflow; unlike workflow_key, it is
+    never loaded for a soft-deleted workflow
+    """
+    return f"{WORKFLOW_KEY_PREFIX}{workflow_id}:executable"
+
+
+def serialize(data) -> bytes:
+    return orjson.dumps(data)
+
+
+def is_cacheable(data) -> bool:
+    # Database helpers report failures as {"status": "error", "message": ...}
+    return not (isinstance(data, dict) and data.get("status") == "error" and "message" in data)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an If-None-Match header against a strong ETag (weak comparison,
+    as required for If-None-Match)
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class CacheEntry:
+    def __init__(self, body: bytes, created_at: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest() + '"'
+        self.created_at = created_at
+
+
+class ResponseCache:
+    """
+    In-process cache of serialised responses with strong ETags.
+
+    Every invalidation bumps a generation counter; a value loaded while an
+    invalidation happened is returned to its caller but not cached, so a
+    slow read can never put stale data back after a write.
+
+    A disabled cache (see suspend()) misses every lookup and stores nothing.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = True
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl and time.monotonic() - entry.created_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def lookup(self, key: str):
+        """
+        get() that also counts hits and misses
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return entry
+
+    def set(self, key: str, data, generation: int = None):
+        return self.set_body(key, serialize(data), generation)
+
+    def set_body(self, key: str, body: bytes, generation: int = None):
+        """
+        Store an already serialised JSON body
+        """
+        entry = CacheEntry(body, time.monotonic())
+        if not self.enabled or (generation is not None and generation != self.generation):
+            return entry
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def stream_into(self, key: str, chunks, generation: int, max_bytes: int):
+        """
+        Pass streamed chunks through and cache the complete body afterwards,
+        unless it grows beyond max_bytes (then nothing is kept in memory)
+        """
+        buffer = []
+        size = 0
+        async for chunk in chunks:
+            if buffer is not None:
+                size += len(chunk)
+                if size <= max_bytes:
+                    buffer.append(chunk)
+                else:
+                    buffer = None
+            yield chunk
+        if buffer is not None:
+            self.set_body(key, b"".join(buffer), generation)
+
+    async def get_or_load(self, key: str, loader, cacheable=is_cacheable):
+        """
+        Return (entry, data) where data is only set when it was loaded.
+        entry is None when the loaded data must not be cached (e.g. an error
+        response) and data should be returned as is.
+        """
+        entry = self.lookup(key)
+        if entry is not None:
+            return entry, None
+
+        generation = self.generation
+        data = await loader()
+        if not cacheable(data):
+            return None, data
+        return self.set(key, data, generation), data
+
+    def invalidate(self, *keys: str, prefix: str = None):
+        self.generation += 1
+        for key in keys:
+            self._entries.pop(key, None)
+        if prefix is not None:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def invalidate_workflow(self, workflow_id: str = None):
+        """
+        Drop a workflow and every cached workflow list
+        """
+        keys = [workflow_key(workflow_id), executable_workflow_key(workflow_id)] if workflow_id is not None else []
+        self.invalidate(*keys, prefix=WORKFLOW_LIST_KEY)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def suspend(self):
+        """
+        Stop caching, e.g. while invalidations from other workers can not
+        be received; every read goes to the database until resume()
+        """
+        self.enabled = False
+        self.clear()
+
+    def resume(self):
+        self.clear()
+        self.enabled = True
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "generation": self.generation,
+        }
+
+
+# Largest streamed response that is still cached
+CACHE_MAX_BODY_BYTES = int(os.getenv("WORKFLOW_CACHE_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+
+workflow_cache = ResponseCache(
+    max_entries=int(os.getenv("WORKFLOW_CACHE_MAX_ENTRIES", "512")),
+    ttl=float(os.getenv("WORKFLOW_CACHE_TTL", "300")) or None
+)
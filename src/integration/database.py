@@ -1,80 +1,353 @@
-from sqlalchemy import create_engine, select, update
+from sqlalchemy import create_engine, select, update, insert, tuple_, func, or_, literal_column, type_coerce, text, cast, column, values as values_list, Date, DateTime
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.exc import IntegrityError, DataError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
-from datetime import datetime
+import json
+import base64
+import asyncio
+import logging
+from datetime import datetime, timedelta
 
-from ..functions.utils import assign_new_values
+from .pool import PoolSettings, create_pooled_engine, get_pool_status
+from .cache import workflow_cache
+from .invalidation import publish_workflow_change
+from .metrics import timed_db
+from ..functions.utils import assign_new_values, compress_json, compress_text, decompress_json, decompress_text
+from ..functions.entity_index import entity_index_rows, normalize_name, normalize_identification_number
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 # Database connection
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_CONNECTION")
 
-engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL,
-    echo=True,
-    future=True,
-    connect_args={"ssl": False}
-)
+# The engine is created by init_engine (called from the app lifespan) so
+# pool settings are read once per worker and the pool can be disposed on shutdown
+pool_settings = PoolSettings()
+engine = None
 
 SessionLocal = sessionmaker(
-    engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
 Base = declarative_base()
 
+def init_engine():
+    global engine
+    if engine is None:
+        engine = create_pooled_engine(SQLALCHEMY_DATABASE_URL, pool_settings)
+        SessionLocal.configure(bind=engine)
+    return engine
+
+async def dispose_engine():
+    global engine
+    if engine is not None:
+        await engine.dispose()
+        engine = None
+
+def get_pool_stats():
+    return get_pool_status(engine, pool_settings)
+
+async def prime_pool(connections: int = None):
+    """
+    Open `connections` pool connections at once (default: the pool size)
+    so the first requests do not wait for connection handshakes
+    """
+    if engine is None:
+        init_engine()
+    if connections is None or connections < 0:
+        connections = pool_settings.pool_size
+    opened = await asyncio.gather(*(engine.connect() for _ in range(connections)), return_exceptions=True)
+    try:
+        for connection in opened:
+            if isinstance(connection, BaseException):
+                raise connection
+        await asyncio.gather(*(connection.execute(text("SELECT 1")) for connection in opened))
+    finally:
+        # Closing returns them to the pool, which keeps up to pool_size open
+        for connection in opened:
+            if not isinstance(connection, BaseException):
+                await connection.close()
+    return {"connections": connections}
+
 # Dependency to get DB session
 async def get_db():
+    if engine is None:
+        init_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         await db.close()
 
-from .models import WorkflowFormStructure, WorkflowStructure, WorkflowSubmission
+from .models import WorkflowFormStructure, WorkflowStructure, WorkflowSubmission, WorkflowFeedbackDaily, WorkflowFeedbackTotal, WorkflowLog, RfilResult, RfilEntity
+
+# Columns of the workflow list by their camelCase response key
+WORKFLOW_LIST_COLUMNS = {
+    "id": WorkflowStructure.id,
+    "name": WorkflowStructure.name,
+    "description": WorkflowStructure.description,
+    "status": WorkflowStructure.status,
+    "fields": WorkflowStructure.fields,
+    "apiConfig": WorkflowStructure.api_config,
+    "category": WorkflowStructure.category,
+    "version": WorkflowStructure.version,
+    "isPublished": WorkflowStructure.is_published,
+    "createdAt": WorkflowStructure.created_at,
+    "updatedAt": WorkflowStructure.updated_at,
+    "createdBy": WorkflowStructure.created_by
+}
+
+# Large JSONB columns left out by the "summary" projection
+WORKFLOW_JSON_COLUMNS = ("fields", "apiConfig")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round trip when streaming the list
+STREAM_BATCH_SIZE = int(os.getenv("WORKFLOW_STREAM_BATCH_SIZE", "500"))
 
-async def get_all_workflows(db: AsyncSession):
+def encode_workflow_cursor(updated_at, workflow_id):
+    raw = json.dumps([updated_at.isoformat(), workflow_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_workflow_cursor(cursor: str):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    updated_at, workflow_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    return datetime.fromisoformat(updated_at), str(workflow_id)
+
+def resolve_workflow_projection(fields: str = None):
+    """
+    Response keys to select: all of them, "summary" (everything except the
+    JSON columns) or a comma-separated list of keys
+    """
+    if not fields:
+        return list(WORKFLOW_LIST_COLUMNS)
+    if fields == "summary":
+        return [key for key in WORKFLOW_LIST_COLUMNS if key not in WORKFLOW_JSON_COLUMNS]
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(WORKFLOW_LIST_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return [key for key in WORKFLOW_LIST_COLUMNS if key in requested]
+
+def workflow_row_to_dict(row, keys):
+    workflow_dict = {}
+    for key in keys:
+        value = row[key]
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        workflow_dict[key] = value
+    return workflow_dict
+
+def build_workflow_list_query(keys, category: str = None, status: str = None,
+                              is_published: bool = None, last_seen=None):
+    # updated_at and id are always read because they form the cursor
+    selected = list(dict.fromkeys(keys + ["updatedAt", "id"]))
+    query = (
+        select(*[WORKFLOW_LIST_COLUMNS[key].label(key) for key in selected])
+        .where(WorkflowStructure.is_deleted == False)
+    )
+
+    if category is not None:
+        query = query.where(WorkflowStructure.category == category)
+    if status is not None:
+        query = query.where(WorkflowStructure.status == status)
+    if is_published is not None:
+        query = query.where(WorkflowStructure.is_published == is_published)
+    if last_seen is not None:
+        query = query.where(
+            tuple_(WorkflowStructure.updated_at, WorkflowStructure.id) < tuple_(*last_seen)
+        )
+
+    return query.order_by(WorkflowStructure.updated_at.desc(), WorkflowStructure.id.desc())
+
+@timed_db
+async def get_all_workflows(db: AsyncSession, limit: int = None, cursor: str = None, category: str = None,
+                            status: str = None, is_published: bool = None, fields: str = None):
+    """
+    List non-deleted workflows, newest first (updated_at, id).
+
+    Without limit/cursor the whole list is returned. With them, one page
+    is returned as {"items": [...], "nextCursor": ...}; pass nextCursor
+    back to get the following page.
+    """
     try:
-        result = await db.execute(
-            select(WorkflowStructure)
+        try:
+            keys = resolve_workflow_projection(fields)
+            last_seen = decode_workflow_cursor(cursor) if cursor else None
+        except (ValueError, TypeError) as e:
+            return {"status": "error", "message": f"Invalid request: {str(e)}"}
+
+        query = build_workflow_list_query(keys, category, status, is_published, last_seen)
+
+        paginated = limit is not None or cursor is not None
+        if paginated:
+            page_size = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+            # One extra row tells whether there is a next page
+            query = query.limit(page_size + 1)
+
+        result = await db.execute(query)
+        rows = result.mappings().all()
+
+        if not paginated:
+            return [workflow_row_to_dict(row, keys) for row in rows]
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_workflow_cursor(rows[-1]["updatedAt"], rows[-1]["id"])
+
+        return {
+            "items": [workflow_row_to_dict(row, keys) for row in rows],
+            "nextCursor": next_cursor
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@timed_db
+async def stream_workflows(category: str = None, status: str = None, is_published: bool = None,
+                           fields: str = None, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Yield the workflow list one row at a time from a server-side cursor,
+    so memory use does not depend on the number of workflows.
+
+    Opens its own session: a streamed response outlives the request's
+    dependencies.
+    """
+    keys = resolve_workflow_projection(fields)
+    query = build_workflow_list_query(keys, category, status, is_published).execution_options(yield_per=batch_size)
+
+    if engine is None:
+        init_engine()
+    async with SessionLocal() as db:
+        result = await db.stream(query)
+        async for row in result.mappings():
+            # Datetimes are left to the JSON encoder
+            yield {key: row[key] for key in keys}
+
+# Must match the expression of the full-text index in sql_migrations/002_workflow_search_indexes.sql
+WORKFLOW_SEARCH_DOCUMENT = literal_column(
+    "to_tsvector('simple', coalesce(workflow_structures.name, '') || ' ' || coalesce(workflow_structures.description, ''))"
+)
+
+def workflow_json_filters(field_type: str = None, accepts: str = None, api_method: str = None,
+                          fields_contains: str = None, api_config_contains: str = None):
+    """
+    Build JSONB containment (@>) conditions over fields and api_config,
+    e.g. field_type="file", accepts=".pdf" for workflows with a file field
+    accepting PDFs. Raw JSON documents can be passed for other queries.
+    """
+    conditions = []
+    fields_column = type_coerce(WorkflowStructure.fields, JSONB)
+    api_config_column = type_coerce(WorkflowStructure.api_config, JSONB)
+
+    if field_type or accepts:
+        field = {}
+        if field_type:
+            field["type"] = field_type
+        if accepts:
+            field["validation"] = {"fileTypes": [accepts]}
+        conditions.append(fields_column.contains([field]))
+    if api_method:
+        conditions.append(api_config_column.contains({"method": api_method.upper()}))
+    if fields_contains:
+        conditions.append(fields_column.contains(json.loads(fields_contains)))
+    if api_config_contains:
+        conditions.append(api_config_column.contains(json.loads(api_config_contains)))
+    return conditions
+
+@timed_db
+async def search_workflows(db: AsyncSession, q: str = None, field_type: str = None, accepts: str = None,
+                           api_method: str = None, fields_contains: str = None, api_config_contains: str = None,
+                           category: str = None, fields: str = "summary", limit: int = 20, offset: int = 0):
+    """
+    Search non-deleted workflows by name/description (full-text and
+    trigram similarity) and by the content of their JSONB definitions.
+    Results are ranked by text relevance and paginated with limit/offset.
+    """
+    try:
+        try:
+            keys = resolve_workflow_projection(fields)
+            json_conditions = workflow_json_filters(field_type, accepts, api_method, fields_contains, api_config_contains)
+        except (ValueError, TypeError) as e:
+            return {"status": "error", "message": f"Invalid request: {str(e)}"}
+
+        q = (q or "").strip()
+        if not q and not json_conditions:
+            return {"status": "error", "message": "Provide a search text (q) or at least one definition filter"}
+
+        if q:
+            ts_query = func.plainto_tsquery(literal_column("'simple'"), q)
+            pattern = f"%{q}%"
+            rank = (
+                func.ts_rank(WORKFLOW_SEARCH_DOCUMENT, ts_query)
+                + func.similarity(WorkflowStructure.name, q)
+                + func.similarity(func.coalesce(WorkflowStructure.description, ""), q) * 0.5
+            )
+            text_condition = or_(
+                WORKFLOW_SEARCH_DOCUMENT.op("@@")(ts_query),
+                WorkflowStructure.name.op("%")(q),
+                WorkflowStructure.name.ilike(pattern),
+                WorkflowStructure.description.ilike(pattern)
+            )
+        else:
+            rank = literal_column("0.0")
+            text_condition = None
+
+        page_size = min(max(limit or 20, 1), MAX_PAGE_SIZE)
+        offset = max(offset or 0, 0)
+
+        query = (
+            select(*[WORKFLOW_LIST_COLUMNS[key].label(key) for key in keys], rank.label("rank"))
             .where(WorkflowStructure.is_deleted == False)
+            .where(*json_conditions)
         )
-        workflows = result.scalars().all()
-        
-        workflow_list = [
-            {
-                "id": workflow.id,
-                "name": workflow.name,
-                "description": workflow.description,
-                "status": workflow.status,
-                "fields": workflow.fields,
-                "apiConfig": workflow.api_config,
-                "category": workflow.category,
-                "version": workflow.version,
-                "isPublished": workflow.is_published,
-                "createdAt": workflow.created_at.isoformat(),
-                "updatedAt": workflow.updated_at.isoformat(),
-                "createdBy": workflow.created_by
-            }
-            for workflow in workflows
-        ]
-        
-        return workflow_list
+        if text_condition is not None:
+            query = query.where(text_condition)
+        if category is not None:
+            query = query.where(WorkflowStructure.category == category)
+
+        # One extra row tells whether there is a next page
+        query = (
+            query.order_by(literal_column("rank").desc(), WorkflowStructure.updated_at.desc(), WorkflowStructure.id)
+            .offset(offset)
+            .limit(page_size + 1)
+        )
+
+        result = await db.execute(query)
+        rows = result.mappings().all()
+
+        has_more = len(rows) > page_size
+        items = []
+        for row in rows[:page_size]:
+            item = workflow_row_to_dict(row, keys)
+            item["rank"] = round(float(row["rank"] or 0.0), 4)
+            items.append(item)
+
+        return {
+            "items": items,
+            "nextOffset": offset + page_size if has_more else None
+        }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-async def get_workflow_by_id(db: AsyncSession, workflow_id: str):
+@timed_db
+async def get_workflow_by_id(db: AsyncSession, workflow_id: str, include_deleted: bool = True):
     try:
         # Use async query instead of sync query
-        result = await db.execute(
-            select(WorkflowFormStructure)
-            .where(WorkflowFormStructure.id == workflow_id)
-        )
+        query = select(WorkflowFormStructure).where(WorkflowFormStructure.id == workflow_id)
+        if not include_deleted:
+            query = query.where(WorkflowStructure.is_deleted == False)
+        result = await db.execute(query)
         workflow = result.scalar_one_or_none()
         
         if not workflow:
@@ -94,6 +367,7 @@ async def get_workflow_by_id(db: AsyncSession, workflow_id: str):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@timed_db
 async def update_workflow(db: AsyncSession, workflow_id: str, workflow_data: dict):
     try:
         # Create a dictionary for all the values to update
@@ -146,9 +420,11 @@ async def update_workflow(db: AsyncSession, workflow_id: str, workflow_data: dic
         
         # Execute the statement
         await db.execute(update_stmt)
+        await publish_workflow_change(db, workflow_id)
         
         # Explicitly commit the transaction
         await db.commit()
+        workflow_cache.invalidate_workflow(workflow_id)
         
         return {
             "status": "success",
@@ -160,6 +436,7 @@ async def update_workflow(db: AsyncSession, workflow_id: str, workflow_data: dic
         await db.rollback()
         return {"status": "error", "message": str(e)}
 
+@timed_db
 async def create_workflow(db: AsyncSession, workflow_data: dict):
     try:
         # Create new WorkflowStructure instance
@@ -178,7 +455,9 @@ async def create_workflow(db: AsyncSession, workflow_data: dict):
         
         # Add to database with async methods
         db.add(new_workflow)
+        await publish_workflow_change(db, new_workflow.id)
         await db.commit()
+        workflow_cache.invalidate_workflow(new_workflow.id)
         
         return {
             "status": "success",
@@ -189,6 +468,7 @@ async def create_workflow(db: AsyncSession, workflow_data: dict):
         await db.rollback()  # Use async rollback
         return {"status": "error", "message": str(e)}
 
+@timed_db
 async def delete_workflow(db: AsyncSession, workflow_id: str):
     try:
         # Find the workflow using async methods
@@ -203,9 +483,11 @@ async def delete_workflow(db: AsyncSession, workflow_id: str):
         
         # Set is_deleted to True
         workflow.is_deleted = True
+        await publish_workflow_change(db, workflow_id)
         
         # Commit using async methods
         await db.commit()
+        workflow_cache.invalidate_workflow(workflow_id)
         
         return {
             "status": "success",
@@ -216,16 +498,250 @@ async def delete_workflow(db: AsyncSession, workflow_id: str):
         await db.rollback()  # Use async rollback
         return {"status": "error", "message": str(e)}
 
+BULK_OPERATIONS = ("create", "upsert", "delete")
+MAX_BULK_OPERATIONS = 1000
+
+# Keys a bulk create/upsert may set, by camelCase request key
+WORKFLOW_WRITE_COLUMNS = {
+    key: column.key for key, column in WORKFLOW_LIST_COLUMNS.items()
+    if key not in ("createdAt", "updatedAt")
+}
+
+def workflow_write_values(workflow_data: dict):
+    return {
+        WORKFLOW_WRITE_COLUMNS[key]: value
+        for key, value in workflow_data.items()
+        if key in WORKFLOW_WRITE_COLUMNS
+    }
+
+@timed_db
+async def bulk_apply_workflows(db: AsyncSession, operations: list):
+    """
+    Apply a list of {"op": "create"|"upsert"|"delete", "workflow": {...}}
+    operations ("delete" may pass "id" instead of "workflow") in one
+    transaction: creates and upserts as multi-row INSERT ... ON CONFLICT,
+    upserts without a name as UPDATE ... FROM (VALUES ...), deletes as a
+    single soft-delete UPDATE ... WHERE id = ANY(...).
+    An upsert only overwrites the keys it sends and restores a soft-deleted
+    workflow. Returns one result per operation, in request order.
+    """
+    if len(operations) > MAX_BULK_OPERATIONS:
+        return {"status": "error", "message": f"At most {MAX_BULK_OPERATIONS} operations per request"}
+
+    results = [None] * len(operations)
+    creates = []
+    upserts = []
+    deletes = {}
+    seen = set()
+
+    # Everything that would make the statements fail is rejected per item
+    # here, so one bad operation does not roll back the others
+    for index, operation in enumerate(operations):
+        op = operation.get("op") if isinstance(operation, dict) else None
+        workflow_data = (operation.get("workflow") or {}) if op else {}
+        if not isinstance(workflow_data, dict):
+            results[index] = {"id": None, "op": op, "status": "error", "message": "workflow must be an object"}
+            continue
+        workflow_id = workflow_data.get("id") or (operation.get("id") if op == "delete" else None)
+
+        if op not in BULK_OPERATIONS:
+            results[index] = {"id": workflow_id, "status": "error", "message": f"op must be one of {', '.join(BULK_OPERATIONS)}"}
+            continue
+        if not workflow_id:
+            results[index] = {"id": None, "op": op, "status": "error", "message": "id is required"}
+            continue
+        if not isinstance(workflow_id, str):
+            results[index] = {"id": workflow_id, "op": op, "status": "error", "message": "id must be a string"}
+            continue
+        # A row can only be touched once per statement
+        if workflow_id in seen:
+            results[index] = {"id": workflow_id, "op": op, "status": "error", "message": "Duplicate id in request"}
+            continue
+        seen.add(workflow_id)
+
+        if op == "delete":
+            deletes[workflow_id] = index
+            continue
+
+        values = workflow_write_values(workflow_data)
+        if (op == "create" or "name" in values) and not values.get("name"):
+            results[index] = {"id": workflow_id, "op": op, "status": "error", "message": "name is required"}
+            continue
+        if op == "create":
+            creates.append((index, values))
+        else:
+            upserts.append((index, values))
+
+    now = datetime.utcnow()
+    defaults = {"version": 1, "is_published": False, "is_deleted": False, "created_at": now, "updated_at": now}
+    changed = []
+
+    try:
+        if creates:
+            statement = pg_insert(WorkflowStructure).values([
+                {**defaults, **values} for _, values in creates
+            ]).on_conflict_do_nothing(index_elements=[WorkflowStructure.id]).returning(WorkflowStructure.id)
+            inserted = set((await db.execute(statement)).scalars())
+            for index, values in creates:
+                if values["id"] in inserted:
+                    results[index] = {"id": values["id"], "op": "create", "status": "created"}
+                    changed.append(values["id"])
+                else:
+                    results[index] = {"id": values["id"], "op": "create", "status": "error", "message": "Workflow already exists"}
+
+        # Multi-row VALUES need the same columns in every row. An upsert
+        # without a name can only update an existing workflow: as an INSERT
+        # its proposed row would fail the NOT NULL name check before
+        # ON CONFLICT is considered, so those are applied as UPDATEs
+        upsert_groups = {}
+        update_groups = {}
+        for index, values in upserts:
+            groups = upsert_groups if "name" in values else update_groups
+            groups.setdefault(tuple(sorted(values)), []).append((index, values))
+
+        for columns, group in update_groups.items():
+            changes = values_list(
+                *[column(name, WorkflowStructure.__table__.c[name].type) for name in columns],
+                name="changes"
+            ).data([tuple(values[name] for name in columns) for _, values in group])
+            update_columns = {name: changes.c[name] for name in columns if name != "id"}
+            update_columns.update({"updated_at": now, "is_deleted": False})
+            statement = (
+                update(WorkflowStructure)
+                .where(WorkflowStructure.id == changes.c.id)
+                .values(update_columns)
+                .returning(WorkflowStructure.id)
+            )
+            updated = set((await db.execute(statement)).scalars())
+            for index, values in group:
+                if values["id"] in updated:
+                    results[index] = {"id": values["id"], "op": "upsert", "status": "updated"}
+                    changed.append(values["id"])
+                else:
+                    results[index] = {"id": values["id"], "op": "upsert", "status": "error", "message": "name is required to create a workflow"}
+
+        for columns, group in upsert_groups.items():
+            statement = pg_insert(WorkflowStructure).values([
+                {**defaults, **values} for _, values in group
+            ])
+            update_columns = {column: statement.excluded[column] for column in columns if column != "id"}
+            update_columns.update({"updated_at": now, "is_deleted": False})
+            statement = statement.on_conflict_do_update(
+                index_elements=[WorkflowStructure.id],
+                set_=update_columns
+            ).returning(WorkflowStructure.id, literal_column("xmax = 0").label("inserted"))
+            outcome = {row.id: row.inserted for row in await db.execute(statement)}
+            for index, values in group:
+                results[index] = {
+                    "id": values["id"],
+                    "op": "upsert",
+                    "status": "created" if outcome.get(values["id"]) else "updated"
+                }
+                changed.append(values["id"])
+
+        if deletes:
+            statement = (
+                update(WorkflowStructure)
+                .where(WorkflowStructure.id == func.any(list(deletes)))
+                .values(is_deleted=True, updated_at=now)
+                .returning(WorkflowStructure.id)
+            )
+            deleted = set((await db.execute(statement)).scalars())
+            for workflow_id, index in deletes.items():
+                if workflow_id in deleted:
+                    results[index] = {"id": workflow_id, "op": "delete", "status": "deleted"}
+                    changed.append(workflow_id)
+                else:
+                    results[index] = {"id": workflow_id, "op": "delete", "status": "error", "message": f"Workflow with id {workflow_id} not found"}
+
+        if changed:
+            await publish_workflow_change(db, *changed)
+        await db.commit()
+    except Exception as e:
+        logger.error(f"Error in bulk_apply_workflows: {str(e)}")
+        await db.rollback()
+        return {"status": "error", "message": str(e)}
+
+    for workflow_id in changed:
+        workflow_cache.invalidate_workflow(workflow_id)
+
+    failed = sum(1 for result in results if result["status"] == "error")
+    return {
+        "status": "success" if not failed else "partial",
+        "applied": len(changed),
+        "failed": failed,
+        "results": results
+    }
+
+def submission_values(submission_data: dict):
+    """
+    Column values of a workflow submission. submitted_at is taken when the
+    feedback arrives, not when a buffered batch is written.
+    """
+    return {
+        "workflow_id": submission_data.get('workflowId'),
+        "is_positive": True if submission_data.get('feedback') == "positive" else False,
+        "submitted_at": datetime.utcnow()
+    }
+
+async def apply_feedback_rollup(db: AsyncSession, rows: list):
+    """
+    Add submissions (submission_values dicts) to the per-day and all-time
+    counters with upserts, in the caller's transaction. Keys are sorted so
+    concurrent writers lock the counter rows in the same order.
+    """
+    daily = {}
+    totals = {}
+    for row in rows:
+        positive = 1 if row["is_positive"] else 0
+        key = (row["workflow_id"], row["submitted_at"].date())
+        counts = daily.setdefault(key, [0, 0])
+        counts[0] += positive
+        counts[1] += 1 - positive
+
+        total = totals.setdefault(row["workflow_id"], [0, 0, row["submitted_at"]])
+        total[0] += positive
+        total[1] += 1 - positive
+        total[2] = max(total[2], row["submitted_at"])
+
+    if not daily:
+        return
+
+    daily_insert = pg_insert(WorkflowFeedbackDaily).values([
+        {"workflow_id": workflow_id, "day": day, "positive_count": counts[0], "negative_count": counts[1]}
+        for (workflow_id, day), counts in sorted(daily.items())
+    ])
+    await db.execute(daily_insert.on_conflict_do_update(
+        index_elements=[WorkflowFeedbackDaily.workflow_id, WorkflowFeedbackDaily.day],
+        set_={
+            "positive_count": WorkflowFeedbackDaily.positive_count + daily_insert.excluded.positive_count,
+            "negative_count": WorkflowFeedbackDaily.negative_count + daily_insert.excluded.negative_count
+        }
+    ))
+
+    totals_insert = pg_insert(WorkflowFeedbackTotal).values([
+        {"workflow_id": workflow_id, "positive_count": total[0], "negative_count": total[1], "last_submitted_at": total[2]}
+        for workflow_id, total in sorted(totals.items())
+    ])
+    await db.execute(totals_insert.on_conflict_do_update(
+        index_elements=[WorkflowFeedbackTotal.workflow_id],
+        set_={
+            "positive_count": WorkflowFeedbackTotal.positive_count + totals_insert.excluded.positive_count,
+            "negative_count": WorkflowFeedbackTotal.negative_count + totals_insert.excluded.negative_count,
+            "last_submitted_at": func.greatest(WorkflowFeedbackTotal.last_submitted_at, totals_insert.excluded.last_submitted_at)
+        }
+    ))
+
+@timed_db
 async def create_workflow_submission(db: AsyncSession, submission_data: dict):
     try:
         # Create new WorkflowSubmission instance
-        new_submission = WorkflowSubmission(
-            workflow_id=submission_data.get('workflowId'),
-            is_positive= True if submission_data.get('feedback') == "positive" else False
-        )
+        values = submission_values(submission_data)
+        new_submission = WorkflowSubmission(**values)
         
-        # Add to database with async methods
+        # Add to database with async methods, counters in the same transaction
         db.add(new_submission)
+        await apply_feedback_rollup(db, [values])
         await db.commit()
         
         return {
@@ -235,4 +751,460 @@ async def create_workflow_submission(db: AsyncSession, submission_data: dict):
         
     except Exception as e:
         await db.rollback()  # Use async rollback
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        return {"status": "error", "message": str(e)}
+
+# Rows per multi-row INSERT; 3 parameters per row stays well below the
+# 32767 bind parameters a Postgres statement may have
+SUBMISSION_INSERT_CHUNK_SIZE = 2000
+
+async def insert_submission_chunk(db: AsyncSession, rows: list):
+    """
+    Write one chunk of submissions and its counters in one transaction.
+    If the chunk is rejected because of its data (e.g. an unknown workflow
+    id), rows are retried one by one in savepoints so one bad row does not
+    drop the rest. Returns the number of rows written.
+    """
+    try:
+        await db.execute(insert(WorkflowSubmission).values(rows))
+        await apply_feedback_rollup(db, rows)
+        await db.commit()
+        return len(rows)
+    except (IntegrityError, DataError) as e:
+        await db.rollback()
+        logger.warning(f"Batch insert of {len(rows)} submissions failed, retrying row by row: {str(e)}")
+
+    written = []
+    for row in rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(WorkflowSubmission).values(row))
+            written.append(row)
+        except Exception as row_error:
+            logger.error(f"Dropping submission for workflow {row.get('workflow_id')}: {str(row_error)}")
+    await apply_feedback_rollup(db, written)
+    await db.commit()
+    return len(written)
+
+@timed_db
+async def insert_workflow_submissions(rows: list):
+    """
+    Write many submissions (submission_values dicts) with multi-row INSERTs
+    of up to SUBMISSION_INSERT_CHUNK_SIZE rows, each chunk in its own
+    transaction. Returns the number of rows written; rows rejected because
+    of their data are dropped. Connection errors are raised to the caller.
+
+    Opens its own session: it runs from the background feedback writer.
+    """
+    if not rows:
+        return 0
+    if engine is None:
+        init_engine()
+
+    written = 0
+    async with SessionLocal() as db:
+        for start in range(0, len(rows), SUBMISSION_INSERT_CHUNK_SIZE):
+            written += await insert_submission_chunk(db, rows[start:start + SUBMISSION_INSERT_CHUNK_SIZE])
+    return written
+
+@timed_db
+async def insert_workflow_logs(rows: list):
+    """
+    Write a batch of workflow execution logs with one multi-row INSERT.
+    If it is rejected because of its data, rows are retried one by one in
+    savepoints so one bad log does not drop the batch. Returns the number
+    of rows written.
+
+    Opens its own session: it runs from the background log writer.
+    """
+    if not rows:
+        return 0
+    if engine is None:
+        init_engine()
+
+    async with SessionLocal() as db:
+        try:
+            await db.execute(insert(WorkflowLog).values(rows))
+            await db.commit()
+            return len(rows)
+        except (IntegrityError, DataError) as e:
+            await db.rollback()
+            logger.warning(f"Batch insert of {len(rows)} workflow logs failed, retrying row by row: {str(e)}")
+
+        written = 0
+        for row in rows:
+            try:
+                async with db.begin_nested():
+                    await db.execute(insert(WorkflowLog).values(row))
+                written += 1
+            except Exception as row_error:
+                logger.error(f"Dropping execution log for workflow {row.get('workflow_name')}: {str(row_error)}")
+        await db.commit()
+        return written
+
+FEEDBACK_STATS_BUCKETS = ("day", "week", "month")
+
+@timed_db
+async def get_feedback_stats(db: AsyncSession, workflow_id: str, bucket: str = "day", days: int = 30):
+    """
+    Positive/negative counts for a workflow, all time and as a series of
+    day/week/month buckets over the last `days` days. Reads only the
+    rollup tables, so the cost depends on the number of buckets.
+    """
+    try:
+        if bucket not in FEEDBACK_STATS_BUCKETS:
+            return {"status": "error", "message": f"bucket must be one of {', '.join(FEEDBACK_STATS_BUCKETS)}"}
+        days = min(max(days, 1), 3660)
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+
+        totals_result = await db.execute(
+            select(WorkflowFeedbackTotal)
+            .where(WorkflowFeedbackTotal.workflow_id == workflow_id)
+        )
+        totals = totals_result.scalar_one_or_none()
+
+        # date_trunc(text, date) resolves to the timestamptz variant, whose
+        # result depends on the server TimeZone; truncate a plain timestamp
+        # and cast back so buckets are calendar dates
+        bucket_start = cast(
+            func.date_trunc(bucket, cast(WorkflowFeedbackDaily.day, DateTime)), Date
+        ).label("bucket")
+        series_result = await db.execute(
+            select(
+                bucket_start,
+                func.sum(WorkflowFeedbackDaily.positive_count).label("positive"),
+                func.sum(WorkflowFeedbackDaily.negative_count).label("negative")
+            )
+            .where(WorkflowFeedbackDaily.workflow_id == workflow_id)
+            .where(WorkflowFeedbackDaily.day >= since)
+            .group_by(bucket_start)
+            .order_by(bucket_start)
+        )
+
+        def counts(positive, negative):
+            positive = int(positive or 0)
+            negative = int(negative or 0)
+            total = positive + negative
+            return {
+                "positive": positive,
+                "negative": negative,
+                "total": total,
+                "positiveRate": round(positive / total, 4) if total else None
+            }
+
+        series = []
+        for row in series_result:
+            point = counts(row.positive, row.negative)
+            point["bucket"] = row.bucket.isoformat()
+            series.append(point)
+
+        period = counts(sum(p["positive"] for p in series), sum(p["negative"] for p in series))
+
+        # Trend: change in positive rate between the last two buckets
+        trend = None
+        rated = [p for p in series if p["positiveRate"] is not None]
+        if len(rated) >= 2:
+            trend = round(rated[-1]["positiveRate"] - rated[-2]["positiveRate"], 4)
+
+        return {
+            "workflowId": workflow_id,
+            "bucket": bucket,
+            "since": since.isoformat(),
+            "allTime": counts(totals.positive_count, totals.negative_count) if totals else counts(0, 0),
+            "lastSubmittedAt": totals.last_submitted_at.isoformat() if totals and totals.last_submitted_at else None,
+            "period": period,
+            "trend": trend,
+            "series": series
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def fit_entity_row(row: dict):
+    """
+    Make an rfil_entities row fit its columns: identification numbers that
+    are too long for any EGN/EIK are dropped, other strings truncated
+    """
+    columns = RfilEntity.__table__.c
+    fitted = {}
+    for key, value in row.items():
+        length = getattr(columns[key].type, "length", None)
+        if isinstance(value, str) and length is not None and len(value) > length:
+            value = None if key in ("identification_number", "original_identification_number") else value[:length]
+        fitted[key] = value
+    return fitted
+
+async def index_rfil_entities(db: AsyncSession, file_id: str, filename: str, result: dict, extracted_text: str = None):
+    """
+    Add the entities of a stored RFIL response to rfil_entities, in the
+    caller's transaction. If the multi-row INSERT is rejected because of its
+    data, rows are retried one by one so one bad entity does not drop the
+    document. A failure (e.g. the table does not exist yet) is logged and
+    does not lose the result itself.
+    """
+    rows = [fit_entity_row(row) for row in entity_index_rows(file_id, filename, result, extracted_text)]
+    if not rows:
+        return 0
+    # The result row must exist before its entities reference it
+    await db.flush()
+    try:
+        async with db.begin_nested():
+            await db.execute(insert(RfilEntity).values(rows))
+        return len(rows)
+    except (IntegrityError, DataError) as e:
+        logger.warning(f"Could not index the entities of RFIL result {file_id} in one insert, retrying row by row: {str(e)}")
+    except Exception as e:
+        logger.error(f"Could not index the entities of RFIL result {file_id}: {str(e)}")
+        return 0
+
+    indexed = 0
+    for row in rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(RfilEntity).values(row))
+            indexed += 1
+        except Exception as row_error:
+            logger.error(f"Could not index entity {row.get('identification_number') or row.get('name')} of RFIL result {file_id}: {str(row_error)}")
+    return indexed
+
+def fit_column(column, value):
+    """
+    Truncate a string to the length of its VARCHAR column (e.g. the member
+    names of ZIP archives in a batch), so a long value does not fail the insert
+    """
+    length = getattr(column.type, "length", None)
+    if isinstance(value, str) and length is not None and len(value) > length:
+        return value[:length]
+    return value
+
+@timed_db
+async def save_rfil_result(db: AsyncSession, result_data: dict):
+    try:
+        # Text-heavy payloads are stored compressed
+        new_result = RfilResult(
+            file_id=result_data.get('file_id'),
+            content_hash=result_data.get('content_hash'),
+            filename=fit_column(RfilResult.filename, result_data.get('filename')),
+            status=fit_column(RfilResult.status, result_data.get('status')),
+            page_count=result_data.get('page_count'),
+            result=compress_json(result_data.get('result')),
+            extracted_text=compress_text(result_data.get('extracted_text')),
+            pages=result_data.get('pages'),
+            timings=result_data.get('timings')
+        )
+
+        db.add(new_result)
+        indexed = await index_rfil_entities(
+            db, result_data.get('file_id'), result_data.get('filename'),
+            result_data.get('result'), result_data.get('extracted_text')
+        )
+        await db.commit()
+
+        return {
+            "status": "success",
+            "message": "RFIL result stored successfully",
+            "indexedEntities": indexed
+        }
+
+    except Exception as e:
+        await db.rollback()
+        return {"status": "error", "message": str(e)}
+
+async def store_rfil_result(result_data: dict):
+    """
+    save_rfil_result on a session of its own, for results stored while a
+    streamed response is being sent
+    """
+    if engine is None:
+        init_engine()
+    async with SessionLocal() as db:
+        return await save_rfil_result(db, result_data)
+
+def rfil_entity_to_dict(entity):
+    return {
+        "fileId": entity.file_id,
+        "filename": entity.filename,
+        "name": entity.name,
+        "type": entity.entity_type,
+        "identificationNumber": entity.identification_number,
+        "originalIdentificationNumber": entity.original_identification_number,
+        "identificationType": entity.identification_type,
+        "valid": entity.valid,
+        "repaired": entity.repaired,
+        "confidence": entity.confidence,
+        "pages": entity.pages,
+        "createdAt": entity.created_at.isoformat() if entity.created_at else None
+    }
+
+@timed_db
+async def find_rfil_entities_by_id(db: AsyncSession, identification_number: str, limit: int = 100, offset: int = 0):
+    """
+    Documents mentioning an EGN/EIK, newest first. Repaired entities are
+    also found by the number OCR originally read.
+    """
+    try:
+        number = normalize_identification_number(identification_number)
+        if not number:
+            return {"status": "error", "message": "Provide an identification number"}
+        page_size = min(max(limit or 100, 1), MAX_PAGE_SIZE)
+        offset = max(offset or 0, 0)
+
+        result = await db.execute(
+            select(RfilEntity)
+            .where(or_(
+                RfilEntity.identification_number == number,
+                RfilEntity.original_identification_number == number
+            ))
+            .order_by(RfilEntity.created_at.desc(), RfilEntity.id.desc())
+            .offset(offset)
+            .limit(page_size + 1)
+        )
+        entities = result.scalars().all()
+
+        has_more = len(entities) > page_size
+        return {
+            "identificationNumber": number,
+            "items": [rfil_entity_to_dict(entity) for entity in entities[:page_size]],
+            "nextOffset": offset + page_size if has_more else None
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+ENTITY_SEARCH_MODES = ("prefix", "trigram")
+
+@timed_db
+async def search_rfil_entities(db: AsyncSession, q: str, mode: str = "prefix", limit: int = 20, offset: int = 0):
+    """
+    Entities by name: "prefix" matches the start of the normalised name,
+    "trigram" ranks similar names (pg_trgm), which tolerates OCR errors and
+    a different word order.
+    """
+    try:
+        name = normalize_name(q)
+        if not name:
+            return {"status": "error", "message": "Provide a name to search for (q)"}
+        if mode not in ENTITY_SEARCH_MODES:
+            return {"status": "error", "message": f"mode must be one of: {', '.join(ENTITY_SEARCH_MODES)}"}
+        page_size = min(max(limit or 20, 1), MAX_PAGE_SIZE)
+        offset = max(offset or 0, 0)
+
+        if mode == "prefix":
+            # Escaped by hand so the pattern keeps the default escape
+            # character and the text_pattern_ops index applies
+            pattern = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rank = literal_column("1.0")
+            query = (
+                select(RfilEntity, rank.label("rank"))
+                .where(RfilEntity.normalized_name.like(pattern))
+                .order_by(RfilEntity.normalized_name, RfilEntity.created_at.desc(), RfilEntity.id.desc())
+            )
+        else:
+            rank = func.similarity(RfilEntity.normalized_name, name)
+            query = (
+                select(RfilEntity, rank.label("rank"))
+                .where(RfilEntity.normalized_name.op("%")(name))
+                .order_by(rank.desc(), RfilEntity.created_at.desc(), RfilEntity.id.desc())
+            )
+
+        result = await db.execute(query.offset(offset).limit(page_size + 1))
+        rows = result.all()
+
+        has_more = len(rows) > page_size
+        items = []
+        for entity, row_rank in rows[:page_size]:
+            item = rfil_entity_to_dict(entity)
+            item["rank"] = round(float(row_rank or 0.0), 4)
+            items.append(item)
+
+        return {
+            "items": items,
+            "nextOffset": offset + page_size if has_more else None
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@timed_db
+async def backfill_rfil_entity_index(batch_size: int = 200):
+    """
+    Index the entities of stored successful results that have none in
+    rfil_entities yet, batch_size results per transaction.
+    Opens its own session.
+    """
+    if engine is None:
+        init_engine()
+
+    results = 0
+    entities = 0
+    last_file_id = ""
+    async with SessionLocal() as db:
+        while True:
+            indexed = select(RfilEntity.id).where(RfilEntity.file_id == RfilResult.file_id).exists()
+            batch = (await db.execute(
+                select(RfilResult.file_id, RfilResult.filename, RfilResult.result, RfilResult.extracted_text)
+                .where(RfilResult.status == "success")
+                .where(RfilResult.file_id > last_file_id)
+                .where(~indexed)
+                .order_by(RfilResult.file_id)
+                .limit(batch_size)
+            )).all()
+            if not batch:
+                break
+            for row in batch:
+                entities += await index_rfil_entities(
+                    db, row.file_id, row.filename,
+                    decompress_json(row.result), decompress_text(row.extracted_text)
+                )
+            await db.commit()
+            results += len(batch)
+            last_file_id = batch[-1].file_id
+    return {"results": results, "entities": entities}
+
+def rfil_result_to_dict(rfil_result: RfilResult, include_text: bool = False):
+    result_dict = {
+        "fileId": rfil_result.file_id,
+        "contentHash": rfil_result.content_hash,
+        "filename": rfil_result.filename,
+        "status": rfil_result.status,
+        "pageCount": rfil_result.page_count,
+        "result": decompress_json(rfil_result.result),
+        "pages": rfil_result.pages,
+        "timings": rfil_result.timings,
+        "createdAt": rfil_result.created_at.isoformat() if rfil_result.created_at else None
+    }
+    if include_text:
+        result_dict["extractedText"] = decompress_text(rfil_result.extracted_text)
+    return result_dict
+
+@timed_db
+async def get_rfil_result(db: AsyncSession, file_id: str, include_text: bool = False):
+    try:
+        result = await db.execute(
+            select(RfilResult)
+            .where(RfilResult.file_id == file_id)
+        )
+        rfil_result = result.scalar_one_or_none()
+
+        if not rfil_result:
+            return {"status": "error", "message": f"RFIL result with file id {file_id} not found"}
+
+        return rfil_result_to_dict(rfil_result, include_text)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@timed_db
+async def get_rfil_result_by_hash(db: AsyncSession, content_hash: str, include_text: bool = False):
+    try:
+        # Latest successful result for the same PDF content
+        result = await db.execute(
+            select(RfilResult)
+            .where(RfilResult.content_hash == content_hash.lower())
+            .where(RfilResult.status == "success")
+            .order_by(RfilResult.created_at.desc())
+            .limit(1)
+        )
+        rfil_result = result.scalar_one_or_none()
+
+        if not rfil_result:
+            return {"status": "error", "message": f"RFIL result with content hash {content_hash} not found"}
+
+        return rfil_result_to_dict(rfil_result, include_text)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
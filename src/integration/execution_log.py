@@ -0,0 +1,118 @@
+import logging
+import os
+import random
+from datetime import datetime
+
+import orjson
+
+from .batch_writer import BatchWriter
+from .database import insert_workflow_logs
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_LOG_ENABLED = os.getenv("WORKFLOW_LOG_ENABLED", "true").lower() == "true"
+# Share of successful runs that are logged; failures are always logged
+WORKFLOW_LOG_SAMPLE_RATE = float(os.getenv("WORKFLOW_LOG_SAMPLE_RATE", "1.0"))
+WORKFLOW_LOG_MAX_PAYLOAD_BYTES = int(os.getenv("WORKFLOW_LOG_MAX_PAYLOAD_BYTES", "16384"))
+
+sampled_out = 0
+
+
+def _encode_default(value):
+    # Uploaded files are logged by name, never by content
+    if hasattr(value, "filename"):
+        return {"filename": value.filename}
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    return str(value)
+
+
+def truncate_payload(value, max_bytes: int = WORKFLOW_LOG_MAX_PAYLOAD_BYTES):
+    """
+    JSON-safe copy of a payload, replaced by a truncated preview when its
+    encoded size exceeds max_bytes
+    """
+    if value is None:
+        return None
+    encoded = orjson.dumps(value, default=_encode_default, option=orjson.OPT_NON_STR_KEYS)
+    if len(encoded) <= max_bytes:
+        return orjson.loads(encoded)
+    return {
+        "truncated": True,
+        "size": len(encoded),
+        "preview": encoded[:max_bytes].decode("utf-8", errors="ignore")
+    }
+
+
+def execution_log_row(entry: dict):
+    """
+    Row for workflow_logs from a queued entry, with its payloads encoded
+    and truncated
+    """
+    return {
+        **entry,
+        "request_data": truncate_payload(entry["request_data"]),
+        "result": truncate_payload(entry["result"]),
+    }
+
+
+async def write_execution_logs(entries: list):
+    """
+    Flush function of the log writer: payloads are encoded here rather than
+    on the request path. An entry that can not be encoded is dropped and
+    counted as failed.
+    """
+    rows = []
+    for entry in entries:
+        try:
+            rows.append(execution_log_row(entry))
+        except Exception as e:
+            logger.error(f"Dropping execution log for {entry.get('workflow_name')}: {str(e)}")
+    return await insert_workflow_logs(rows)
+
+
+execution_log_writer = BatchWriter(
+    "workflow logs",
+    write_execution_logs,
+    max_queue_size=int(os.getenv("WORKFLOW_LOG_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("WORKFLOW_LOG_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("WORKFLOW_LOG_FLUSH_INTERVAL", "2.0"))
+)
+
+
+def log_workflow_execution(workflow_id: str, workflow_name: str, request_data, result,
+                           success: bool, duration_ms: int = None) -> bool:
+    """
+    Queue one execution log without waiting. Returns whether it was queued;
+    never raises, so logging can not fail a workflow run.
+    """
+    global sampled_out
+    if not WORKFLOW_LOG_ENABLED:
+        return False
+    if success and WORKFLOW_LOG_SAMPLE_RATE < 1.0 and random.random() >= WORKFLOW_LOG_SAMPLE_RATE:
+        sampled_out += 1
+        return False
+    try:
+        return execution_log_writer.submit({
+            "workflow_id": workflow_id,
+            "workflow_name": workflow_name,
+            "success": success,
+            "duration_ms": duration_ms,
+            # Encoded and truncated by the writer, off the request path
+            "request_data": request_data,
+            "result": result,
+            "created_at": datetime.utcnow()
+        })
+    except Exception as e:
+        logger.warning(f"Could not queue execution log for {workflow_name}: {str(e)}")
+        return False
+
+
+def execution_log_stats():
+    stats = execution_log_writer.stats()
+    stats.update({
+        "enabled": WORKFLOW_LOG_ENABLED,
+        "sample_rate": WORKFLOW_LOG_SAMPLE_RATE,
+        "sampled_out": sampled_out,
+    })
+    return stats
@@ -0,0 +1,37 @@
+import os
+
+from .batch_writer import BatchWriter
+from .database import insert_workflow_submissions, submission_values
+
+# Feedback is acknowledged with 202 and written in batches in the background
+FEEDBACK_WRITE_BEHIND = os.getenv("FEEDBACK_WRITE_BEHIND", "true").lower() == "true"
+# Items accepted by one /api/workflow-feedback/batch request
+FEEDBACK_BATCH_MAX_ITEMS = int(os.getenv("FEEDBACK_BATCH_MAX_ITEMS", "5000"))
+
+feedback_writer = BatchWriter(
+    "workflow feedback",
+    insert_workflow_submissions,
+    max_queue_size=int(os.getenv("FEEDBACK_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("FEEDBACK_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("FEEDBACK_FLUSH_INTERVAL", "1.0"))
+)
+
+
+def validate_feedback(feedback_data) -> str:
+    """
+    Return an error message for feedback that can never be stored, or None
+    """
+    if not isinstance(feedback_data, dict):
+        return "Feedback must be an object"
+    if not feedback_data.get("workflowId"):
+        return "workflowId is required"
+    return None
+
+
+def enqueue_feedback(feedback_data: dict) -> bool:
+    """
+    Queue one feedback item; False when it has to be written synchronously
+    """
+    if not FEEDBACK_WRITE_BEHIND:
+        return False
+    return feedback_writer.submit(submission_values(feedback_data))
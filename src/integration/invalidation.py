@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import workflow_cache
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_ENABLED = os.getenv("CACHE_INVALIDATION_ENABLED", "true").lower() == "true"
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "haiper_cache_invalidation")
+
+# NOTIFY payloads are limited to 8000 bytes; bigger changes become a full flush
+MAX_PAYLOAD_BYTES = 7900
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def to_asyncpg_dsn(database_url: str) -> str:
+    """
+    Turn the SQLAlchemy URL (postgresql+asyncpg://...) into a plain asyncpg DSN
+    """
+    url = make_url(database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+async def publish_workflow_change(db: AsyncSession, *workflow_ids: str):
+    """
+    Queue a NOTIFY for changed workflows in the current transaction.
+    Postgres only delivers it when the transaction commits, so other
+    workers never evict before the write is visible.
+    """
+    if not INVALIDATION_ENABLED:
+        return
+    payload = json.dumps({"type": "workflow", "ids": list(workflow_ids), "origin": worker_id()})
+    if len(payload.encode("utf-8")) > MAX_PAYLOAD_BYTES:
+        payload = json.dumps({"type": "flush", "origin": worker_id()})
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": INVALIDATION_CHANNEL, "payload": payload}
+    )
+
+
+class InvalidationListener:
+    """
+    Holds one LISTEN connection per worker and evicts cache entries when
+    another worker publishes a change. The cache is suspended whenever the
+    connection is down, since other workers' writes would go unnoticed,
+    and every (re)connect starts it again empty.
+    """
+
+    def __init__(self, dsn: str, cache=workflow_cache, channel: str = INVALIDATION_CHANNEL,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0, ping_interval: float = 30.0):
+        self.dsn = dsn
+        self.cache = cache
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.ping_interval = ping_interval
+        self.connected = False
+        self.reconnects = 0
+        self.notifications = 0
+        self._task = None
+        self._stopping = False
+        self._had_connection = False
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            # Nothing is cached until the first LISTEN is in place
+            self.cache.suspend()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.cache.resume()
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed invalidation payload: {payload!r}")
+            return
+
+        # Our own writes are already evicted locally
+        if message.get("origin") == worker_id():
+            return
+
+        self.notifications += 1
+        if message.get("type") == "workflow" and message.get("ids"):
+            for workflow_id in message["ids"]:
+                self.cache.invalidate_workflow(workflow_id)
+        else:
+            self.cache.clear()
+
+    def _on_termination(self, connection):
+        logger.warning("Cache invalidation connection closed, bypassing the cache until it is back")
+        self.connected = False
+        self.cache.suspend()
+
+    async def _listen_once(self):
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            connection.add_termination_listener(self._on_termination)
+            await connection.add_listener(self.channel, self._on_notification)
+            self.connected = True
+            self._had_connection = True
+            self.cache.resume()
+            logger.info(f"Listening for cache invalidations on channel {self.channel}")
+
+            # Periodic ping also catches half-open TCP connections
+            while self.connected and not connection.is_closed():
+                await asyncio.sleep(self.ping_interval)
+                await asyncio.wait_for(connection.execute("SELECT 1"), timeout=self.ping_interval)
+        finally:
+            self.connected = False
+            self.cache.suspend()
+            if not connection.is_closed():
+                try:
+                    await connection.close(timeout=5)
+                except Exception:
+                    connection.terminate()
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while not self._stopping:
+            try:
+                await self._listen_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {str(e)}")
+
+            if self._stopping:
+                break
+            if self._had_connection:
+                delay = self.reconnect_delay
+                self._had_connection = False
+            # Bypassed until reconnected: we may miss notifications meanwhile
+            self.cache.suspend()
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "notifications": self.notifications,
+        }
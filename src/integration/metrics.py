@@ -0,0 +1,140 @@
+import functools
+import inspect
+import time
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+# Buckets from 5ms to 5min: DB calls sit at the low end, OCR and LLM calls at the high end
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+RFIL_STAGE_SECONDS = Histogram(
+    "rfil_stage_seconds",
+    "Time spent in each RFIL processing stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+RFIL_PAGES = Counter("rfil_pages_total", "Pages processed by OCR", ["outcome"])
+RFIL_CHARACTERS = Counter("rfil_characters_total", "Characters extracted by OCR")
+RFIL_IDENTIFIERS = Counter(
+    "rfil_identifiers_total",
+    "Extracted EGN/EIK identifiers by validation result",
+    ["identification_type", "result"]
+)
+
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds",
+    "Duration of single LLM API call attempts",
+    ["outcome"],
+    buckets=STAGE_BUCKETS
+)
+LLM_CALLS = Counter("llm_calls_total", "LLM API call attempts by outcome (success, error, rate_limited)", ["outcome"])
+LLM_RETRIES = Counter("llm_retries_total", "LLM API calls retried after a failed attempt")
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by LLM calls", ["kind"])
+
+DB_CALL_SECONDS = Histogram(
+    "db_call_seconds",
+    "Duration of database functions",
+    ["function", "outcome"],
+    buckets=DB_BUCKETS
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    if seconds is not None:
+        RFIL_STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def record_ocr_result(pages: list, text: str = None):
+    """
+    Per-page timings of an OCR run. Recorded by the calling process, since
+    OCR itself may run in a worker process with its own registry.
+    """
+    for page_info in pages or []:
+        timings = page_info.get("timings") or {}
+        observe_stage("render", timings.get("render"))
+        observe_stage("orientation", timings.get("orientation"))
+        observe_stage("ocr", timings.get("ocr"))
+        RFIL_PAGES.labels("error" if page_info.get("error") else "success").inc()
+    if text:
+        RFIL_CHARACTERS.inc(len(text))
+
+
+def record_llm_usage(usage):
+    if usage is None:
+        return
+    LLM_TOKENS.labels("prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.labels("completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def _outcome(result) -> str:
+    # Database helpers report failures as {"status": "error", "message": ...}
+    if isinstance(result, dict) and result.get("status") == "error":
+        return "error"
+    return "success"
+
+
+def timed_db(function):
+    """
+    Record the duration of a database function (coroutine or async
+    generator) in db_call_seconds
+    """
+    name = function.__name__
+
+    if inspect.isasyncgenfunction(function):
+        @functools.wraps(function)
+        async def generator_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = "success"
+            try:
+                async for item in function(*args, **kwargs):
+                    yield item
+            except BaseException:
+                outcome = "error"
+                raise
+            finally:
+                DB_CALL_SECONDS.labels(name, outcome).observe(time.perf_counter() - start)
+        return generator_wrapper
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await function(*args, **kwargs)
+            outcome = _outcome(result)
+            return result
+        finally:
+            DB_CALL_SECONDS.labels(name, outcome).observe(time.perf_counter() - start)
+    return wrapper
+
+
+class GaugeCallbackCollector:
+    """
+    Gauges read at scrape time from callbacks returning {label value: value}
+    """
+
+    def __init__(self):
+        self._gauges = []
+
+    def add(self, name: str, documentation: str, label: str, callback):
+        self._gauges.append((name, documentation, label, callback))
+
+    def collect(self):
+        for name, documentation, label, callback in self._gauges:
+            family = GaugeMetricFamily(name, documentation, labels=[label] if label else None)
+            try:
+                values = callback()
+            except Exception:
+                continue
+            if label:
+                for label_value, value in values.items():
+                    family.add_metric([label_value], value)
+            else:
+                family.add_metric([], values)
+            yield family
+
+
+gauge_callbacks = GaugeCallbackCollector()
+REGISTRY.register(gauge_callbacks)
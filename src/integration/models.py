@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Integer, JSON, DateTime
+from sqlalchemy import Column, String, Boolean, Integer, Float, JSON, DateTime, Date, LargeBinary, ForeignKey
 from .database import Base
 from datetime import datetime
 
@@ -29,3 +29,65 @@ class WorkflowSubmission(Base):
     is_positive = Column(Boolean, default=False)
     submitted_at = Column(DateTime, default=datetime.utcnow)
 
+class WorkflowFeedbackDaily(Base):
+    __tablename__ = "workflow_feedback_daily"
+
+    workflow_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    positive_count = Column(Integer, nullable=False, default=0)
+    negative_count = Column(Integer, nullable=False, default=0)
+
+class WorkflowFeedbackTotal(Base):
+    __tablename__ = "workflow_feedback_totals"
+
+    workflow_id = Column(String, primary_key=True)
+    positive_count = Column(Integer, nullable=False, default=0)
+    negative_count = Column(Integer, nullable=False, default=0)
+    last_submitted_at = Column(DateTime)
+
+class WorkflowLog(Base):
+    __tablename__ = "workflow_logs"
+
+    id = Column(Integer, primary_key=True)
+    workflow_id = Column(String)
+    workflow_name = Column(String, nullable=False)
+    success = Column(Boolean, nullable=False)
+    duration_ms = Column(Integer)
+    # Truncated to WORKFLOW_LOG_MAX_PAYLOAD_BYTES
+    request_data = Column(JSON)
+    result = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RfilResult(Base):
+    __tablename__ = "rfil_results"
+
+    file_id = Column(String, primary_key=True)
+    content_hash = Column(String(64), nullable=False, index=True)
+    filename = Column(String(255))
+    status = Column(String(50))
+    page_count = Column(Integer)
+    # zlib-compressed JSON response and extracted text
+    result = Column(LargeBinary)
+    extracted_text = Column(LargeBinary)
+    pages = Column(JSON)
+    timings = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RfilEntity(Base):
+    __tablename__ = "rfil_entities"
+
+    id = Column(Integer, primary_key=True)
+    file_id = Column(String, ForeignKey("rfil_results.file_id", ondelete="CASCADE"), nullable=False, index=True)
+    filename = Column(String(255))
+    identification_number = Column(String(32), index=True)
+    # Number as read by OCR, when identifier repair changed it
+    original_identification_number = Column(String(32))
+    identification_type = Column(String(16))
+    entity_type = Column(String(16))
+    name = Column(String(512), nullable=False)
+    normalized_name = Column(String(512), nullable=False)
+    valid = Column(Boolean)
+    repaired = Column(Boolean, default=False)
+    confidence = Column(Float)
+    pages = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class PoolSettings:
+    """
+    Connection pool settings, read from the environment:
+
+    DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT (seconds),
+    DB_POOL_RECYCLE (seconds, -1 disables), DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE (asyncpg prepared statements per connection)
+    and DB_ECHO (log every SQL statement).
+    """
+
+    def __init__(self):
+        self.pool_size = _env_int("DB_POOL_SIZE", 5)
+        self.max_overflow = _env_int("DB_POOL_MAX_OVERFLOW", 10)
+        self.pool_timeout = _env_int("DB_POOL_TIMEOUT", 30)
+        self.pool_recycle = _env_int("DB_POOL_RECYCLE", 1800)
+        self.pool_pre_ping = _env_bool("DB_POOL_PRE_PING", True)
+        self.statement_cache_size = _env_int("DB_STATEMENT_CACHE_SIZE", 100)
+        self.echo = _env_bool("DB_ECHO", False)
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class PoolMetrics:
+    """
+    Counters for connection checkouts: how many, how long callers waited
+    for a connection and how many gave up after DB_POOL_TIMEOUT.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record_checkout(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+
+    def record_timeout(self, wait: float):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_seconds": round(self.wait_total, 6),
+                "wait_avg_seconds": round(self.wait_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "wait_max_seconds": round(self.wait_max, 6),
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records how long each checkout waited
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout(time.perf_counter() - start)
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+def create_pooled_engine(database_url: str, settings: PoolSettings = None):
+    """
+    Create the async engine with the configured pool
+    """
+    settings = settings or PoolSettings()
+
+    connect_args = {"ssl": False}
+    if make_url(database_url).get_driver_name() == "asyncpg":
+        connect_args["statement_cache_size"] = settings.statement_cache_size
+
+    return create_async_engine(
+        database_url,
+        echo=settings.echo,
+        future=True,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+        connect_args=connect_args
+    )
+
+
+def get_pool_status(engine, settings: PoolSettings = None):
+    """
+    Current pool usage together with the checkout metrics
+    """
+    status = {"metrics": pool_metrics.snapshot()}
+    if settings is not None:
+        status["settings"] = settings.as_dict()
+    if engine is None:
+        status["initialized"] = False
+        return status
+
+    pool = engine.pool
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    status.update({
+        "initialized": True,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow": pool.overflow(),
+        "utilisation": round(checked_out / capacity, 4) if capacity else 0.0,
+    })
+    return status
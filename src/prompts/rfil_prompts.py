@@ -29,4 +29,9 @@ Return the results in JSON format with the following structure:
 
 Only include entities where both name and identification number are mentioned - do not include entities, which only have names specified.
 The document is in Bulgarian language.
-"""
\ No newline at end of file
+"""
+
+BATCH_ENTITY_EXTRACTION_PROMPT = ENTITY_EXTRACTION_PROMPT + """
+The text contains several separate documents. Each document starts with a line "=== DOCUMENT <n> ===".
+Add a "document" field with that number <n> to every entity, e.g. "document": 2. An entity mentioned in several documents is listed once per document.
+"""
@@ -1,11 +1,14 @@
 import os
+import re
 import json
 import time
+import asyncio
 import logging
 import httpx
 from typing import Dict, Any, Optional
-from openai import AzureOpenAI
+from openai import AzureOpenAI, AsyncAzureOpenAI, RateLimitError, APIStatusError
 from dotenv import load_dotenv
+from src.integration.metrics import LLM_CALL_SECONDS, LLM_CALLS, LLM_RETRIES, record_llm_usage
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +23,41 @@ AZURE_OPENAI_ENDPOINT = os.getenv('AZURE_OPENAI_ENDPOINT')
 AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME')
 HTTPS_PROXY = os.getenv('HTTPS_PROXY')
 
+# Stub mode answers from the text itself without calling Azure (benchmarks, load tests)
+LLM_STUB_MODE = os.getenv('LLM_STUB_MODE', 'false').lower() == 'true'
+LLM_STUB_DELAY = float(os.getenv('LLM_STUB_DELAY', '0'))
+
+STUB_ENTITY_PATTERN = re.compile(r'(?P<name>[^,:\n]+?),?\s+(?P<kind>ЕГН|ЕИК)\s*:?\s*(?P<number>\d{9,13})\b')
+STUB_DOCUMENT_PATTERN = re.compile(r'^=== DOCUMENT (\d+) ===$', re.MULTILINE)
+
+def stub_completion(text: str) -> Dict[str, Any]:
+    """
+    Deterministic stand-in for the entity extraction response: every
+    "<name>, ЕГН <number>" / "<name>, ЕИК <number>" in the text becomes an entity.
+    In a combined batch request entities get the number of their document.
+    """
+    documents = [(match.start(), int(match.group(1))) for match in STUB_DOCUMENT_PATTERN.finditer(text or "")]
+    entities = []
+    for match in STUB_ENTITY_PATTERN.finditer(text or ""):
+        is_person = match.group("kind") == "ЕГН"
+        entity = {
+            "name": match.group("name").strip(),
+            "type": "person" if is_person else "company",
+            "identification_number": match.group("number"),
+            "identification_type": "EGN" if is_person else "EIK",
+            "confidence": 1.0
+        }
+        preceding = [number for start, number in documents if start < match.start()]
+        if preceding:
+            entity["document"] = preceding[-1]
+        entities.append(entity)
+    return {
+        "entities": entities,
+        "overall_extraction_quality": 1.0 if entities else 0.0,
+        "processing_time": f"{LLM_STUB_DELAY:.2f} seconds",
+        "stub": True
+    }
+
 def create_openai_client():
     """
     Create and configure an Azure OpenAI client.
@@ -57,6 +95,153 @@ def create_openai_client():
         logger.error(f"Error initializing Azure OpenAI client: {str(e)}")
         return None
 
+_async_client = None
+
+def get_async_openai_client():
+    """
+    Shared AsyncAzureOpenAI client, created on first use. Its connection
+    pool is reused by every call instead of building a client per request.
+
+    Returns:
+        AsyncAzureOpenAI: Configured client or None if configuration is invalid
+    """
+    global _async_client
+    if _async_client is not None:
+        return _async_client
+
+    if not all([AZURE_OPENAI_API_KEY, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT_NAME]):
+        logger.error("Missing Azure OpenAI credentials - check environment variables")
+        return None
+
+    http_client = None
+    if HTTPS_PROXY:
+        logger.info(f"Using proxy: {HTTPS_PROXY}")
+        http_client = httpx.AsyncClient(proxy=HTTPS_PROXY, verify=False)
+
+    try:
+        logger.info(f"Initializing async Azure OpenAI client with endpoint: {AZURE_OPENAI_ENDPOINT}")
+        _async_client = AsyncAzureOpenAI(
+            api_key=AZURE_OPENAI_API_KEY,
+            api_version=AZURE_OPENAI_API_VERSION,
+            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+            http_client=http_client
+        )
+        return _async_client
+    except Exception as e:
+        logger.error(f"Error initializing async Azure OpenAI client: {str(e)}")
+        return None
+
+async def warm_up_async_client():
+    """
+    Open the async client's connection (DNS, TCP and TLS handshake) before
+    the first document. Any HTTP answer will do, only the connection matters.
+    """
+    if LLM_STUB_MODE:
+        return {"connection": "stub"}
+    client = get_async_openai_client()
+    if client is None:
+        raise RuntimeError("Azure OpenAI client is not configured")
+    try:
+        await client.models.list()
+    except APIStatusError as e:
+        return {"connection": "open", "status_code": e.status_code}
+    return {"connection": "open"}
+
+def record_attempt(started: float, response=None, error: Exception = None):
+    """
+    Metrics for one API call attempt: duration, outcome and token usage
+    """
+    if error is None:
+        outcome = "success"
+    elif isinstance(error, RateLimitError):
+        outcome = "rate_limited"
+    else:
+        outcome = "error"
+    LLM_CALL_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+    LLM_CALLS.labels(outcome).inc()
+    if response is not None:
+        record_llm_usage(getattr(response, "usage", None))
+
+def build_request_params(text: str, system_prompt: str, temperature: float = 0,
+                         response_format: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    request_params = {
+        "model": AZURE_OPENAI_DEPLOYMENT_NAME,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": text}
+        ],
+        "temperature": temperature
+    }
+    if response_format:
+        request_params["response_format"] = response_format
+    return request_params
+
+def parse_completion(response, response_format: Optional[Dict[str, str]], elapsed: float) -> Dict[str, Any]:
+    response_text = response.choices[0].message.content
+    try:
+        # If response is JSON, parse it
+        if response_format and response_format.get("type") == "json_object":
+            result = json.loads(response_text)
+        else:
+            result = {"content": response_text}
+
+        # Add processing time metadata
+        result["processing_time"] = f"{elapsed:.2f} seconds"
+
+        logger.info("API call completed successfully")
+        return result
+
+    except json.JSONDecodeError as e:
+        logger.error(f"Error parsing JSON response: {e}")
+        return {
+            "error": "Failed to parse JSON response",
+            "raw_content": response_text
+        }
+
+async def get_completion_with_retries_async(
+    text: str,
+    system_prompt: str,
+    max_retries: int = 3,
+    retry_delay: int = 60,
+    temperature: float = 0,
+    response_format: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    Async version of get_completion_with_retries on the shared client.
+    Waiting for the model or a retry does not block the event loop.
+    """
+    if LLM_STUB_MODE:
+        await asyncio.sleep(LLM_STUB_DELAY)
+        return stub_completion(text)
+
+    client = get_async_openai_client()
+    if not client:
+        return {"error": "Azure OpenAI credentials not configured"}
+
+    request_params = build_request_params(text, system_prompt, temperature, response_format)
+    for attempt in range(max_retries):
+        try:
+            logger.info(f"API call attempt {attempt+1}/{max_retries}")
+            start_time = time.time()
+            attempt_start = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(**request_params)
+            except Exception as api_error:
+                record_attempt(attempt_start, error=api_error)
+                raise
+            record_attempt(attempt_start, response=response)
+            return parse_completion(response, response_format, time.time() - start_time)
+        except Exception as api_error:
+            logger.error(f"Error in API call (attempt {attempt+1}): {str(api_error)}")
+            if attempt < max_retries - 1:
+                LLM_RETRIES.inc()
+                backoff_time = retry_delay * (2 ** attempt)
+                logger.info(f"Retrying in {backoff_time} seconds...")
+                await asyncio.sleep(backoff_time)
+
+    logger.error(f"All {max_retries} API call attempts failed")
+    return {"error": "Failed after multiple attempts"}
+
 def get_completion_with_retries(
     text: str, 
     system_prompt: str, 
@@ -79,6 +264,10 @@ def get_completion_with_retries(
     Returns:
         Dict containing the response or error information
     """
+    if LLM_STUB_MODE:
+        time.sleep(LLM_STUB_DELAY)
+        return stub_completion(text)
+
     client = create_openai_client()
     if not client:
         return {"error": "Azure OpenAI credentials not configured"}
@@ -88,48 +277,25 @@ def get_completion_with_retries(
         try:
             logger.info(f"API call attempt {attempt+1}/{max_retries}")
             
-            request_params = {
-                "model": AZURE_OPENAI_DEPLOYMENT_NAME,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ],
-                "temperature": temperature
-            }
-            
-            if response_format:
-                request_params["response_format"] = response_format
+            request_params = build_request_params(text, system_prompt, temperature, response_format)
             
             start_time = time.time()
-            response = client.chat.completions.create(**request_params)
+            attempt_start = time.perf_counter()
+            try:
+                response = client.chat.completions.create(**request_params)
+            except Exception as api_error:
+                record_attempt(attempt_start, error=api_error)
+                raise
+            record_attempt(attempt_start, response=response)
             end_time = time.time()
             
             # Parse the response
-            response_text = response.choices[0].message.content
-            
-            try:
-                # If response is JSON, parse it
-                if response_format and response_format.get("type") == "json_object":
-                    result = json.loads(response_text)
-                else:
-                    result = {"content": response_text}
-                
-                # Add processing time metadata
-                result["processing_time"] = f"{end_time - start_time:.2f} seconds"
-                
-                logger.info("API call completed successfully")
-                return result
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Error parsing JSON response: {e}")
-                return {
-                    "error": "Failed to parse JSON response",
-                    "raw_content": response_text
-                }
+            return parse_completion(response, response_format, end_time - start_time)
                 
         except Exception as api_error:
             logger.error(f"Error in API call (attempt {attempt+1}): {str(api_error)}")
             if attempt < max_retries - 1:
+                LLM_RETRIES.inc()
                 backoff_time = retry_delay * (2 ** attempt)
                 logger.info(f"Retrying in {backoff_time} seconds...")
                 time.sleep(backoff_time)  # Exponential backoff
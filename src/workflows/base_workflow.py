@@ -1,11 +1,14 @@
+import time
 from abc import ABC, abstractmethod
 from typing import Any, Dict
 from src.functions.utils import format_response
-from src.integration.database import Database
+from src.functions.admission import AdmissionRejected
+from src.integration.execution_log import log_workflow_execution
 
 class BaseWorkflow(ABC):
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, workflow_id: str = None, definition: Dict[str, Any] = None):
+        self.workflow_id = workflow_id
+        self.definition = definition or {}
 
     @abstractmethod
     async def execute(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -25,13 +28,16 @@ class BaseWorkflow(ABC):
             request_data: Dictionary containing the request data
         Returns:
             Formatted response with the workflow results
+        Raises:
+            AdmissionRejected: the workflow was shed because the worker is saturated
         """
+        start = time.perf_counter()
         try:
             # Execute the specific workflow implementation
             result = await self.execute(request_data)
             
             # Log the successful execution
-            await self.log_execution(request_data, result, success=True)
+            await self.log_execution(request_data, result, success=True, duration=time.perf_counter() - start)
             
             return format_response(
                 data=result,
@@ -39,9 +45,13 @@ class BaseWorkflow(ABC):
                 message="Workflow executed successfully"
             )
             
+        except AdmissionRejected as e:
+            # Load shedding: the endpoint answers 429 with Retry-After
+            await self.log_execution(request_data, str(e), success=False, duration=time.perf_counter() - start)
+            raise
         except Exception as e:
             # Log the failed execution
-            await self.log_execution(request_data, str(e), success=False)
+            await self.log_execution(request_data, str(e), success=False, duration=time.perf_counter() - start)
             
             return format_response(
                 data=None,
@@ -49,20 +59,21 @@ class BaseWorkflow(ABC):
                 message=str(e)
             )
 
-    async def log_execution(self, request_data: Dict[str, Any], result: Any, success: bool) -> None:
+    async def log_execution(self, request_data: Dict[str, Any], result: Any, success: bool, duration: float = None) -> None:
         """
-        Log the workflow execution to the database
+        Queue the workflow execution for the workflow_logs table. Does not
+        wait for the database and never raises.
         Args:
             request_data: The original request data
             result: The execution result or error message
             success: Boolean indicating if the execution was successful
+            duration: Execution time in seconds
         """
-        log_data = {
-            "workflow_name": self.__class__.__name__,
-            "request_data": request_data,
-            "result": result,
-            "success": success,
-            "timestamp": "CURRENT_TIMESTAMP"  # This should be handled by your database
-        }
-        
-        await self.db.insert("workflow_logs", log_data)
+        log_workflow_execution(
+            self.workflow_id,
+            self.__class__.__name__,
+            request_data,
+            result,
+            success,
+            int(duration * 1000) if duration is not None else None
+        )
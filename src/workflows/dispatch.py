@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_TIMEOUT = float(os.getenv("WORKFLOW_DISPATCH_TIMEOUT", "30"))
+DISPATCH_CONCURRENCY = int(os.getenv("WORKFLOW_DISPATCH_CONCURRENCY", "10"))
+DISPATCH_MAX_CONNECTIONS = int(os.getenv("WORKFLOW_DISPATCH_MAX_CONNECTIONS", "100"))
+DISPATCH_MAX_KEEPALIVE = int(os.getenv("WORKFLOW_DISPATCH_MAX_KEEPALIVE", "20"))
+
+
+class HttpDispatcher:
+    """
+    Calls the endpoint in a workflow's apiConfig through one shared,
+    pooled httpx.AsyncClient.
+
+    apiConfig may set "timeout" (seconds) and "maxConcurrency" (requests in
+    flight for that workflow); both fall back to the WORKFLOW_DISPATCH_*
+    settings.
+    """
+
+    def __init__(self, timeout: float = DISPATCH_TIMEOUT, concurrency: int = DISPATCH_CONCURRENCY,
+                 max_connections: int = DISPATCH_MAX_CONNECTIONS, max_keepalive: int = DISPATCH_MAX_KEEPALIVE):
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.requests = 0
+        self.failures = 0
+        self._client = None
+        self._semaphores = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it belongs to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    def _semaphore(self, workflow_id: str, limit: int):
+        semaphore, current_limit = self._semaphores.get(workflow_id, (None, None))
+        if semaphore is None or current_limit != limit:
+            semaphore = asyncio.Semaphore(limit)
+            self._semaphores[workflow_id] = (semaphore, limit)
+        return semaphore
+
+    async def dispatch(self, workflow_id: str, api_config: dict, data: dict, files: dict = None):
+        endpoint = api_config.get("endpoint")
+        if not endpoint:
+            raise ValueError(f"Workflow {workflow_id} has no apiConfig endpoint")
+        method = (api_config.get("method") or "POST").upper()
+        timeout = float(api_config.get("timeout") or self.timeout)
+        limit = int(api_config.get("maxConcurrency") or self.concurrency)
+
+        # httpx sets the multipart boundary itself
+        headers = {
+            name: value for name, value in (api_config.get("headers") or {}).items()
+            if name.lower() != "content-type"
+        }
+
+        request_args = {"headers": headers, "timeout": timeout}
+        if method in ("GET", "DELETE", "HEAD"):
+            request_args["params"] = {key: value for key, value in data.items() if isinstance(value, (str, int, float, bool))}
+        elif files:
+            upload_files = {}
+            for name, upload in files.items():
+                upload_files[name] = (upload.filename, await upload.read(), upload.content_type)
+            request_args["files"] = upload_files
+            request_args["data"] = {key: value if isinstance(value, str) else str(value) for key, value in data.items()}
+        else:
+            request_args["json"] = data
+
+        self.requests += 1
+        async with self._semaphore(workflow_id, limit):
+            try:
+                response = await self.client.request(method, endpoint, **request_args)
+            except httpx.HTTPError:
+                self.failures += 1
+                raise
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        if response.is_error:
+            self.failures += 1
+            raise RuntimeError(f"{method} {endpoint} returned {response.status_code}: {str(body)[:500]}")
+        return {"statusCode": response.status_code, "body": body}
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "workflows": {
+                workflow_id: {"limit": limit, "in_flight": limit - semaphore._value}
+                for workflow_id, (semaphore, limit) in self._semaphores.items()
+            },
+        }
+
+
+workflow_dispatcher = HttpDispatcher()
@@ -0,0 +1,70 @@
+from typing import Any, Dict
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.functions.utils import format_response
+from src.integration.cache import workflow_cache, executable_workflow_key
+from src.integration.database import get_workflow_by_id
+from .base_workflow import BaseWorkflow
+from .dispatch import HttpDispatcher, workflow_dispatcher
+from .registry import resolve_workflow_class
+# Imported for its @register_workflow side effect
+from . import rfil_workflow  # noqa: F401
+
+
+class HttpWorkflow(BaseWorkflow):
+    """
+    A workflow defined only by its apiConfig
+    """
+
+    def __init__(self, workflow_id: str, definition: Dict[str, Any], dispatcher: HttpDispatcher = workflow_dispatcher):
+        super().__init__(workflow_id, definition)
+        self.dispatcher = dispatcher
+
+    async def execute(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.dispatcher.dispatch(
+            self.workflow_id,
+            self.definition.get("apiConfig") or {},
+            request_data.get("data") or {},
+            request_data.get("files")
+        )
+
+
+async def load_workflow_definition(db: AsyncSession, workflow_id: str):
+    """
+    Workflow definition from the shared workflow cache, loaded on a miss.
+    Soft-deleted workflows are not found.
+    """
+    entry, data = await workflow_cache.get_or_load(
+        executable_workflow_key(workflow_id),
+        lambda: get_workflow_by_id(db, workflow_id, include_deleted=False)
+    )
+    if data is not None:
+        return data
+    return orjson.loads(entry.body)
+
+
+async def execute_workflow(db: AsyncSession, workflow_id: str, data: Dict[str, Any], files: Dict[str, Any] = None):
+    """
+    Run a workflow: a registered BaseWorkflow subclass if there is one,
+    otherwise an HTTP call to its apiConfig endpoint
+    """
+    definition = await load_workflow_definition(db, workflow_id)
+    if definition.get("status") == "error" and "message" in definition:
+        # Registered implementations also run without a stored definition
+        if resolve_workflow_class(workflow_id) is None:
+            return definition
+        definition = {"id": workflow_id}
+    # The definition is cached; the session is not needed while the workflow runs
+    await db.close()
+
+    workflow_class = resolve_workflow_class(workflow_id, definition)
+    if workflow_class is not None:
+        workflow = workflow_class(workflow_id, definition)
+    elif (definition.get("apiConfig") or {}).get("endpoint"):
+        workflow = HttpWorkflow(workflow_id, definition)
+    else:
+        return format_response(data=None, status="error", message=f"Workflow {workflow_id} has no implementation or apiConfig endpoint")
+
+    return await workflow.run({"data": data, "files": files or {}})
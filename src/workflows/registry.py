@@ -0,0 +1,36 @@
+from typing import Dict, Type
+
+from .base_workflow import BaseWorkflow
+
+# BaseWorkflow subclasses by workflow id (or api_config "handler" name)
+WORKFLOW_REGISTRY: Dict[str, Type[BaseWorkflow]] = {}
+
+
+def register_workflow(*names: str):
+    """
+    Class decorator registering a workflow implementation under one or
+    more workflow ids
+    """
+    def decorator(workflow_class):
+        if not issubclass(workflow_class, BaseWorkflow):
+            raise TypeError(f"{workflow_class.__name__} must subclass BaseWorkflow")
+        for name in names:
+            if name in WORKFLOW_REGISTRY and WORKFLOW_REGISTRY[name] is not workflow_class:
+                raise ValueError(f"Workflow {name} is already registered to {WORKFLOW_REGISTRY[name].__name__}")
+            WORKFLOW_REGISTRY[name] = workflow_class
+        return workflow_class
+    return decorator
+
+
+def resolve_workflow_class(workflow_id: str, definition: dict = None):
+    """
+    The registered implementation for a workflow: by id first, then by the
+    "handler" named in its apiConfig. None means it is dispatched over HTTP.
+    """
+    if workflow_id in WORKFLOW_REGISTRY:
+        return WORKFLOW_REGISTRY[workflow_id]
+    api_config = (definition or {}).get("apiConfig") or {}
+    handler = api_config.get("handler")
+    if handler:
+        return WORKFLOW_REGISTRY.get(handler)
+    return None
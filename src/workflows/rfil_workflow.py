@@ -0,0 +1,76 @@
+import asyncio
+import os
+import uuid
+from typing import Any, Dict
+
+from src.functions.admission import rfil_admission, RFIL_MAX_UPLOAD_BYTES, RFIL_MAX_PAGES
+from src.functions.rfil_loader import load_rfil_utils, load_rfil_pipeline, loaded_rfil_pipeline, RFIL_PIPELINE_ENABLED
+from .base_workflow import BaseWorkflow
+from .registry import register_workflow
+
+RFIL_WORKFLOW_ID = os.getenv("RFIL_WORKFLOW_ID", "rfil")
+
+
+@register_workflow("rfil", RFIL_WORKFLOW_ID)
+class RfilWorkflow(BaseWorkflow):
+    """
+    Extract persons and companies from an uploaded PDF (the "rfil" file
+    field, or the first uploaded file)
+    """
+
+    async def execute(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        files = request_data.get("files") or {}
+        upload = files.get("rfil") or next(iter(files.values()), None)
+        if upload is None:
+            raise ValueError("A PDF file is required")
+        if not upload.filename.lower().endswith('.pdf'):
+            raise ValueError("Only PDF files are accepted")
+
+        if upload.size is not None and upload.size > RFIL_MAX_UPLOAD_BYTES:
+            raise ValueError(f"The PDF file is larger than {RFIL_MAX_UPLOAD_BYTES} bytes")
+
+        contents = await upload.read()
+        rfil_utils = await load_rfil_utils()
+        page_count = rfil_utils.count_pdf_pages(contents)
+        if page_count < 1:
+            raise ValueError("The PDF file is empty or corrupt")
+        if page_count > RFIL_MAX_PAGES:
+            raise ValueError(f"The PDF has {page_count} pages, the limit is {RFIL_MAX_PAGES}")
+
+        # Raises AdmissionRejected when this worker is saturated
+        admission_ticket = await rfil_admission.acquire(page_count)
+        file_id = str(uuid.uuid4())
+        temp_file_path = os.path.join(os.getcwd(), "temp_files", f"{file_id}.pdf")
+        try:
+            return await self._process(rfil_utils, upload.filename, contents, page_count, file_id, temp_file_path)
+        finally:
+            # OCR that outlived the request keeps its capacity until it ends
+            rfil_pipeline = loaded_rfil_pipeline()
+            running_ocr = rfil_pipeline.running_ocr(temp_file_path) if rfil_pipeline is not None else None
+            rfil_admission.release(admission_ticket, after=running_ocr)
+
+    async def _process(self, rfil_utils, filename: str, contents: bytes, page_count: int,
+                       file_id: str, temp_file_path: str) -> Dict[str, Any]:
+        os.makedirs(os.path.dirname(temp_file_path), exist_ok=True)
+        with open(temp_file_path, "wb") as temp_file:
+            temp_file.write(contents)
+
+        try:
+            if RFIL_PIPELINE_ENABLED:
+                process_results = await (await load_rfil_pipeline()).process(temp_file_path, 'bul')
+            else:
+                # OCR and the LLM call block, keep them off the event loop
+                process_results = await asyncio.to_thread(rfil_utils.process_pdf_end_to_end, temp_file_path, 'bul')
+        finally:
+            os.remove(temp_file_path)
+
+        if "error" in process_results:
+            raise ValueError(f"Error processing PDF: {process_results['error']}")
+
+        return {
+            "filename": filename,
+            "file_id": file_id,
+            "pages": page_count,
+            "process_results": process_results,
+            "entity_count": len(process_results.get("entities", []))
+        }
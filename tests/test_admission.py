@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+
+from src.functions.admission import AdmissionController, AdmissionRejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def test_admits_within_limits(self):
+        async def scenario():
+            admission = AdmissionController(max_documents=2, max_pages=10)
+            first = await admission.acquire(4)
+            second = await admission.acquire(6)
+            self.assertEqual((admission.documents, admission.pages), (2, 10))
+            admission.release(first)
+            admission.release(second)
+            self.assertEqual((admission.documents, admission.pages), (0, 0))
+            self.assertEqual(admission.admitted, 2)
+
+        run(scenario())
+
+    def test_oversized_document_admitted_when_idle(self):
+        async def scenario():
+            admission = AdmissionController(max_pages=10)
+            ticket = await admission.acquire(50)
+            self.assertEqual(admission.pages, 50)
+            admission.release(ticket)
+
+        run(scenario())
+
+    def test_waiter_admitted_on_release(self):
+        async def scenario():
+            admission = AdmissionController(max_documents=1, max_wait=5)
+            first = await admission.acquire(1)
+            waiter = asyncio.create_task(admission.acquire(1))
+            await asyncio.sleep(0)
+            self.assertEqual(admission.waiting, 1)
+            self.assertEqual(admission.stats()["waiting"], 1)
+            admission.release(first)
+            second = await waiter
+            self.assertEqual(admission.waiting, 0)
+            self.assertEqual(admission.documents, 1)
+            admission.release(second)
+
+        run(scenario())
+
+    def test_rejected_when_queue_full(self):
+        async def scenario():
+            admission = AdmissionController(max_documents=1, max_waiting=1, max_wait=5)
+            ticket = await admission.acquire(1)
+            waiter = asyncio.create_task(admission.acquire(1))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected) as raised:
+                await admission.acquire(1)
+            self.assertGreaterEqual(raised.exception.retry_after, 1)
+            self.assertEqual(admission.rejected, 1)
+            admission.release(ticket)
+            admission.release(await waiter)
+
+        run(scenario())
+
+    def test_rejected_after_max_wait(self):
+        async def scenario():
+            admission = AdmissionController(max_documents=1, max_wait=0.01)
+            ticket = await admission.acquire(1)
+            with self.assertRaises(AdmissionRejected):
+                await admission.acquire(1)
+            self.assertEqual(admission.waiting, 0)
+            admission.release(ticket)
+
+        run(scenario())
+
+    def test_release_after_running_work(self):
+        async def scenario():
+            admission = AdmissionController()
+            ticket = await admission.acquire(3)
+            running = asyncio.get_running_loop().create_future()
+            admission.release(ticket, after=running)
+            self.assertEqual(admission.documents, 1)
+            running.set_result(None)
+            await asyncio.sleep(0)
+            self.assertEqual((admission.documents, admission.pages), (0, 0))
+
+        run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+
+from src.integration.batch_writer import BatchWriter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class BatchWriterTest(unittest.TestCase):
+    def test_submit_rejected_when_not_running(self):
+        writer = BatchWriter("test", None)
+        self.assertFalse(writer.submit(1))
+        self.assertEqual(writer.rejected, 1)
+
+    def test_flushes_in_batches_on_stop(self):
+        batches = []
+
+        async def flush(batch):
+            batches.append(list(batch))
+            return len(batch)
+
+        async def scenario():
+            writer = BatchWriter("test", flush, batch_size=2, flush_interval=60)
+            writer.start()
+            for item in range(5):
+                self.assertTrue(writer.submit(item))
+            await asyncio.sleep(0)
+            await writer.stop()
+            return writer
+
+        writer = run(scenario())
+        self.assertEqual(sorted(item for batch in batches for item in batch), [0, 1, 2, 3, 4])
+        self.assertTrue(all(len(batch) <= 2 for batch in batches))
+        self.assertEqual(writer.flushed, 5)
+        self.assertEqual(writer.failed, 0)
+
+    def test_queue_full(self):
+        async def flush(batch):
+            return len(batch)
+
+        async def scenario():
+            writer = BatchWriter("test", flush, max_queue_size=1, flush_interval=60)
+            writer.start()
+            accepted = [writer.submit(1), writer.submit(2)]
+            await writer.stop()
+            return writer, accepted
+
+        writer, accepted = run(scenario())
+        self.assertEqual(accepted, [True, False])
+        self.assertEqual(writer.rejected, 1)
+
+    def test_partial_write_counts_rest_as_failed(self):
+        async def flush(batch):
+            return len(batch) - 1
+
+        async def scenario():
+            writer = BatchWriter("test", flush, batch_size=3, flush_interval=60)
+            await writer._flush([1, 2, 3])
+            return writer
+
+        writer = run(scenario())
+        self.assertEqual(writer.flushed, 2)
+        self.assertEqual(writer.failed, 1)
+        self.assertEqual(writer.batches, 1)
+
+    def test_flush_error_counts_batch_as_failed(self):
+        async def flush(batch):
+            raise ConnectionError("down")
+
+        async def scenario():
+            writer = BatchWriter("test", flush)
+            await writer._flush([1, 2])
+            return writer
+
+        writer = run(scenario())
+        self.assertEqual(writer.flushed, 0)
+        self.assertEqual(writer.failed, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import re
+import unittest
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Insert, Update
+
+from src.integration.database import bulk_apply_workflows, MAX_BULK_OPERATIONS
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return iter(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeSession:
+    """
+    Answers bulk_apply_workflows' statements from a set of existing ids
+    """
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.statements = []
+        self.committed = False
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        if isinstance(statement, Insert):
+            compiled = statement.compile(dialect=postgresql.dialect())
+            ids = [value for key, value in compiled.params.items() if re.fullmatch(r"id(_m\d+)?", key)]
+            if "DO UPDATE" in str(compiled):
+                return FakeResult([SimpleNamespace(id=i, inserted=i not in self.existing) for i in ids])
+            return FakeResult([i for i in ids if i not in self.existing])
+        if isinstance(statement, Update):
+            return FakeResult(sorted(self.existing))
+        return FakeResult([])
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        pass
+
+
+def apply(operations, existing=()):
+    db = FakeSession(existing)
+    return asyncio.run(bulk_apply_workflows(db, operations)), db
+
+
+class BulkValidationTest(unittest.TestCase):
+    def test_too_many_operations(self):
+        result, db = apply([{"op": "delete", "id": "a"}] * (MAX_BULK_OPERATIONS + 1))
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(db.statements, [])
+
+    def test_invalid_items_are_rejected_per_item(self):
+        result, db = apply([
+            {"op": "rename", "workflow": {"id": "a"}},
+            {"op": "create", "workflow": {"name": "No id"}},
+            {"op": "create", "workflow": {"id": 5, "name": "Numeric id"}},
+            {"op": "create", "workflow": {"id": "b"}},
+            {"op": "create", "workflow": "b"},
+            {"op": "upsert", "workflow": {"id": "c", "name": ""}},
+            {"op": "create", "workflow": {"id": "d", "name": "D"}},
+            {"op": "delete", "id": "d"},
+        ])
+        messages = [item.get("message") for item in result["results"]]
+        self.assertTrue(messages[0].startswith("op must be one of"))
+        self.assertEqual(messages[1:6], [
+            "id is required", "id must be a string", "name is required",
+            "workflow must be an object", "name is required"
+        ])
+        self.assertEqual(result["results"][6]["status"], "created")
+        self.assertEqual(messages[7], "Duplicate id in request")
+        self.assertEqual(result["status"], "partial")
+        self.assertEqual(result["applied"], 1)
+        self.assertTrue(db.committed)
+
+    def test_create_existing_id(self):
+        result, _ = apply([{"op": "create", "workflow": {"id": "a", "name": "A"}}], existing={"a"})
+        self.assertEqual(result["results"][0]["message"], "Workflow already exists")
+
+    def test_upsert_existing_id_without_name(self):
+        result, db = apply([
+            {"op": "upsert", "workflow": {"id": "a", "description": "new"}},
+            {"op": "upsert", "workflow": {"id": "b", "description": "new"}},
+        ], existing={"a"})
+        self.assertEqual(result["results"][0], {"id": "a", "op": "upsert", "status": "updated"})
+        self.assertEqual(result["results"][1]["message"], "name is required to create a workflow")
+        # Applied as an UPDATE: an INSERT would need the name
+        self.assertFalse(any(isinstance(statement, Insert) for statement in db.statements))
+        self.assertEqual(result["applied"], 1)
+
+    def test_upsert_with_name(self):
+        result, db = apply([
+            {"op": "upsert", "workflow": {"id": "a", "name": "A"}},
+            {"op": "upsert", "workflow": {"id": "b", "name": "B"}},
+        ], existing={"a"})
+        self.assertEqual([item["status"] for item in result["results"]], ["updated", "created"])
+        self.assertFalse(any(isinstance(statement, Update) for statement in db.statements))
+
+    def test_delete_unknown_id(self):
+        result, _ = apply([{"op": "delete", "id": "a"}, {"op": "delete", "id": "x"}], existing={"a"})
+        self.assertEqual(result["results"][0]["status"], "deleted")
+        self.assertEqual(result["results"][1]["message"], "Workflow with id x not found")
+
+
+if __name__ == "__main__":
+    unittest.main()
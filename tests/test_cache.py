@@ -0,0 +1,135 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from src.integration.cache import (
+    ResponseCache, etag_matches, workflow_key, executable_workflow_key, WORKFLOW_LIST_KEY
+)
+
+
+class EtagMatchesTest(unittest.TestCase):
+    def test_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"x", "abc"', '"abc"'))
+        self.assertTrue(etag_matches('W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches("*", '"abc"'))
+
+    def test_no_match(self):
+        self.assertFalse(etag_matches(None, '"abc"'))
+        self.assertFalse(etag_matches("", '"abc"'))
+        self.assertFalse(etag_matches('"abd"', '"abc"'))
+        self.assertFalse(etag_matches("abc", '"abc"'))
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_set_and_get(self):
+        cache = ResponseCache()
+        entry = cache.set("a", {"id": 1})
+        self.assertIs(cache.get("a"), entry)
+        self.assertEqual(entry.body, b'{"id":1}')
+        self.assertTrue(entry.etag.startswith('"') and entry.etag.endswith('"'))
+        self.assertEqual(cache.set("b", {"id": 1}).etag, entry.etag)
+        self.assertNotEqual(cache.set("c", {"id": 2}).etag, entry.etag)
+
+    def test_lookup_counts(self):
+        cache = ResponseCache()
+        cache.lookup("a")
+        cache.set("a", 1)
+        cache.lookup("a")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_ttl(self):
+        cache = ResponseCache(ttl=10)
+        with mock.patch("src.integration.cache.time.monotonic", return_value=100.0):
+            cache.set("a", 1)
+        with mock.patch("src.integration.cache.time.monotonic", return_value=105.0):
+            self.assertIsNotNone(cache.get("a"))
+        with mock.patch("src.integration.cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+
+    def test_stale_generation_is_not_cached(self):
+        cache = ResponseCache()
+        generation = cache.generation
+        cache.invalidate("x")
+        entry = cache.set("a", 1, generation)
+        self.assertEqual(entry.body, b"1")
+        self.assertIsNone(cache.get("a"))
+
+    def test_invalidate_workflow(self):
+        cache = ResponseCache()
+        for key in (workflow_key("w1"), executable_workflow_key("w1"), workflow_key("w2"),
+                    WORKFLOW_LIST_KEY, WORKFLOW_LIST_KEY + ":q=a"):
+            cache.set(key, 1)
+        cache.invalidate_workflow("w1")
+        self.assertIsNone(cache.get(workflow_key("w1")))
+        self.assertIsNone(cache.get(executable_workflow_key("w1")))
+        self.assertIsNone(cache.get(WORKFLOW_LIST_KEY))
+        self.assertIsNone(cache.get(WORKFLOW_LIST_KEY + ":q=a"))
+        self.assertIsNotNone(cache.get(workflow_key("w2")))
+
+    def test_suspended_cache_is_bypassed(self):
+        cache = ResponseCache()
+        cache.set("a", 1)
+        cache.suspend()
+        self.assertIsNone(cache.get("a"))
+        cache.set("b", 2)
+        self.assertIsNone(cache.get("b"))
+        cache.resume()
+        self.assertIsNone(cache.get("a"))
+        cache.set("c", 3)
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_get_or_load(self):
+        cache = ResponseCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            return {"id": "w1"}
+
+        entry, data = asyncio.run(cache.get_or_load("a", loader))
+        self.assertEqual(data, {"id": "w1"})
+        entry_again, data_again = asyncio.run(cache.get_or_load("a", loader))
+        self.assertIs(entry_again, entry)
+        self.assertIsNone(data_again)
+        self.assertEqual(len(calls), 1)
+
+    def test_errors_are_not_cached(self):
+        cache = ResponseCache()
+
+        async def loader():
+            return {"status": "error", "message": "Workflow with id a not found"}
+
+        entry, data = asyncio.run(cache.get_or_load("a", loader))
+        self.assertIsNone(entry)
+        self.assertEqual(data["status"], "error")
+        self.assertIsNone(cache.get("a"))
+
+    def test_stream_into(self):
+        cache = ResponseCache()
+
+        async def chunks():
+            for chunk in (b"[1,", b"2]"):
+                yield chunk
+
+        async def consume(max_bytes):
+            return [chunk async for chunk in cache.stream_into("k", chunks(), cache.generation, max_bytes)]
+
+        self.assertEqual(asyncio.run(consume(2)), [b"[1,", b"2]"])
+        self.assertIsNone(cache.get("k"))
+        asyncio.run(consume(100))
+        self.assertEqual(cache.get("k").body, b"[1,2]")
+
+
+if __name__ == "__main__":
+    unittest.main()
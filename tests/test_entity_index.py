@@ -0,0 +1,89 @@
+import unittest
+
+from src.functions.entity_index import (
+    normalize_name, normalize_identification_number, page_texts, entity_index_rows
+)
+from src.integration.database import fit_entity_row
+
+
+def text_of_pages(*pages):
+    return "".join(f"\n\n--- PAGE {number} ---\n\n{text}" for number, text in enumerate(pages, start=1))
+
+
+class NormalizeNameTest(unittest.TestCase):
+    def test_quotes_punctuation_and_case(self):
+        self.assertEqual(normalize_name('"Фирма" ООД'), "фирма оод")
+        self.assertEqual(normalize_name("„Фирма“  ЕООД."), "фирма еоод")
+        self.assertEqual(normalize_name("Иван  Петров,  Иванов"), "иван петров иванов")
+
+    def test_empty(self):
+        self.assertEqual(normalize_name(None), "")
+        self.assertEqual(normalize_name("  "), "")
+
+    def test_identification_number(self):
+        self.assertEqual(normalize_identification_number(" 800 101 0000 "), "8001010000")
+        self.assertEqual(normalize_identification_number(None), "")
+        self.assertEqual(normalize_identification_number(123), "123")
+
+
+class PageTextsTest(unittest.TestCase):
+    def test_pages(self):
+        self.assertEqual(page_texts(text_of_pages("first", "second")), {1: "first", 2: "second"})
+
+    def test_no_markers(self):
+        self.assertEqual(page_texts("plain text"), {})
+        self.assertEqual(page_texts(None), {})
+
+
+class EntityIndexRowsTest(unittest.TestCase):
+    def result(self, *entities):
+        return {"process_results": {"entities": list(entities)}}
+
+    def test_rows(self):
+        result = self.result(
+            {"name": '"Фирма" ООД', "identification_number": "123 456 789", "type": "Company",
+             "ValidIdentificator": "Valid", "confidence": "0.9"},
+            {"name": "Иван Петров", "identification_number": "8001010000",
+             "original_identification_number": "8OO1010000", "repaired": True},
+        )
+        text = text_of_pages("ЕИК 123456789", "Иван Петров, ЕГН 8OO1010000")
+        rows = entity_index_rows("f", "doc.pdf", result, text)
+        self.assertEqual(len(rows), 2)
+        company, person = rows
+        self.assertEqual(company["identification_number"], "123456789")
+        self.assertEqual(company["normalized_name"], "фирма оод")
+        self.assertEqual(company["entity_type"], "company")
+        self.assertIs(company["valid"], True)
+        self.assertEqual(company["confidence"], 0.9)
+        self.assertEqual(company["pages"], [1])
+        self.assertIsNone(person["valid"])
+        self.assertTrue(person["repaired"])
+        # Found by the number as it was printed, before the repair
+        self.assertEqual(person["pages"], [2])
+
+    def test_pages_by_name(self):
+        rows = entity_index_rows("f", "doc.pdf", self.result({"name": "Фирма ООД"}), text_of_pages("x", '"ФИРМА" ООД'))
+        self.assertEqual(rows[0]["pages"], [2])
+        self.assertIsNone(rows[0]["identification_number"])
+
+    def test_skips_duplicates_and_empty_entities(self):
+        result = self.result(
+            {"name": "A", "identification_number": "1"},
+            {"name": "a.", "identification_number": " 1"},
+            {"name": "", "identification_number": ""},
+            "not an entity",
+        )
+        self.assertEqual(len(entity_index_rows("f", "doc.pdf", result)), 1)
+        self.assertEqual(entity_index_rows("f", "doc.pdf", None), [])
+
+
+class FitEntityRowTest(unittest.TestCase):
+    def test_long_values(self):
+        row = fit_entity_row({"identification_number": "1" * 200, "name": "x" * 1000, "file_id": "f"})
+        self.assertIsNone(row["identification_number"])
+        self.assertLess(len(row["name"]), 1000)
+        self.assertEqual(row["file_id"], "f")
+
+
+if __name__ == "__main__":
+    unittest.main()
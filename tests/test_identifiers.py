@@ -0,0 +1,127 @@
+import random
+import unittest
+
+from src.functions.identifier_repair import repair_identifier
+from src.functions.validators import is_valid_egn, validate_bulgarian_eik
+from src.functions.rfil_utils import repair_invalid_identifier
+
+
+class EgnValidatorTest(unittest.TestCase):
+    def test_valid(self):
+        self.assertTrue(is_valid_egn("8001010008"))
+        # Month + 40: born in 2000 or later
+        self.assertTrue(is_valid_egn("0441010007"))
+
+    def test_wrong_checksum(self):
+        self.assertFalse(is_valid_egn("8001010003"))
+
+    def test_invalid_date(self):
+        self.assertFalse(is_valid_egn("8013010008"))
+        self.assertFalse(is_valid_egn("8002300008"))
+
+    def test_wrong_format(self):
+        self.assertFalse(is_valid_egn("800101000"))
+        self.assertFalse(is_valid_egn("8O01010008"))
+
+
+class EikValidatorTest(unittest.TestCase):
+    def test_valid(self):
+        self.assertTrue(validate_bulgarian_eik("121000008"))
+        self.assertTrue(validate_bulgarian_eik("1210000080000"))
+
+    def test_wrong_checksum(self):
+        self.assertFalse(validate_bulgarian_eik("121000009"))
+        self.assertFalse(validate_bulgarian_eik("1210000080001"))
+        # The extension is only valid after valid first 9 digits
+        self.assertFalse(validate_bulgarian_eik("1210000090000"))
+
+    def test_wrong_format(self):
+        self.assertFalse(validate_bulgarian_eik("12100000"))
+        self.assertFalse(validate_bulgarian_eik("12100OO08"))
+        self.assertFalse(validate_bulgarian_eik(121000008))
+
+
+class RepairIdentifierTest(unittest.TestCase):
+    def test_confusable_character_is_repaired(self):
+        repair = repair_identifier("8O01010008", "EGN")
+        self.assertEqual(repair["status"], "repaired")
+        self.assertTrue(repair["repaired"])
+        self.assertEqual(repair["identification_number"], "8001010008")
+        self.assertEqual(repair["substitutions"], [{"position": 1, "from": "O", "to": "0"}])
+
+    def test_low_confidence_digit_is_repaired(self):
+        repair = repair_identifier("8001010003", "EGN", [99] * 9 + [50])
+        self.assertEqual(repair["status"], "repaired")
+        self.assertEqual(repair["identification_number"], "8001010008")
+
+    def test_digits_without_evidence_are_not_repaired(self):
+        repair = repair_identifier("8001010003", "EGN", [99] * 9 + [90])
+        self.assertEqual(repair["status"], "unconfirmed")
+        self.assertFalse(repair["repaired"])
+        self.assertEqual(repair["identification_number"], "8001010003")
+        self.assertEqual(repair["candidates"], ["8001010008"])
+
+        repair = repair_identifier("8001010003", "EGN")
+        self.assertEqual(repair["status"], "ambiguous")
+        self.assertFalse(repair["repaired"])
+        self.assertIn("8001010008", repair["candidates"])
+
+        self.assertFalse(repair_identifier("1111111111", "EGN")["repaired"])
+
+    def test_random_digits_are_never_repaired(self):
+        rng = random.Random(42)
+        for _ in range(500):
+            number = "".join(rng.choice("0123456789") for _ in range(9))
+            self.assertNotEqual(repair_identifier(number, "EIK")["status"], "repaired")
+
+    def test_locked_positions_are_not_changed(self):
+        repair = repair_identifier("8001010003", "EGN", [99] * 10)
+        self.assertEqual(repair["status"], "unrepairable")
+        self.assertEqual(repair["candidates"], [])
+
+    def test_separators_are_dropped(self):
+        repair = repair_identifier("121 000 008", "EIK")
+        self.assertEqual(repair["status"], "valid")
+        self.assertFalse(repair["repaired"])
+        self.assertEqual(repair["identification_number"], "121000008")
+
+    def test_unrepairable(self):
+        self.assertEqual(repair_identifier("12345", "EGN")["status"], "unrepairable")
+        self.assertEqual(repair_identifier("8X01010008", "EGN")["status"], "unrepairable")
+        self.assertEqual(repair_identifier("8001010008", "PASSPORT")["status"], "unrepairable")
+
+
+class RepairInvalidIdentifierTest(unittest.TestCase):
+    def entity(self, number, identification_type="EGN"):
+        return {"type": "person", "name": "Иван Петров", "identification_number": number,
+                "identification_type": identification_type, "ValidIdentificator": "Invalid"}
+
+    def test_repaired(self):
+        entity = repair_invalid_identifier(self.entity("8O01010008"))
+        self.assertEqual(entity["ValidIdentificator"], "Valid")
+        self.assertTrue(entity["repaired"])
+        self.assertEqual(entity["identification_number"], "8001010008")
+        self.assertEqual(entity["original_identification_number"], "8O01010008")
+
+    def test_unconfirmed_stays_invalid(self):
+        entity = repair_invalid_identifier(self.entity("8001010003"))
+        self.assertEqual(entity["ValidIdentificator"], "Invalid")
+        self.assertFalse(entity["repaired"])
+        self.assertEqual(entity["identification_number"], "8001010003")
+        self.assertIn("8001010008", entity["repair_candidates"])
+
+    def test_confidences_of_the_ocr_word(self):
+        entity = repair_invalid_identifier(self.entity("8001010003"), {"8001010003": [99] * 9 + [50]})
+        self.assertEqual(entity["ValidIdentificator"], "Valid")
+        self.assertEqual(entity["identification_number"], "8001010008")
+
+    def test_valid_after_cleaning(self):
+        entity = repair_invalid_identifier(self.entity("121 000 008", "EIK"))
+        self.assertEqual(entity["ValidIdentificator"], "Valid")
+        self.assertFalse(entity["repaired"])
+        self.assertEqual(entity["identification_number"], "121000008")
+        self.assertEqual(entity["original_identification_number"], "121 000 008")
+
+
+if __name__ == "__main__":
+    unittest.main()
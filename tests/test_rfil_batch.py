@@ -0,0 +1,161 @@
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+from types import SimpleNamespace
+from unittest import mock
+
+import fitz
+
+from src.functions import rfil_batch
+from src.functions.admission import AdmissionController
+from src.functions.rfil_batch import RfilBatch, iter_batch_documents, split_batch_entities
+
+
+def pdf_bytes(pages: int = 1) -> bytes:
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def upload(filename: str, data: bytes):
+    return SimpleNamespace(filename=filename, file=io.BytesIO(data))
+
+
+class SplitBatchEntitiesTest(unittest.TestCase):
+    def test_by_document_number(self):
+        combined = {"model": "m", "entities": [
+            {"name": "A", "identification_number": "1", "document": 2},
+            {"name": "B", "identification_number": "2", "document": "1"},
+        ]}
+        results, unattributed = split_batch_entities(combined, ["text one", "text two"])
+        self.assertEqual([e["name"] for e in results[0]["entities"]], ["B"])
+        self.assertEqual([e["name"] for e in results[1]["entities"]], ["A"])
+        self.assertNotIn("document", results[1]["entities"][0])
+        self.assertEqual(results[0]["model"], "m")
+        self.assertEqual(unattributed, 0)
+
+    def test_by_identification_number(self):
+        combined = {"entities": [
+            {"name": "A", "identification_number": "8001010000"},
+            {"name": "B", "identification_number": "123", "document": 7},
+        ]}
+        results, unattributed = split_batch_entities(combined, ["EGN 8001010000", "EIK 123"])
+        self.assertEqual([e["name"] for e in results[0]["entities"]], ["A"])
+        self.assertEqual([e["name"] for e in results[1]["entities"]], ["B"])
+        self.assertEqual(unattributed, 0)
+
+    def test_unattributed(self):
+        combined = {"entities": [
+            {"name": "A", "identification_number": "42"},
+            {"name": "B"},
+            "not an entity",
+        ]}
+        results, unattributed = split_batch_entities(combined, ["42", "also 42"])
+        self.assertEqual(unattributed, 2)
+        self.assertEqual(results[0]["entities"], [])
+
+
+class IterBatchDocumentsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.temp_dir):
+            os.remove(os.path.join(self.temp_dir, name))
+        os.rmdir(self.temp_dir)
+
+    def test_pdfs_and_archives(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("a.pdf", pdf_bytes())
+            zf.writestr("notes.txt", "x")
+            zf.writestr("__MACOSX/._a.pdf", "x")
+        docs = list(iter_batch_documents(
+            [upload("one.pdf", pdf_bytes()), upload("batch.zip", archive.getvalue()), upload("x.doc", b"")],
+            self.temp_dir
+        ))
+        self.assertEqual([doc.index for doc in docs], [1, 2, 3, 4])
+        self.assertEqual([doc.filename for doc in docs], ["one.pdf", "batch.zip/a.pdf", "batch.zip/notes.txt", "x.doc"])
+        self.assertTrue(os.path.exists(docs[0].path) and os.path.exists(docs[1].path))
+        self.assertEqual([doc.error is None for doc in docs], [True, True, False, False])
+
+    def test_too_large_copy_is_removed(self):
+        docs = list(iter_batch_documents([upload("big.pdf", b"x" * 100)], self.temp_dir, max_bytes=10))
+        self.assertIn("larger than", docs[0].error)
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_unconsumed_document_removed_on_close(self):
+        documents = iter_batch_documents([upload("one.pdf", pdf_bytes()), upload("two.pdf", pdf_bytes())], self.temp_dir)
+        first = next(documents)
+        self.assertTrue(os.path.exists(first.path))
+        documents.close()
+        self.assertFalse(os.path.exists(first.path))
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+
+class FakePipeline:
+    llm_concurrency = 2
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    async def extract_text(self, pdf_path, ocr_language, request_id):
+        return {"text": self.texts[os.path.basename(pdf_path)], "pages": [], "word_confidences": {}, "seconds": 0.0}
+
+    def running_ocr(self, pdf_path):
+        return None
+
+
+class RfilBatchPackingTest(unittest.TestCase):
+    def run_batch(self, texts, token_budget):
+        temp_dir = tempfile.mkdtemp()
+        documents = []
+        for index, name in enumerate(texts, start=1):
+            path = os.path.join(temp_dir, name)
+            with open(path, "wb") as f:
+                f.write(pdf_bytes())
+            documents.append(rfil_batch.BatchDocument(index, name, path))
+        requests = []
+
+        async def request_entities(text, system_prompt=None):
+            requests.append(text)
+            if system_prompt is None:
+                return {"entities": [{"name": text, "identification_number": "1"}]}
+            return {"entities": [
+                {"name": f"doc {number}", "identification_number": "1", "document": number}
+                for number in range(1, text.count("=== DOCUMENT") + 1)
+            ]}
+
+        async def collect():
+            batch = RfilBatch(FakePipeline(texts), documents, AdmissionController(max_documents=10),
+                              token_budget=token_budget, pack_wait=0.05)
+            return [doc async for doc in batch.run()], batch
+
+        with mock.patch.object(rfil_batch, "request_entities_async", request_entities), \
+                mock.patch.object(rfil_batch, "validate_entities", lambda entities, confidences: entities):
+            docs, batch = asyncio.run(collect())
+        os.rmdir(temp_dir)
+        return docs, batch, requests
+
+    def test_small_documents_share_a_request(self):
+        docs, batch, requests = self.run_batch({"a.pdf": "alpha", "b.pdf": "beta", "c.pdf": "gamma"}, 1000)
+        self.assertEqual(len(docs), 3)
+        self.assertEqual(batch.llm_requests, 1)
+        self.assertEqual(len(requests), 1)
+        self.assertTrue(all(doc.batched_with == 3 for doc in docs))
+        self.assertTrue(all(not os.path.exists(doc.path) for doc in docs))
+
+    def test_budget_splits_requests(self):
+        docs, batch, requests = self.run_batch({"a.pdf": "x" * 100, "b.pdf": "y" * 100}, 10)
+        self.assertEqual(batch.llm_requests, 2)
+        self.assertTrue(all(doc.batched_with == 1 for doc in docs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from datetime import datetime
+
+from src.integration.database import (
+    encode_workflow_cursor, decode_workflow_cursor, resolve_workflow_projection,
+    WORKFLOW_LIST_COLUMNS, WORKFLOW_JSON_COLUMNS
+)
+
+
+class WorkflowCursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        updated_at = datetime(2026, 10, 19, 8, 30, 15, 123456)
+        cursor = encode_workflow_cursor(updated_at, "workflow/ä 1")
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_workflow_cursor(cursor), (updated_at, "workflow/ä 1"))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_workflow_cursor("not a cursor")
+
+
+class WorkflowProjectionTest(unittest.TestCase):
+    def test_all_columns(self):
+        self.assertEqual(resolve_workflow_projection(None), list(WORKFLOW_LIST_COLUMNS))
+        self.assertEqual(resolve_workflow_projection(""), list(WORKFLOW_LIST_COLUMNS))
+
+    def test_summary(self):
+        keys = resolve_workflow_projection("summary")
+        self.assertIn("id", keys)
+        for column in WORKFLOW_JSON_COLUMNS:
+            self.assertNotIn(column, keys)
+
+    def test_selected_fields_keep_id_and_column_order(self):
+        self.assertEqual(resolve_workflow_projection(" name , updatedAt"), ["id", "name", "updatedAt"])
+
+    def test_unknown_field(self):
+        with self.assertRaisesRegex(ValueError, "Unknown fields: nope"):
+            resolve_workflow_projection("name,nope")
+
+
+if __name__ == "__main__":
+    unittest.main()